@@ -0,0 +1,43 @@
+# bench_alarms.py - Measure Reactor.after_s/cancel_after cost as the
+# number of pending alarms grows.
+#
+#   PYTHONPATH=. python benchmarks/bench_alarms.py [max_pending]
+
+import sys
+import time
+
+import smax
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def measure(pending, operations=10000):
+    reactor = NullReactor()
+    callback = lambda: None  # noqa: E731
+    # Far in the future so nothing fires while we measure.
+    for i in range(pending):
+        reactor.after_s(3600 + i * 1e-6, callback)
+    start = time.perf_counter()
+    for i in range(operations):
+        # this is what a state transition with a timeout does:
+        # schedule on enter, cancel on exit.
+        r = reactor.after_s(1800, callback)
+        reactor.cancel_after(r)
+    elapsed = time.perf_counter() - start
+    return elapsed / operations
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("%12s %16s" % ("pending", "us/schedule+cancel"))
+    pending = 10
+    while pending <= limit:
+        print("%12u %16.3f" % (pending, measure(pending) * 1e6))
+        pending *= 10
+
+
+if __name__ == "__main__":
+    main()
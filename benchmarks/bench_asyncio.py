@@ -0,0 +1,69 @@
+# bench_asyncio.py - Timeouts per second with many machines sharing
+# one asyncio event loop, for both AsyncioReactor modes.
+#
+#   PYTHONPATH=. python benchmarks/bench_asyncio.py
+
+import asyncio
+import time
+
+import smax
+
+r"""
+%%
+
+machine Blinker:
+    enter: self.count = 0
+    *state s_on:
+        enter: self.count += 1
+        ms(10) -> s_off
+    state s_off:
+        ms(10) -> s_on
+
+%%
+"""
+
+
+def load():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec)).Blinker
+
+
+async def measure(native, machines, seconds=1.0):
+    loop = asyncio.get_running_loop()
+    # bound polling mode so it still yields to the loop when saturated.
+    reactor = smax.AsyncioReactor(loop, max_callbacks=1000, native=native)
+    task = asyncio.create_task(reactor.run())
+    Blinker = load()
+    blinkers = [Blinker(reactor) for i in range(machines)]
+    for b in blinkers:
+        b.start()
+    start = time.perf_counter()
+    cpu = time.process_time()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+    reactor.stop()
+    await task
+    # two timeouts per count
+    timeouts = sum(b.count for b in blinkers) * 2
+    return timeouts / elapsed, cpu / timeouts
+
+
+def main():
+    print(
+        "%10s %12s %12s %14s %14s"
+        % ("machines", "polling/s", "native/s", "polling cpu us", "native cpu us")
+    )
+    for machines in (10, 100, 1000):
+        polling, native = [
+            asyncio.run(measure(native, machines)) for native in (False, True)
+        ]
+        print(
+            "%10u %12.0f %12.0f %14.1f %14.1f"
+            % (machines, polling[0], native[0], polling[1] * 1e6, native[1] * 1e6)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_broadcast.py - Time to deliver one event to 100k machines: one
+# event call per machine, reactor.broadcast, and Fleet.broadcast.  Half
+# the machines are running (and count the tick); the rest are idle and
+# ignore it.
+#
+#   PYTHONPATH=. python benchmarks/bench_broadcast.py [count]
+
+import sys
+import time
+
+import smax
+
+r"""
+%%
+
+machine Device:
+    slots: _ticks
+    enter: self._ticks = 0
+    *state s_idle:
+        ev_go -> s_running
+    state s_running:
+        ev_tick: self._ticks += 1
+        ev_stop -> s_idle
+
+%%
+"""
+
+options = {"bitset": True, "slots": True, "lean": True}
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def device_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Device
+
+
+def instances(reactor, count):
+    Device = device_class()
+    devices = [Device(reactor) for i in range(count)]
+    for i, device in enumerate(devices):
+        device.start()
+        if i & 1:
+            device.ev_go()
+    reactor.sync()
+    return devices
+
+
+def one_by_one(reactor, count):
+    devices = instances(reactor, count)
+
+    def tick():
+        for device in devices:
+            device.ev_tick()
+
+    return tick, lambda: sum(d._ticks for d in devices)
+
+
+def broadcast(reactor, count):
+    devices = instances(reactor, count)
+    return (
+        lambda: reactor.broadcast(devices, "ev_tick"),
+        lambda: sum(d._ticks for d in devices),
+    )
+
+
+def fleet(reactor, count):
+    f = smax.Fleet(device_class(), reactor, count, columns={"_ticks": "l"})
+    f.start()
+    f.broadcast("ev_go", indices=range(1, count, 2))
+    reactor.sync()
+    return lambda: f.broadcast("ev_tick"), lambda: sum(f.column("_ticks"))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = 10
+    print("%u machines, %u rounds, %s" % (count, rounds, options))
+    print("%-12s %12s" % ("delivery", "ms/round"))
+    for name, setup in (
+        ("one by one", one_by_one),
+        ("broadcast", broadcast),
+        ("fleet", fleet),
+    ):
+        reactor = NullReactor()
+        tick, ticks = setup(reactor, count)
+        start = time.perf_counter()
+        for i in range(rounds):
+            tick()
+            reactor.sync()
+        elapsed = time.perf_counter() - start
+        assert ticks() == rounds * (count // 2)
+        print("%-12s %12.1f" % (name, elapsed * 1000 / rounds))
+
+
+if __name__ == "__main__":
+    main()
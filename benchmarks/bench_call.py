@@ -0,0 +1,72 @@
+# bench_call.py - Events per second through Reactor.call, from the
+# reactor thread itself (queued, and with inline_events) and from
+# another thread.
+#
+#   PYTHONPATH=. python benchmarks/bench_call.py
+
+import threading
+import time
+
+import smax
+
+r"""
+%%
+
+machine Toggle:
+    *state s_a:
+        ev_toggle -> s_b
+    state s_b:
+        ev_toggle -> s_a
+
+%%
+"""
+
+
+def load():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec)).Toggle
+
+
+def same_thread(count, inline_events=False):
+    reactor = smax.SelectReactor(inline_events=inline_events)
+    toggle = load()(reactor)
+    toggle.start()
+    reactor.sync()
+    start = time.perf_counter()
+    for i in range(count):
+        toggle.ev_toggle()
+        if (i & 0xFF) == 0:
+            reactor.sync()
+    reactor.sync()
+    return count / (time.perf_counter() - start)
+
+
+def cross_thread(count):
+    reactor = smax.SelectReactor()
+    toggle = load()(reactor)
+    toggle.start()
+    reactor.sync()
+
+    def produce():
+        for i in range(count):
+            toggle.ev_toggle()
+        reactor.call(reactor.stop)
+
+    thread = threading.Thread(target=produce)
+    start = time.perf_counter()
+    reactor.call(thread.start)
+    reactor.run()
+    thread.join()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = 200000
+    print("same thread:  %10.0f events/s" % same_thread(count))
+    print("inline:       %10.0f events/s" % same_thread(count, True))
+    print("cross thread: %10.0f events/s" % cross_thread(count))
+
+
+if __name__ == "__main__":
+    main()
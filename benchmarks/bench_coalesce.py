@@ -0,0 +1,54 @@
+# bench_coalesce.py - An input storm: many ev_switch(active) calls
+# between syncs, with and without "coalesce: ev_switch".
+#
+#   PYTHONPATH=. python benchmarks/bench_coalesce.py [calls]
+
+import sys
+import time
+
+import smax
+
+machine = r"""
+machine Switch:
+    %(coalesce)s
+    *state s_inactive:
+        ev_switch(active) [active] -> s_active
+    state s_active:
+        ev_switch(active) [not active] -> s_inactive
+"""
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def measure(coalesce, calls, burst):
+    source = machine % {"coalesce": "coalesce: ev_switch" if coalesce else ""}
+    spec = smax.parse(source, "<bench_coalesce>")
+    Switch = smax.compile_python(smax.generate_python(spec)).Switch
+    reactor = NullReactor()
+    switch = Switch(reactor)
+    switch.start()
+    reactor.sync()
+    start = time.perf_counter()
+    for i in range(0, calls, burst):
+        for j in range(burst):
+            switch.ev_switch(j & 1)
+        reactor.sync()
+    return time.perf_counter() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("%u calls" % calls)
+    print("%-8s %12s %12s" % ("burst", "queued s", "coalesced s"))
+    for burst in (1, 10, 100, 1000):
+        print(
+            "%-8u %12.2f %12.2f"
+            % (burst, measure(False, calls, burst), measure(True, calls, burst))
+        )
+
+
+if __name__ == "__main__":
+    main()
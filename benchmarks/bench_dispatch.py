@@ -0,0 +1,90 @@
+# bench_dispatch.py - Events per second for machines nested 1 to 16
+# levels deep, where the innermost state toggles on each event and
+# every level has other siblings that aren't active.  Run once for
+# each code generation mode.
+#
+#   PYTHONPATH=. python benchmarks/bench_dispatch.py [count]
+
+import sys
+import time
+
+import smax
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def nested(depth, siblings):
+    lines = ["machine Nested:"]
+
+    def level(n, indent):
+        if n == depth:
+            lines.extend(
+                [
+                    "%s*state s_a:" % indent,
+                    "%s    ev_toggle -> s_b" % indent,
+                    "%sstate s_b:" % indent,
+                    "%s    ev_toggle -> s_a" % indent,
+                ]
+            )
+            return
+        # The if/elif chains check siblings in this order,
+        # so put the active state last.
+        for i in range(siblings - 1):
+            lines.extend(
+                [
+                    "%sstate s_other_%u:" % (indent, i),
+                    "%s    ev_toggle -> s_%u" % (indent, n),
+                ]
+            )
+        lines.extend(
+            [
+                "%s*state s_%u:" % (indent, n),
+                "%s    ev_other -> s_other_0" % indent,
+            ]
+        )
+        level(n + 1, indent + "    ")
+
+    level(0, "    ")
+    return "\n".join(lines) + "\n"
+
+
+def measure(depth, siblings, count, options):
+    spec = smax.parse(nested(depth, siblings), "<nested>")
+    module = smax.compile_python(smax.generate_python(spec, **options))
+    reactor = NullReactor()
+    machine = module.Nested(reactor)
+    machine.start()
+    reactor.sync()
+    start = time.perf_counter()
+    for i in range(count):
+        machine.ev_toggle()
+        reactor.sync()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    modes = [
+        ("chain", {}),
+        ("bitset", {"bitset": True}),
+        ("table", {"dispatch": "table"}),
+        ("table+bitset", {"dispatch": "table", "bitset": True}),
+        ("lean", {"lean": True}),
+        ("all", {"dispatch": "table", "bitset": True, "lean": True}),
+    ]
+    print("%6s %8s" % ("depth", "siblings") + "".join("%14s" % m for m, _ in modes))
+    for depth in (1, 4, 16):
+        for siblings in (2, 32):
+            rates = [measure(depth, siblings, count, o) for _, o in modes]
+            print(
+                "%6u %8u" % (depth, siblings)
+                + "".join("%14.0f" % rate for rate in rates)
+            )
+    print("(events per second)")
+
+
+if __name__ == "__main__":
+    main()
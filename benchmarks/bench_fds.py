@@ -0,0 +1,56 @@
+# bench_fds.py - Cost of one wakeup with many registered descriptors,
+# SelectReactor vs EpollReactor.
+#
+#   PYTHONPATH=. python benchmarks/bench_fds.py
+
+import os
+import time
+
+import smax
+
+
+def make_fd():
+    # eventfd costs one descriptor per registration; pipes cost two.
+    if hasattr(os, "eventfd"):
+        fd = os.eventfd(0, os.EFD_NONBLOCK)
+        return fd, fd
+    return os.pipe()
+
+
+def measure(reactor_class, count, wakeups=2000):
+    reactor = reactor_class()
+    fds = [make_fd() for i in range(count)]
+    try:
+        for r, w in fds:
+            reactor.add_fd(r, lambda r=r: os.read(r, 8))
+        reactor.sync()
+        start = time.perf_counter()
+        for i in range(wakeups):
+            r, w = fds[(i * 7919) % count]
+            os.write(w, (1).to_bytes(8, "little"))
+            rr, ww, xx = reactor.select(None)
+            for fd in rr:
+                reactor._r[fd]()
+        return (time.perf_counter() - start) / wakeups
+    except ValueError:
+        # select() can't handle descriptors past FD_SETSIZE.
+        return None
+    finally:
+        for r, w in fds:
+            os.close(r)
+            if w != r:
+                os.close(w)
+
+
+def main():
+    print("%8s %14s %14s" % ("fds", "select us", "epoll us"))
+    for count in (100, 1000, 10000):
+        results = []
+        for reactor_class in (smax.SelectReactor, smax.EpollReactor):
+            t = measure(reactor_class, count)
+            results.append("n/a" if t is None else "%.2f" % (t * 1e6))
+        print("%8u %14s %14s" % (count, results[0], results[1]))
+
+
+if __name__ == "__main__":
+    main()
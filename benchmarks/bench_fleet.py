@@ -0,0 +1,95 @@
+# bench_fleet.py - Bytes per idle machine and events per second for a
+# smax.Fleet, compared with the same number of separate instances.
+#
+#   PYTHONPATH=. python benchmarks/bench_fleet.py [count]
+
+import gc
+import sys
+import time
+import tracemalloc
+
+import smax
+
+r"""
+%%
+
+machine Device:
+    slots: _online
+    enter: self._online = False
+    *state s_offline:
+        ev_online -> s_online
+    state s_online:
+        enter: self._online = True
+        exit: self._online = False
+        ev_offline -> s_offline
+        s(60) -> s_offline
+
+%%
+"""
+
+options = {"bitset": True, "slots": True, "lean": True}
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def device_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Device
+
+
+def instances(Device, reactor, count):
+    devices = []
+    for i in range(count):
+        device = Device(reactor)
+        device.start()
+        devices.append(device)
+        if (i & 0xFFF) == 0:
+            reactor.sync()
+    reactor.sync()
+    return devices, lambda i: devices[i].ev_online()
+
+
+def fleet(Device, reactor, count):
+    f = smax.Fleet(Device, reactor, count, columns={"_online": "b"})
+    f.start()
+    reactor.sync()
+    return f, lambda i: f.dispatch(i, "ev_online")
+
+
+def measure(make, count, events):
+    Device = device_class()
+    reactor = NullReactor()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    machines, ev_online = make(Device, reactor, count)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    if isinstance(machines, list):
+        # don't count the list that holds them.
+        used -= sys.getsizeof(machines)
+    step = max(count // events, 1)
+    start = time.perf_counter()
+    for i in range(0, count, step):
+        ev_online(i)
+    reactor.sync()
+    elapsed = time.perf_counter() - start
+    return used / count, len(range(0, count, step)) / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    events = min(count, 100000)
+    print("%u machines, %s" % (count, options))
+    print("%-12s %14s %14s" % ("layout", "bytes/machine", "events/s"))
+    for name, make in (("instances", instances), ("fleet", fleet)):
+        per_machine, rate = measure(make, count, events)
+        print("%-12s %14.0f %14.0f" % (name, per_machine, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# bench_import.py - Time "import smax" in a fresh process, and list
+# the modules that take the longest to import (per python -X importtime).
+#
+#   PYTHONPATH=. python benchmarks/bench_import.py [count]
+
+import subprocess
+import sys
+import time
+
+
+def import_once():
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import smax"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    modules = []
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if (len(fields) != 3) or not fields[0].startswith("import time:"):
+            continue
+        try:
+            self_us = int(fields[0].split(":")[1])
+            cumulative_us = int(fields[1])
+        except ValueError:
+            continue
+        modules.append((self_us, cumulative_us, fields[2].strip()))
+    return elapsed, modules
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    runs = [import_once() for _ in range(count)]
+    elapsed, modules = min(runs)
+    total = [m for m in modules if m[2] == "smax"]
+    print("process: %.1f ms (best of %u)" % (elapsed * 1e3, count))
+    if total:
+        print("import smax: %.1f ms" % (total[0][1] / 1e3))
+    print("%10s %10s  %s" % ("self ms", "cumul ms", "module"))
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[:15]:
+        print("%10.1f %10.1f  %s" % (self_us / 1e3, cumulative_us / 1e3, name))
+
+
+if __name__ == "__main__":
+    main()
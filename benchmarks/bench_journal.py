@@ -0,0 +1,83 @@
+# bench_journal.py - Events per second with and without a Journal
+# attached, and how fast replay runs the journal back.
+#
+#   PYTHONPATH=. python benchmarks/bench_journal.py [events] [directory]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import smax
+import smax.journal
+
+r"""
+%%
+
+machine Sensor:
+    slots: _value
+    enter: self._value = None
+    *state s_waiting:
+        ev_sample(value) -> s_sampled:
+            self._value = value
+    state s_sampled:
+        ev_sample(value): self._value = value
+        ms(10) -> s_waiting
+
+%%
+"""
+
+options = {"bitset": True, "slots": True, "lean": True}
+
+
+def sensor_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Sensor
+
+
+def run(Sensor, events, journal=None):
+    reactor = smax.VirtualTimeReactor()
+    if journal is not None:
+        journal.attach(reactor)
+    sensors = [Sensor(reactor) for i in range(100)]
+    for sensor in sensors:
+        sensor.start()
+    reactor.sync()
+    start = time.perf_counter()
+    for i in range(0, events, 1000):
+        for n in range(i, min(i + 1000, events)):
+            sensors[n % 100].ev_sample(n * 0.5)
+        # a millisecond passes every 1000 events.
+        reactor.advance(0.001)
+    elapsed = time.perf_counter() - start
+    if journal is not None:
+        journal.close()
+    return events / elapsed
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+    Sensor = sensor_class()
+    print("%u events, %s" % (events, options))
+    print("no journal    %12.0f events/s" % run(Sensor, events))
+    d = tempfile.mkdtemp(dir=directory)
+    try:
+        path = os.path.join(d, "journal")
+        rate = run(Sensor, events, smax.journal.Journal(path))
+        print("journal       %12.0f events/s" % rate)
+        records = sum(1 for r in smax.journal.records(path))
+        print("records       %12u" % records)
+        start = time.perf_counter()
+        smax.journal.replay(path, lambda reactor, n: Sensor(reactor))
+        print(
+            "replay        %12.0f records/s" % (records / (time.perf_counter() - start))
+        )
+    finally:
+        shutil.rmtree(d)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# bench_load.py - Time smax.load in a fresh process with an empty
+# translation cache and with a warm one.
+#
+#   PYTHONPATH=. python benchmarks/bench_load.py [filename class_name]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def load_once(filename, class_name, cache_directory):
+    env = dict(os.environ, SMAX_CACHE_DIR=cache_directory)
+    code = (
+        "import time, smax\n"
+        "t = time.perf_counter()\n"
+        "smax.load(%r, %r)\n"
+        "print(time.perf_counter() - t)\n" % (filename, class_name)
+    )
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True
+    )
+    return float(out.stdout), time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) > 2:
+        filename, class_name = sys.argv[1], sys.argv[2]
+    else:
+        filename, class_name = "examples/intro.py", "MyStateMachine"
+    with tempfile.TemporaryDirectory() as cache_directory:
+        print("%-6s %12s %12s" % ("cache", "load ms", "process ms"))
+        for label in ("cold", "warm", "warm"):
+            load, process = load_once(filename, class_name, cache_directory)
+            print("%-6s %12.1f %12.1f" % (label, load * 1e3, process * 1e3))
+
+
+if __name__ == "__main__":
+    main()
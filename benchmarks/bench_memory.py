@@ -0,0 +1,77 @@
+# bench_memory.py - Bytes per started machine instance, for 1M
+# instances of a small machine, in each code generation mode.
+#
+#   PYTHONPATH=. python benchmarks/bench_memory.py [count]
+
+import gc
+import sys
+import time
+import tracemalloc
+
+import smax
+
+r"""
+%%
+
+machine Device:
+    slots: _online
+    enter: self._online = False
+    *state s_offline:
+        ev_online -> s_online
+    state s_online:
+        enter: self._online = True
+        exit: self._online = False
+        ev_offline -> s_offline
+
+%%
+"""
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def measure(count, options):
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    Device = smax.compile_python(smax.generate_python(spec, **options)).Device
+    reactor = NullReactor()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    before = tracemalloc.get_traced_memory()[0]
+    devices = []
+    for i in range(count):
+        device = Device(reactor)
+        device.start()
+        devices.append(device)
+        if (i & 0xFFF) == 0:
+            reactor.sync()
+    reactor.sync()
+    used = tracemalloc.get_traced_memory()[0] - before
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    # don't count the list that holds them.
+    used -= sys.getsizeof(devices)
+    del devices
+    return used / count, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    modes = [
+        ("default", {}),
+        ("slots", {"slots": True}),
+        ("slots+bitset", {"slots": True, "bitset": True}),
+        ("slots+bitset+lean", {"slots": True, "bitset": True, "lean": True}),
+    ]
+    print("%u instances" % count)
+    print("%-20s %14s %10s" % ("mode", "bytes/instance", "seconds"))
+    for name, options in modes:
+        per_instance, elapsed = measure(count, options)
+        print("%-20s %14.0f %10.1f" % (name, per_instance, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# bench_pool.py - Events per second through smax.pool.Pool with 1..N
+# worker processes, for machines whose handler does some work.
+#
+#   PYTHONPATH=. python benchmarks/bench_pool.py [machines] [events]
+
+import multiprocessing
+import sys
+import time
+
+import smax
+import smax.pool
+
+r"""
+%%
+
+machine Device:
+    enter: self._total = 0
+    *state s_running:
+        ev_sample(n):
+            # something to keep a core busy.
+            self._total += sum(i * i for i in range(n))
+
+%%
+"""
+
+source = smax.load_source(__file__)
+spec = smax.parse(source, __file__)
+Device = smax.compile_python(smax.generate_python(spec)).Device
+
+
+# The pool pickles classes by name, so it needs one it can import.
+class PooledDevice(Device):
+    pass
+
+
+def measure(processes, machines, events, work):
+    context = multiprocessing.get_context("fork")
+    with smax.pool.Pool(processes, context=context) as pool:
+        devices = [pool.create(n, PooledDevice) for n in range(machines)]
+        for f in [device.start() for device in devices]:
+            f.result()
+        start = time.perf_counter()
+        futures = [devices[i % machines].ev_sample(work) for i in range(events)]
+        for f in futures:
+            f.result()
+        return events / (time.perf_counter() - start)
+
+
+def main():
+    machines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    cores = multiprocessing.cpu_count()
+    print("%u machines, %u events, %u cores" % (machines, events, cores))
+    print("%-10s %12s %12s" % ("processes", "light ev/s", "heavy ev/s"))
+    processes = 1
+    while processes <= cores:
+        light = measure(processes, machines, events, 1)
+        heavy = measure(processes, machines, events, 2000)
+        print("%-10u %12.0f %12.0f" % (processes, light, heavy))
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
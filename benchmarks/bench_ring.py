@@ -0,0 +1,100 @@
+# bench_ring.py - Events per second from a forked producer process into
+# a machine on a reactor: pickled over a pipe, one per event, versus
+# through a smax.ring.EventRing.
+#
+#   PYTHONPATH=. python benchmarks/bench_ring.py [events]
+
+import multiprocessing
+import os
+import sys
+import time
+
+import smax
+import smax.ring
+
+r"""
+%%
+
+machine Adc:
+    enter: self._count = 0
+    *state s_running:
+        ev_sample(channel, value): self._count += 1
+
+%%
+"""
+
+options = {"bitset": True, "lean": True}
+chunk = 256
+
+
+def adc_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Adc
+
+
+def run(reactor, machine, count):
+    # SelectReactor.run, stopping once the machine has seen everything.
+    reactor.sync()
+    while machine._count < count:
+        r, w, x = reactor.select(1)
+        for fd in r:
+            reactor._r[fd]()
+        reactor.sync()
+
+
+def pipe(count):
+    reactor = smax.SelectReactor()
+    adc = adc_class()(reactor)
+    adc.start()
+    receive, send = multiprocessing.Pipe(duplex=False)
+
+    def ready():
+        while receive.poll():
+            adc.ev_sample(*receive.recv())
+
+    reactor.add_fd(receive.fileno(), ready)
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        for n in range(count):
+            send.send((n & 0xFFFF, n * 0.5))
+        os._exit(0)
+    run(reactor, adc, count)
+    elapsed = time.perf_counter() - start
+    os.waitpid(pid, 0)
+    return count / elapsed
+
+
+def ring(count):
+    reactor = smax.SelectReactor()
+    adc = adc_class()(reactor)
+    adc.start()
+    events = smax.ring.EventRing({"ev_sample": "Hd"}, records=65536)
+    events.attach(reactor, adc)
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        for n in range(0, count, chunk):
+            samples = [(i & 0xFFFF, i * 0.5) for i in range(n, min(n + chunk, count))]
+            while samples:
+                samples = samples[events.put_many("ev_sample", samples) :]
+        os._exit(0)
+    run(reactor, adc, count)
+    elapsed = time.perf_counter() - start
+    os.waitpid(pid, 0)
+    events.close()
+    events.unlink()
+    return count / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("%u events, %u cores, %s" % (count, os.cpu_count(), options))
+    print("%-8s %12s" % ("path", "events/s"))
+    for name, measure in (("pipe", pipe), ("ring", ring)):
+        print("%-8s %12.0f" % (name, measure(count)))
+
+
+if __name__ == "__main__":
+    main()
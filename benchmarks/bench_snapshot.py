@@ -0,0 +1,90 @@
+# bench_snapshot.py - Bytes per snapshot and snapshots/restores per
+# second, one at a time and through a snapshot file.
+#
+#   PYTHONPATH=. python benchmarks/bench_snapshot.py [count]
+
+import os
+import sys
+import tempfile
+import time
+
+import smax
+import smax.snapshot
+
+r"""
+%%
+
+machine Device:
+    slots: _online, _address
+    enter:
+        self._online = False
+        self._address = None
+    *state s_offline:
+        ev_online(address) -> s_online:
+            self._address = address
+    state s_online:
+        enter: self._online = True
+        exit: self._online = False
+        ev_offline -> s_offline
+        s(60) -> s_offline
+        ms(500): pass
+
+%%
+"""
+
+options = {"bitset": True, "slots": True, "lean": True}
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def device_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Device
+
+
+def rate(count, start):
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    Device = device_class()
+    reactor = NullReactor()
+    devices = []
+    for i in range(count):
+        device = Device(reactor)
+        device.start()
+        device.ev_online("10.0.%u.%u" % (i >> 8, i & 0xFF))
+        devices.append(device)
+        if (i & 0xFFF) == 0:
+            reactor.sync()
+    reactor.sync()
+    print("%u machines, %s" % (count, options))
+
+    start = time.perf_counter()
+    snapshots = [device.snapshot() for device in devices]
+    print("snapshot      %12.0f/s" % rate(count, start))
+    print("size          %12.1f bytes" % (sum(map(len, snapshots)) / count))
+    start = time.perf_counter()
+    for data in snapshots:
+        Device(reactor).restore(data)
+    print("restore       %12.0f/s" % rate(count, start))
+
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "devices.smax")
+        start = time.perf_counter()
+        smax.snapshot.save(filename, devices)
+        print("save          %12.0f/s" % rate(count, start))
+        print("file          %12u bytes" % os.path.getsize(filename))
+        start = time.perf_counter()
+        for data in smax.snapshot.load(filename):
+            Device(reactor).restore(data)
+        print("load+restore  %12.0f/s" % rate(count, start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# bench_sync.py - Measure how long Reactor.sync takes to drain a burst
+# of alarms that all expire together.
+#
+#   PYTHONPATH=. python benchmarks/bench_sync.py
+
+import time
+
+import smax
+
+
+class NullReactor(smax.Reactor):
+    def _signal(self):
+        pass
+
+
+def measure(count):
+    reactor = NullReactor()
+    callback = lambda: None  # noqa: E731
+    for i in range(count):
+        reactor.after_s(-1, callback)
+    start = time.perf_counter()
+    reactor.sync()
+    return time.perf_counter() - start
+
+
+def main():
+    print("%10s %12s %14s" % ("alarms", "ms", "us/alarm"))
+    for count in (100, 1000, 5000, 20000):
+        elapsed = measure(count)
+        print("%10u %12.2f %14.3f" % (count, elapsed * 1e3, elapsed / count * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench_threads.py - Event throughput with 8 producer threads feeding
+# one AsyncioReactor.
+#
+#   PYTHONPATH=. python benchmarks/bench_threads.py
+
+import asyncio
+import concurrent.futures
+import time
+
+import smax
+
+r"""
+%%
+
+machine Counter:
+    enter: self.count = 0
+    ev_count: self.count += 1
+
+%%
+"""
+
+
+def load():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec)).Counter
+
+
+async def measure(native, producers=8, count=20000):
+    loop = asyncio.get_running_loop()
+    reactor = smax.AsyncioReactor(loop, native=native)
+    task = asyncio.create_task(reactor.run())
+    counter = load()(reactor)
+    counter.start()
+
+    def produce():
+        for i in range(count - 1):
+            counter.ev_count()
+        # wait for the last one.
+        counter.ev_count().result()
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(producers) as executor:
+        await asyncio.gather(
+            *[loop.run_in_executor(executor, produce) for i in range(producers)]
+        )
+    elapsed = time.perf_counter() - start
+    assert counter.count == producers * count
+    reactor.stop()
+    await task
+    return producers * count / elapsed
+
+
+def main():
+    for native in (False, True):
+        rate = asyncio.run(measure(native))
+        print("%-8s %10.0f events/s" % ("native" if native else "polling", rate))
+
+
+if __name__ == "__main__":
+    main()
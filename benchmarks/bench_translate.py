@@ -0,0 +1,62 @@
+# bench_translate.py - Time parsing and code generation for synthetic
+# machines with 10 up to 10k states.
+#
+#   PYTHONPATH=. python benchmarks/bench_translate.py [max_depth]
+
+import sys
+import time
+
+import smax
+
+
+def synthetic(depth, fanout=10):
+    """
+    A tree of states, fanout wide and depth deep, so the machine
+    has about fanout**depth states.  Each state has an event
+    transition, a guarded transition and a timeout to its siblings.
+    """
+    lines = ["machine Synthetic:"]
+
+    def states(level, indent):
+        for i in range(fanout):
+            lines.extend(
+                [
+                    "%s%sstate s_%u:" % (indent, "*" if i == 0 else "", i),
+                    "%s    enter: self.count += 1" % indent,
+                    "%s    ev_next -> s_%u" % (indent, (i + 1) % fanout),
+                    "%s    ev_jump(n) [n == %u] -> s_%u"
+                    % (indent, i, (i + 7) % fanout),
+                    "%s    100ms -> s_%u" % (indent, (i + 3) % fanout),
+                ]
+            )
+            if level < depth:
+                states(level + 1, indent + "    ")
+
+    states(1, "    ")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print("%8s %12s %12s %12s" % ("states", "parse ms", "generate ms", "lines"))
+    for depth in range(1, max_depth + 1):
+        source = synthetic(depth)
+        start = time.perf_counter()
+        spec = smax.parse(source, "<synthetic>")
+        parsed = time.perf_counter()
+        python_code = smax.generate_python(spec)
+        generated = time.perf_counter()
+        machine = [s["machine"] for s in spec["spec"] if "machine" in s][0]
+        print(
+            "%8u %12.1f %12.1f %12u"
+            % (
+                len(list(machine.all_states())),
+                (parsed - start) * 1e3,
+                (generated - parsed) * 1e3,
+                python_code.count("\n"),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
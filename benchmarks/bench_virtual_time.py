@@ -0,0 +1,58 @@
+# bench_virtual_time.py - Simulated hours per second of CPU for machines
+# retrying every s(5) on a VirtualTimeReactor.
+#
+#   PYTHONPATH=. python benchmarks/bench_virtual_time.py [machines] [hours]
+
+import sys
+import time
+
+import smax
+
+r"""
+%%
+
+machine Modem:
+    slots: _tries
+    enter: self._tries = 0
+    *state s_dialing:
+        enter: self._tries += 1
+        ev_connected -> s_connected
+        s(5) -> s_dialing
+    state s_connected:
+        ev_hangup -> s_dialing
+
+%%
+"""
+
+options = {"bitset": True, "slots": True, "lean": True}
+
+
+def modem_class():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec, **options)).Modem
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    Modem = modem_class()
+    reactor = smax.VirtualTimeReactor()
+    modems = [Modem(reactor) for i in range(count)]
+    for i, modem in enumerate(modems):
+        modem.start()
+        # spread them out a bit.
+        reactor.advance(5.0 / count)
+    start = time.perf_counter()
+    reactor.advance(hours * 60 * 60)
+    elapsed = time.perf_counter() - start
+    timeouts = sum(modem._tries for modem in modems) - count
+    print("%u machines, %s" % (count, options))
+    print("simulated     %12.0f hours" % hours)
+    print("elapsed       %12.3f s" % elapsed)
+    print("timeouts      %12.0f/s" % (timeouts / elapsed))
+    print("speedup       %12.0fx" % (hours * 60 * 60 / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench_wakeup.py - Count the wakeup syscalls SelectReactor makes for
+# a burst of calls, with and without coalescing.
+#
+#   PYTHONPATH=. python benchmarks/bench_wakeup.py
+
+import threading
+import time
+
+import smax
+
+
+class CountingReactor(smax.SelectReactor):
+    def __init__(self):
+        super(CountingReactor, self).__init__()
+        self.wakeups = 0
+        self._counted_wakeup = self._wakeup
+        self._wakeup = self._count
+
+    def _count(self):
+        self.wakeups += 1
+        self._counted_wakeup()
+
+
+class UncoalescedReactor(CountingReactor):
+    """Signals on every call, like SelectReactor used to."""
+
+    def _signal(self):
+        self._wakeup()
+
+
+def same_thread(reactor_class, count):
+    reactor = reactor_class()
+    nothing = lambda: None  # noqa: E731
+
+    def produce():
+        for i in range(count):
+            reactor.call(nothing)
+        reactor.call(reactor.stop)
+
+    reactor.call(produce)
+    start = time.perf_counter()
+    reactor.run()
+    return reactor.wakeups, time.perf_counter() - start
+
+
+def cross_thread(reactor_class, count):
+    reactor = reactor_class()
+    nothing = lambda: None  # noqa: E731
+
+    def produce():
+        for i in range(count):
+            reactor.call(nothing)
+        reactor.call(reactor.stop)
+
+    thread = threading.Thread(target=produce)
+    reactor.call(thread.start)
+    start = time.perf_counter()
+    reactor.run()
+    thread.join()
+    return reactor.wakeups, time.perf_counter() - start
+
+
+def main():
+    # calls per burst; wakeups counts the writes to the control
+    # descriptor, one per call uncoalesced (a full pipe just drops
+    # them), and ms is how long the reactor took to run them all.
+    count = 50000
+    print("%-14s %-12s %10s %10s" % ("producer", "reactor", "wakeups", "ms"))
+    for name, test in (("same thread", same_thread), ("cross thread", cross_thread)):
+        for reactor_class in (UncoalescedReactor, CountingReactor):
+            wakeups, elapsed = test(reactor_class, count)
+            label = "coalesced" if reactor_class is CountingReactor else "uncoalesced"
+            print("%-14s %-12s %10u %10.1f" % (name, label, wakeups, elapsed * 1e3))
+
+
+if __name__ == "__main__":
+    main()
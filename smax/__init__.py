@@ -1,18 +1,24 @@
 # This file is part of the smax project (http://github.com/baymotion/smax)
 # and is copyrighted under GPL v3 or later.
 
+import os
 import types
 
+from . import cache
 from .parser import load_source
-from .reactor import Reactor  # noqa: F401
+from .reactor import Reactor, LivelockError  # noqa: F401
 from .asyncio_reactor import AsyncioReactor  # noqa: F401
 from .select_reactor import SelectReactor  # noqa: F401
+from .epoll_reactor import EpollReactor  # noqa: F401
+from .virtual_time_reactor import VirtualTimeReactor  # noqa: F401
 from .translate import parse, generate_python, translate  # noqa: F401
+from .fleet import Fleet  # noqa: F401
 
 
 def compile_python(python_code, module_name="state_machine"):
     """
-    Returns a module with the given name.
+    Returns a module with the given name; python_code
+    may be source text or a compiled code object.
     """
     # Create the module we're return with
     m = types.ModuleType(module_name)
@@ -23,31 +29,53 @@ def compile_python(python_code, module_name="state_machine"):
     return m
 
 
-def _load(filename):
+def _load(filename, options=None):
     """We cache the compiled results from filename
     so you can get other machine class implementations
-    from this same file quickly.
+    from this same file quickly.  Translations are also
+    kept on disk (see smax.cache) so other processes
+    loading the same source don't have to redo them.
+    options are the code generation options (see
+    smax.translate.default_options).
     """
     global smax_modules
-    source, spec, python_code, module = smax_modules.get(
-        filename, (None, None, None, None)
-    )
-    if source is None:
-        source = load_source(filename)
+    options = options or {}
+    k = (filename, tuple(sorted(options.items())))
+    # Reuse what we have unless the file's changed since.
+    st = os.stat(filename)
+    stamp = (st.st_mtime_ns, st.st_size)
+    found = smax_modules.get(k)
+    if (found is not None) and (found[0] == stamp):
+        return found[1]
+    source = load_source(filename)
+    spec = None
+    cached = cache.get(source, filename, options)
+    if cached is not None:
+        python_code, code = cached
+    else:
         spec = parse(source, filename)
-        python_code = generate_python(spec)
-        module = compile_python(python_code)
-    return source, spec, python_code, module
+        python_code = generate_python(spec, **options)
+        code = None
+    if code is None:
+        code = compile(python_code, "<string>", "exec")
+        cache.put(source, filename, python_code, code, options)
+    module = compile_python(code)
+    loaded = (source, spec, python_code, module)
+    smax_modules[k] = (stamp, loaded)
+    return loaded
 
 
-def load(filename, class_name, save_generated_python=lambda s: None):
-    source, spec, python_code, module = _load(filename)
+def load(filename, class_name, save_generated_python=lambda s: None, **options):
+    source, spec, python_code, module = _load(filename, options)
     save_generated_python(python_code)
     return module.__dict__[class_name]
 
 
 def spec(filename):
     source, spec, python_code, module = _load(filename)
+    if spec is None:
+        # the translation came from the cache.
+        spec = parse(source, filename)
     return spec
 
 
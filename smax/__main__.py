@@ -92,6 +92,33 @@ def main():
         "--plantuml",
         help="Plantuml state machine filename to write",
     )
+    parser.add_argument(
+        "--bitset",
+        action="store_true",
+        help="Track active states in an int bitmask",
+    )
+    parser.add_argument(
+        "--dispatch",
+        choices=["chain", "table"],
+        default="chain",
+        help="How events find the inner state that handles them",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Skip diagnostic hooks unless debugging or overridden",
+    )
+    parser.add_argument(
+        "--microstep-limit",
+        type=int,
+        default=1000,
+        help="Default transitions allowed in a row before LivelockError",
+    )
+    parser.add_argument(
+        "--slots",
+        action="store_true",
+        help="Give the generated classes __slots__",
+    )
     parser.add_argument(
         "input",
         help="input script; use '-' for standard input.",
@@ -102,7 +129,15 @@ def main():
 
     filename = "/dev/stdin" if args.input == "-" else args.input
     source = smax.load_source(filename)
-    spec, code = smax.translate(source, filename)
+    spec, code = smax.translate(
+        source,
+        filename,
+        bitset=args.bitset,
+        dispatch=args.dispatch,
+        lean=args.lean,
+        microstep_limit=args.microstep_limit,
+        slots=args.slots,
+    )
 
     if args.python:
         python_filename = "/dev/stdout" if args.python == "-" else args.python
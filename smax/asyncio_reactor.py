@@ -2,25 +2,59 @@
 # and is copyrighted under GPL v3 or later.
 
 import asyncio
+import concurrent.futures
 import smax
+import threading
 import smax.log as log
+from smax.reactor import Alarm
+
+
+class LoopAlarm(Alarm):
+    """Alarm that's scheduled directly on the asyncio event loop."""
+
+    __slots__ = ("handle",)
 
 
 class AsyncioReactor(smax.Reactor):
+    """
+    Reactor that runs state machines under asyncio.  By default, run()
+    is a task that waits for a signal or the next alarm and then calls
+    sync().  With native=True, there's no such task: after_s maps
+    straight onto loop.call_at, cancel_after onto TimerHandle.cancel,
+    and queued calls are drained by a single loop.call_soon callback,
+    so machine timers cost about the same as any other asyncio timer.
+
+    Events may be called from other threads.  Those calls are collected
+    in the reactor's inbox and handed to the loop with one
+    call_soon_threadsafe per batch; the event methods then return a
+    concurrent.futures.Future instead of an asyncio future.
+    """
+
     update = b"U"
 
-    def __init__(self, event_loop):
+    def __init__(self, event_loop, max_callbacks=None, native=False):
         self._signal_queue = asyncio.Queue()
         self._event_loop = event_loop
-        super(AsyncioReactor, self).__init__()
+        self._native = native
+        self._drain_scheduled = False
+        self._wakeup_pending = False
+        self._loop_alarms = 0
+        self._stopped = None
+        super(AsyncioReactor, self).__init__(max_callbacks)
 
     async def run(self):
+        self._thread = threading.get_ident()
+        if self._native:
+            self._stopped = self._event_loop.create_future()
+            self._signal()
+            await self._stopped
+            return
         while True:
             timeout = self.sync()
             if self.done():
                 return
             # timeout may be None
-            log.trace("timeout=%s." % timeout)
+            log.trace("timeout=%s.", timeout)
             try:
                 # we ignore the returned value here;
                 # it's always self.update.
@@ -29,16 +63,95 @@ class AsyncioReactor(smax.Reactor):
                 pass
 
     def _signal(self):
+        if threading.get_ident() != self._thread:
+            # Only the first call of a batch needs to poke the loop.
+            if not self._wakeup_pending:
+                self._wakeup_pending = True
+                self._event_loop.call_soon_threadsafe(self._wake)
+            return
+        if self._native:
+            if not self._drain_scheduled:
+                self._drain_scheduled = True
+                self._event_loop.call_soon(self._drain)
+            return
         self._signal_queue.put_nowait(self.update)
 
-    def _run_event(self, machine, ev):
-        future = self._event_loop.create_future()
-        self.call(self._do_run_event, future, machine, ev)
+    def _wake(self):
+        # Clear the flag before signalling: anything added to the
+        # inbox after this point either sees the flag clear and
+        # wakes us again, or gets picked up by the sync we trigger.
+        self._thread = threading.get_ident()
+        self._wakeup_pending = False
+        self._signal()
+
+    def _drain(self):
+        self._drain_scheduled = False
+        # sync returns 0 when it stopped early because of max_callbacks.
+        if self.sync() == 0:
+            self._signal()
+
+    def after_s(self, seconds, callback, *args):
+        if not self._native:
+            return super(AsyncioReactor, self).after_s(seconds, callback, *args)
+        trigger = self.time() + seconds
+        r = LoopAlarm(trigger, callback, args)
+        log.trace("after_s cb=%s.", callback)
+        r.handle = self._event_loop.call_at(trigger, self._fire, r)
+        self._loop_alarms += 1
+        return r
+
+    def cancel_after(self, r):
+        if not self._native:
+            return super(AsyncioReactor, self).cancel_after(r)
+        if (r is None) or not r.pending:
+            return
+        r.pending = False
+        r.handle.cancel()
+        self._loop_alarms -= 1
+
+    def time(self):
+        if not self._native:
+            return super(AsyncioReactor, self).time()
+        return self._event_loop.time()
+
+    def pending_alarms(self):
+        if self._native:
+            return self._loop_alarms
+        return super(AsyncioReactor, self).pending_alarms()
+
+    def _fire(self, alarm):
+        if self.done() or not alarm.pending:
+            return
+        alarm.pending = False
+        self._loop_alarms -= 1
+        log.trace("alarm cb=%s.", alarm.callback)
+        alarm.callback(*alarm.args)
+
+    def stop(self):
+        if threading.get_ident() != self._thread:
+            self._event_loop.call_soon_threadsafe(self.stop)
+            return
+        super(AsyncioReactor, self).stop()
+        if (self._stopped is not None) and not self._stopped.done():
+            self._stopped.set_result(None)
+
+    def _run_event(self, machine, ev, *args):
+        if self.journal is not None:
+            # so it's recorded when it's delivered.
+            args = (ev,) + args
+            ev = self.journal.deliver
+        if threading.get_ident() == self._thread:
+            future = self._event_loop.create_future()
+        else:
+            future = concurrent.futures.Future()
+        self.call(self._do_run_event, future, machine, ev, args)
         return future
 
-    def _do_run_event(self, future, machine, ev):
+    def _do_run_event(self, future, machine, ev, args):
+        if future.cancelled():
+            return
         try:
-            r = ev(machine)
+            r = ev(machine, *args)
             future.set_result(r)
         except Exception as e:
             future.set_exception(e)
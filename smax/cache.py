@@ -0,0 +1,144 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# cache.py - Keeps translated state machines on disk so that smax.load
+# doesn't have to parse and generate them again.
+#
+# Entries are named by a hash of the machine source, the filename it
+# came from, the smax version, and the parser and translator sources
+# themselves; so any change to the input or to smax gets a new entry
+# instead of a stale one.  Each entry is the generated python (.py) plus
+# its marshalled code object (.<cache_tag>.code), which only the same
+# python version can read.  Files are written to a temporary name and
+# renamed into place, so concurrent processes never see a partial entry.
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+import smax.log as log
+from smax.__version__ import __version__
+
+# Set to False to disable the cache.
+enabled = True
+# Where entries go; None means $SMAX_CACHE_DIR, or smax under
+# $XDG_CACHE_HOME (~/.cache by default).
+directory = None
+
+_fingerprint = None
+
+
+def cache_directory():
+    if directory is not None:
+        return directory
+    d = os.environ.get("SMAX_CACHE_DIR")
+    if d:
+        return d
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "smax")
+
+
+def fingerprint():
+    """Identifies this version of the parser and code generator."""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256(__version__.encode("utf-8"))
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in ("parser.py", "translate.py"):
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def key(source, filename, options=None):
+    h = hashlib.sha256(fingerprint().encode("utf-8"))
+    h.update(b"\0")
+    h.update(filename.encode("utf-8"))
+    h.update(b"\0")
+    h.update(repr(sorted((options or {}).items())).encode("utf-8"))
+    h.update(b"\0")
+    h.update(source.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _paths(k):
+    d = cache_directory()
+    tag = sys.implementation.cache_tag or "nocache"
+    return (
+        os.path.join(d, "%s.py" % k),
+        os.path.join(d, "%s.%s.code" % (k, tag)),
+    )
+
+
+def get(source, filename, options=None):
+    """
+    Returns (python_code, code_object) for this source, or None
+    if it isn't cached.  code_object is None if only the generated
+    python is available (e.g. it was cached by a different python).
+    """
+    if not enabled:
+        return None
+    python_filename, code_filename = _paths(key(source, filename, options))
+    try:
+        with open(python_filename, "rt") as f:
+            python_code = f.read()
+    except OSError:
+        return None
+    code = None
+    try:
+        with open(code_filename, "rb") as f:
+            code = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        log.trace("No usable code object for %s (%s).", filename, e)
+    log.trace("Cache hit for %s.", filename)
+    return python_code, code
+
+
+def put(source, filename, python_code, code, options=None):
+    """Stores an entry; failing to write it is not an error."""
+    if not enabled:
+        return
+    python_filename, code_filename = _paths(key(source, filename, options))
+    try:
+        os.makedirs(os.path.dirname(python_filename), exist_ok=True)
+        _write(code_filename, marshal.dumps(code))
+        # The .py goes last; get() treats it as the sign the entry exists.
+        _write(python_filename, python_code.encode("utf-8"))
+    except OSError as e:
+        log.trace("Can't cache %s (%s).", filename, e)
+
+
+def _write(filename, data):
+    fd, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(filename), prefix=".tmp-", suffix=".smax"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def clear():
+    """Removes every entry from the cache directory."""
+    d = cache_directory()
+    try:
+        names = os.listdir(d)
+    except OSError:
+        return
+    for name in names:
+        # only our own entries: a sha256 followed by .py or .code
+        if len(name.split(".")[0]) != 64:
+            continue
+        if name.endswith(".py") or name.endswith(".code"):
+            try:
+                os.unlink(os.path.join(d, name))
+            except OSError:
+                pass
@@ -0,0 +1,105 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+import select
+import smax
+
+
+class EpollReactor(smax.SelectReactor):
+    """
+    SelectReactor that waits with epoll instead of select, so it
+    isn't limited to FD_SETSIZE descriptors and the cost of a wakeup
+    doesn't grow with the number of registered descriptors.  Only
+    available where select.epoll is (i.e. linux).
+
+    add_fd and add_write_fd register with epoll directly, so each
+    registration change is a single epoll_ctl call.  By default
+    descriptors are level-triggered, just like select; pass
+    edge_triggered=True (to the constructor for a default, or to
+    add_fd/add_write_fd for one descriptor) to get EPOLLET, in which
+    case your callback must read or write until EAGAIN.
+    """
+
+    def __init__(self, max_callbacks=None, edge_triggered=False, inline_events=False):
+        self._epoll = select.epoll()
+        self._edge_triggered = edge_triggered
+        # fd -> True if that fd is edge-triggered
+        self._edge = {}
+        # fd -> the mask we've registered with epoll
+        self._mask = {}
+        super(EpollReactor, self).__init__(max_callbacks, inline_events)
+        # The wakeup fd is always drained completely, but keep
+        # it level-triggered so it can't get stuck.
+        self._edge[self._control_read] = False
+        self._update(self._control_read)
+
+    def select(self, timeout):
+        r, w, x = [], [], []
+        if timeout is None:
+            timeout = -1
+        # Like select, report a descriptor that's hung up or has an
+        # error as readable and writable, so its callbacks find out;
+        # epoll would otherwise keep reporting it.
+        trouble = select.EPOLLHUP | select.EPOLLERR
+        for fd, events in self._epoll.poll(timeout):
+            if events & (select.EPOLLIN | trouble):
+                if fd in self._r:
+                    r.append(fd)
+            if events & (select.EPOLLOUT | trouble):
+                if fd in self._w:
+                    w.append(fd)
+            if events & select.EPOLLPRI:
+                if fd in self._x:
+                    x.append(fd)
+        return r, w, x
+
+    def _update(self, fd):
+        mask = 0
+        if fd in self._r:
+            mask |= select.EPOLLIN
+        if fd in self._w:
+            mask |= select.EPOLLOUT
+        if fd in self._x:
+            mask |= select.EPOLLPRI
+        if mask and self._edge.get(fd, self._edge_triggered):
+            mask |= select.EPOLLET
+        registered = self._mask.get(fd)
+        if mask == registered:
+            return
+        if not mask:
+            del self._mask[fd]
+            self._edge.pop(fd, None)
+            self._epoll.unregister(fd)
+            return
+        self._mask[fd] = mask
+        if registered is None:
+            self._epoll.register(fd, mask)
+        else:
+            self._epoll.modify(fd, mask)
+
+    def add_fd(self, fd, read_callback, edge_triggered=None):
+        if edge_triggered is not None:
+            self._edge[fd] = edge_triggered
+        self._r[fd] = read_callback
+        self._update(fd)
+        self._signal()
+
+    def remove_fd(self, fd):
+        del self._r[fd]
+        self._update(fd)
+        self._signal()
+
+    def add_write_fd(self, fd, write_callback, edge_triggered=None):
+        if edge_triggered is not None:
+            self._edge[fd] = edge_triggered
+        self._w[fd] = write_callback
+        self._update(fd)
+        self._signal()
+
+    def remove_write_fd(self, fd):
+        del self._w[fd]
+        self._update(fd)
+        self._signal()
+
+    def close(self):
+        self._epoll.close()
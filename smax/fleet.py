@@ -0,0 +1,287 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# fleet.py - Many instances of one state machine class, stored in columns.
+#
+# A Fleet keeps what's different between its machines in arrays indexed
+# by machine number: which configuration (set of active states) each is
+# in, its running flag, its pending timeouts and its "slots:" attributes.
+# The code (and everything else) is shared.  To handle an event, the
+# fleet loads one machine's record into a single instance of the
+# generated class (the cursor), runs the generated handler on it, and
+# stores the record back.  A machine that's idle in a state without
+# timeouts costs a handful of bytes.
+#
+# The machine class has to be generated with bitset=True, so that its
+# configuration is a single int; configurations are interned so that
+# each machine only keeps a small ID for it.  It also has to be
+# generated with slots=True, so that there's nowhere but the columns
+# for a machine to keep anything.
+
+import array
+
+import smax.log as log
+from smax.reactor import _broadcast_handler
+
+
+class Fleet(object):
+    """
+    count instances of machine_class, numbered 0 to count-1.  Each
+    attribute declared with "slots:" gets a column; by default it's a
+    list (initially all None), but passing columns={name: typecode}
+    makes it an array.array of that type, initially all 0.
+    """
+
+    def __init__(self, machine_class, reactor, count, columns=None, debug_enable=False):
+        generated = _generated_class(machine_class)
+        self._reactor = reactor
+        self._count = count
+        columns = columns or {}
+        unknown = sorted(set(columns) - set(generated._state_machine_slots))
+        if unknown:
+            raise ValueError(
+                "%s doesn't declare slot(s) %s."
+                % (generated.__name__, ", ".join(unknown))
+            )
+        self._columns = {}
+        for name in generated._state_machine_slots:
+            if name in columns:
+                self._columns[name] = array.array(columns[name], [0]) * count
+            else:
+                self._columns[name] = [None] * count
+        # Active state bitmasks (and, for dispatch="table", the region
+        # list that goes with each) by configuration ID.
+        self._configurations = [(0, None)]
+        self._configuration_ids = {0: 0}
+        self._configuration = array.array("I", [0]) * count
+        self._valid = bytearray(count)
+        # Timeout handles, by machine number, for machines that have
+        # any pending.  A machine that doesn't gets _scratch, which
+        # says every state has none; so it's right whichever states
+        # that machine is in.
+        self._timeouts = {}
+        self._no_timeouts = [()] * len(generated._state_names)
+        self._scratch = list(self._no_timeouts)
+        # handlers for the events declared with "coalesce:"
+        self._coalesce = {
+            generated._state_machine_handlers[name]
+            for name in generated._state_machine_coalesce
+        }
+        cursor_class = _cursor_class(machine_class, generated, self)
+        cursor = cursor_class.__new__(cursor_class)
+        if hasattr(cursor, "__dict__"):
+            # Anything the machine kept there would be shared by
+            # every machine in the fleet.
+            raise ValueError(
+                "Fleets need a machine generated with slots=True, and "
+                "subclasses of it that define __slots__; %s has a __dict__."
+                % machine_class.__name__
+            )
+        self._cursor = cursor
+        generated.__init__(cursor, reactor, debug_enable)
+        cursor._fleet = self
+        cursor._index = None
+        self._table = hasattr(cursor, "_region")
+        if self._table:
+            self._configurations[0] = (0, tuple(cursor._region))
+
+    def __len__(self):
+        return self._count
+
+    def start(self, index=None):
+        """Starts machine index, or all of them."""
+        indices = range(self._count) if index is None else (index,)
+        start = type(self._cursor).start
+        for i in indices:
+            self._run(i, start)
+
+    def end(self, index=None):
+        """Ends machine index, or all of them."""
+        indices = range(self._count) if index is None else (index,)
+        end = type(self._cursor).end
+        for i in indices:
+            self._run(i, end)
+
+    def dispatch(self, index, event_name, *args):
+        """Sends event_name(*args) to machine index, via the reactor."""
+        handler = self._cursor._state_machine_handlers[event_name]
+        return self._queue(index, handler, args)
+
+    def broadcast(self, event_name, *args, indices=None):
+        """
+        Sends event_name(*args) to every machine, or to those in
+        indices, in order, with one queued callback for the lot.
+        Machines that aren't running are skipped; if a handler
+        raises, the rest still get the event, then the first error
+        is raised.
+        """
+        self._reactor.call(self._broadcast, event_name, args, indices)
+
+    def _broadcast(self, event_name, args, indices):
+        handler = self._cursor._state_machine_handlers[event_name]
+        if indices is None:
+            indices = range(self._count)
+        # Decide once per configuration whether its machines
+        # would just ignore the event; skip those.
+        handled = _broadcast_handler(type(self._cursor), event_name)[1]
+        if (handled is None) or self._cursor._state_machine_debug_enable:
+            wanted = None
+        else:
+            wanted = {
+                c
+                for c, (active, region) in enumerate(self._configurations)
+                if active & handled
+            }
+            if len(wanted) == len(self._configurations):
+                wanted = None
+        configuration = self._configuration
+        valid = self._valid
+        run = self._run
+        error = None
+        for i in indices:
+            if not valid[i]:
+                continue
+            if (wanted is None) or (configuration[i] in wanted):
+                try:
+                    run(i, handler, *args)
+                except Exception as e:
+                    if error is None:
+                        error = e
+        if error is not None:
+            raise error
+
+    def _queue(self, index, handler, args):
+        if handler in self._coalesce:
+            return self._reactor._coalesce_event(
+                (id(self), index, handler), self, Fleet._run, index, handler, *args
+            )
+        return self._reactor._run_event(self, Fleet._run, index, handler, *args)
+
+    def state(self, index):
+        """Names of the states machine index is in."""
+        active = self._configurations[self._configuration[index]][0]
+        return [
+            name
+            for n, name in enumerate(self._cursor._state_names)
+            if (active >> n) & 1
+        ]
+
+    def in_state(self, index, state_name):
+        active = self._configurations[self._configuration[index]][0]
+        return bool(active & self._cursor._state_bits[state_name])
+
+    def column(self, name):
+        """The list or array holding attribute name for every machine."""
+        return self._columns[name]
+
+    def configurations(self):
+        """Number of distinct configurations seen so far."""
+        return len(self._configurations)
+
+    def _run(self, index, function, *args):
+        """Calls function(cursor, *args) with machine index loaded."""
+        cursor = self._cursor
+        if cursor._index is not None:
+            raise RuntimeError(
+                "Fleet is already running machine %u, can't run %u."
+                % (cursor._index, index)
+            )
+        if not (0 <= index < self._count):
+            raise IndexError("No machine %s in this fleet." % (index,))
+        log.trace("fleet index=%u function=%s.", index, function)
+        cursor._index = index
+        active, region = self._configurations[self._configuration[index]]
+        cursor._active = active
+        if region is not None:
+            cursor._region = list(region)
+        timeouts = self._timeouts.get(index)
+        cursor._timeouts = self._scratch if timeouts is None else timeouts
+        cursor._is_valid = bool(self._valid[index])
+        try:
+            return function(cursor, *args)
+        finally:
+            self._store(index)
+
+    def _store(self, index):
+        cursor = self._cursor
+        active = cursor._active
+        c = self._configuration_ids.get(active)
+        if c is None:
+            c = len(self._configurations)
+            region = tuple(cursor._region) if self._table else None
+            self._configurations.append((active, region))
+            self._configuration_ids[active] = c
+        self._configuration[index] = c
+        timeouts = cursor._timeouts
+        if timeouts is self._scratch:
+            if any(timeouts):
+                self._timeouts[index] = timeouts
+                self._scratch = list(self._no_timeouts)
+            elif None in timeouts:
+                # exited states leave None behind.
+                timeouts[:] = self._no_timeouts
+        elif not any(timeouts):
+            del self._timeouts[index]
+        self._valid[index] = cursor._is_valid
+        cursor._state_machine_pending = ()
+        cursor._index = None
+
+
+def _generated_class(machine_class):
+    for c in machine_class.__mro__:
+        if "_state_machine_handlers" in c.__dict__:
+            if not hasattr(c, "_state_bits"):
+                raise ValueError(
+                    "Fleets need a machine generated with bitset=True; "
+                    "%s isn't." % c.__name__
+                )
+            return c
+    raise ValueError("%s isn't a generated state machine." % machine_class.__name__)
+
+
+def _cursor_class(machine_class, generated, fleet):
+    def call(self, cb, *args):
+        # Callbacks on this machine run once it's loaded again.
+        if getattr(cb, "__self__", None) is self:
+            self._reactor.call(self._fleet._run, self._index, cb.__func__, *args)
+        else:
+            self._reactor.call(cb, *args)
+
+    def _state_machine_call_after_s(self, seconds, callback, context):
+        return self._reactor.after_s(
+            seconds, self._fleet._run, self._index, callback.__func__
+        )
+
+    def _state_machine_call_after_ms(self, ms, callback, context):
+        return self._reactor.after_ms(
+            ms, self._fleet._run, self._index, callback.__func__
+        )
+
+    namespace = {
+        "__slots__": ("_fleet", "_index"),
+        "call": call,
+        "_state_machine_call_after_s": _state_machine_call_after_s,
+        "_state_machine_call_after_ms": _state_machine_call_after_ms,
+    }
+    for name, handler in generated._state_machine_handlers.items():
+        namespace[name] = _event(handler)
+    for name in generated._state_machine_slots:
+        namespace[name] = _column(fleet._columns[name])
+    return type("%sFleet" % machine_class.__name__, (machine_class,), namespace)
+
+
+def _event(handler):
+    def event(self, *args):
+        return self._fleet._queue(self._index, handler, args)
+
+    return event
+
+
+def _column(column):
+    def get(self):
+        return column[self._index]
+
+    def set(self, value):
+        column[self._index] = value
+
+    return property(get, set)
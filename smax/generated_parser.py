@@ -0,0 +1,702 @@
+# Generated from the grammar in smax/parser.py by "python -m smax.parser";
+# don't edit this file.
+# flake8: noqa
+# Begin -- grammar generated by Yapps
+from __future__ import print_function
+import sys, re
+from yapps import runtime
+
+
+class state_machineScanner(runtime.Scanner):
+    patterns = [
+        ("r'\\.'", re.compile("\\.")),
+        ("','", re.compile(",")),
+        ("':'", re.compile(":")),
+        ("'='", re.compile("=")),
+        (
+            "INDENT",
+            re.compile(
+                "faking out the scanner with something that shouldnt ever match, part 1"
+            ),
+        ),
+        (
+            "DEDENT",
+            re.compile(
+                "faking out the scanner with something that shouldnt ever match, part 2"
+            ),
+        ),
+        (
+            "INDENTED_CODE",
+            re.compile(
+                "faking out the scanner with something that shouldnt ever match, part 3"
+            ),
+        ),
+        ("MACHINE", re.compile("machine")),
+        ("STATE", re.compile("state")),
+        ("PASS", re.compile("pass")),
+        ("ENTER", re.compile("enter")),
+        ("EXIT", re.compile("exit")),
+        ("SLOTS", re.compile("slots")),
+        ("COALESCE", re.compile("coalesce")),
+        ("FROM", re.compile("from")),
+        ("IMPORT", re.compile("import")),
+        ("IS", re.compile("is")),
+        ("START", re.compile("\\*")),
+        ("AND", re.compile("---")),
+        ("TRANSITION", re.compile("->")),
+        ("OPEN_BRACKET", re.compile("\\[")),
+        ("CLOSE_BRACKET", re.compile("\\]")),
+        ("NONBRACKET", re.compile("[^\\[\\]]*")),
+        ("OPEN_PAREN", re.compile("\\(")),
+        ("CLOSE_PAREN", re.compile("\\)")),
+        ("NONPAREN", re.compile("[^\\(\\)]*")),
+        ("MS", re.compile("ms")),
+        ("S", re.compile("s")),
+        ("EOF", re.compile("$")),
+        ("UP", re.compile("\\^")),
+        ("FLOAT0", re.compile("[0-9]+\\.[0-9]*")),
+        ("FLOAT1", re.compile("[0-9]*\\.[0-9]+")),
+        ("INT", re.compile("[0-9]+")),
+        ("NAME", re.compile("[\\w]+")),
+        ("TOEOL", re.compile(".*")),
+        ("#.*", re.compile("#.*")),
+        ("[ \\r\\t\\n]+", re.compile("[ \\r\\t\\n]+")),
+    ]
+
+    def __init__(self, str, *args, **kw):
+        runtime.Scanner.__init__(
+            self,
+            None,
+            {
+                "#.*": None,
+                "[ \\r\\t\\n]+": None,
+            },
+            str,
+            *args,
+            **kw
+        )
+
+
+class state_machine(runtime.Parser):
+    Context = runtime.Context
+
+    def machine_spec(self, spec, _parent=None):
+        _context = self.Context(_parent, self._scanner, "machine_spec", [spec])
+        while (
+            self._peek("EOF", "MACHINE", "NAME", "IMPORT", "FROM", context=_context)
+            != "EOF"
+        ):
+            _token = self._peek("MACHINE", "NAME", "IMPORT", "FROM", context=_context)
+            if _token == "MACHINE":
+                machine = self.machine(spec, _context)
+            elif _token == "NAME":
+                constant = self.constant(spec, _context)
+            else:  # in ['IMPORT', 'FROM']
+                import_ = self.import_(spec, _context)
+        EOF = self._scan("EOF", context=_context)
+        return spec.spec()
+
+    def constant(self, spec, _parent=None):
+        _context = self.Context(_parent, self._scanner, "constant", [spec])
+        NAME = self._scan("NAME", context=_context)
+        self._scan("'='", context=_context)
+        TOEOL = self._scan("TOEOL", context=_context)
+        return spec.constant(NAME.strip(), TOEOL.strip())
+
+    def import_(self, spec, _parent=None):
+        _context = self.Context(_parent, self._scanner, "import_", [spec])
+        _token = self._peek("IMPORT", "FROM", context=_context)
+        if _token == "IMPORT":
+            IMPORT = self._scan("IMPORT", context=_context)
+            TOEOL = self._scan("TOEOL", context=_context)
+            return spec.import_("import %s" % TOEOL.strip())
+        else:  # == 'FROM'
+            FROM = self._scan("FROM", context=_context)
+            TOEOL = self._scan("TOEOL", context=_context)
+            return spec.import_("from %s" % TOEOL.strip())
+
+    def machine(self, spec, _parent=None):
+        _context = self.Context(_parent, self._scanner, "machine", [spec])
+        superclass = "object"
+        MACHINE = self._scan("MACHINE", context=_context)
+        machine_name = self.machine_name(_context)
+        if self._peek("OPEN_PAREN", "':'", context=_context) == "OPEN_PAREN":
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            NAME = self._scan("NAME", context=_context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+            superclass = NAME
+        self._scan("':'", context=_context)
+        machine = spec.machine(machine_name, superclass)
+        context = machine.context()
+        states = []
+        INDENT = self._scan("INDENT", context=_context)
+        while self._peek(
+            "DEDENT",
+            "AND",
+            "STATE",
+            "ENTER",
+            "EXIT",
+            "SLOTS",
+            "COALESCE",
+            "START",
+            "NAME",
+            "PASS",
+            "OPEN_BRACKET",
+            "TRANSITION",
+            "MS",
+            "S",
+            context=_context,
+        ) not in ["DEDENT", "PASS", "OPEN_BRACKET", "TRANSITION", "MS", "S"]:
+            _token = self._peek(
+                "AND",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "SLOTS",
+                "COALESCE",
+                "START",
+                "NAME",
+                context=_context,
+            )
+            if _token in ["STATE", "START"]:
+                state_decl = self.state_decl(context, _context)
+                states.append(state_decl)
+            elif _token == "ENTER":
+                enter_clause = self.enter_clause(_context)
+                machine.set_enter(enter_clause)
+            elif _token == "EXIT":
+                exit_clause = self.exit_clause(_context)
+                machine.set_exit(exit_clause)
+            elif _token == "SLOTS":
+                slots_clause = self.slots_clause(_context)
+                machine.add_slots(slots_clause)
+            elif _token == "COALESCE":
+                coalesce_clause = self.coalesce_clause(_context)
+                machine.add_coalesce(coalesce_clause)
+            elif _token == "NAME":
+                transition = self.transition(machine.context(), _context)
+            else:  # == 'AND'
+                AND = self._scan("AND", context=_context)
+                if len(states):
+                    context.state_machine(states)
+                    states = []
+                    context = machine.context()
+        DEDENT = self._scan("DEDENT", context=_context)
+        if len(states):
+            context.state_machine(states)
+        machine.check()
+
+    def state_decl(self, context, _parent=None):
+        _context = self.Context(_parent, self._scanner, "state_decl", [context])
+        start = self.start(_context)
+        STATE = self._scan("STATE", context=_context)
+        state_name = self.state_name(_context)
+        self._scan("':'", context=_context)
+        state = context.state(state_name, start)
+        states = []
+        inner_context = state.new_context()
+        INDENT = self._scan("INDENT", context=_context)
+        while self._peek(
+            "DEDENT",
+            "PASS",
+            "AND",
+            "STATE",
+            "ENTER",
+            "EXIT",
+            "OPEN_BRACKET",
+            "TRANSITION",
+            "NAME",
+            "MS",
+            "S",
+            "START",
+            "SLOTS",
+            "COALESCE",
+            context=_context,
+        ) not in ["DEDENT", "SLOTS", "COALESCE"]:
+            _token = self._peek(
+                "PASS",
+                "AND",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                context=_context,
+            )
+            if _token == "NAME":
+                transition = self.transition(state, _context)
+            elif _token in ["MS", "S"]:
+                timeout = self.timeout(state, _context)
+            elif _token in ["STATE", "START"]:
+                state_decl = self.state_decl(inner_context, _context)
+                states.append(state_decl)
+            elif _token == "ENTER":
+                enter_clause = self.enter_clause(_context)
+                state.set_enter(enter_clause)
+            elif _token == "EXIT":
+                exit_clause = self.exit_clause(_context)
+                state.set_exit(exit_clause)
+            elif _token not in ["PASS", "AND"]:
+                default_transition = self.default_transition(state, _context)
+            elif _token == "PASS":
+                PASS = self._scan("PASS", context=_context)
+            else:  # == 'AND'
+                AND = self._scan("AND", context=_context)
+                if len(states):
+                    inner_context.state_machine(states)
+                    states = []
+                    inner_context = state.new_context()
+        DEDENT = self._scan("DEDENT", context=_context)
+        if len(states):
+            inner_context.state_machine(states)
+        return state
+
+    def start(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "start", [])
+        r = False
+        if self._peek("START", "STATE", context=_context) == "START":
+            START = self._scan("START", context=_context)
+            r = True
+        return r
+
+    def transition(self, state, _parent=None):
+        _context = self.Context(_parent, self._scanner, "transition", [state])
+        event_args = []
+        condition = None
+        state_target = None
+        code_clause = None
+        superclasses = []
+        event_name = self.event_name(_context)
+        if (
+            self._peek(
+                "OPEN_PAREN",
+                "OPEN_BRACKET",
+                "IS",
+                "TRANSITION",
+                "':'",
+                context=_context,
+            )
+            == "OPEN_PAREN"
+        ):
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            event_args = self.event_args(_context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+        while (
+            self._peek("OPEN_BRACKET", "TRANSITION", "':'", "IS", context=_context)
+            == "IS"
+        ):
+            superclass = self.superclass(superclasses, _context)
+        if (
+            self._peek("OPEN_BRACKET", "TRANSITION", "':'", context=_context)
+            == "OPEN_BRACKET"
+        ):
+            OPEN_BRACKET = self._scan("OPEN_BRACKET", context=_context)
+            condition = self.condition(_context)
+            CLOSE_BRACKET = self._scan("CLOSE_BRACKET", context=_context)
+        _token = self._peek("TRANSITION", "':'", context=_context)
+        if _token == "TRANSITION":
+            TRANSITION = self._scan("TRANSITION", context=_context)
+            state_target = self.state_target(state, _context)
+            if (
+                self._peek(
+                    "':'",
+                    "AND",
+                    "PASS",
+                    "DEDENT",
+                    "STATE",
+                    "ENTER",
+                    "EXIT",
+                    "SLOTS",
+                    "COALESCE",
+                    "OPEN_BRACKET",
+                    "TRANSITION",
+                    "START",
+                    "NAME",
+                    "MS",
+                    "S",
+                    context=_context,
+                )
+                == "':'"
+            ):
+                self._scan("':'", context=_context)
+                code_clause = self.code_clause(_context)
+        else:  # == "':'"
+            self._scan("':'", context=_context)
+            _token = self._peek("PASS", "TOEOL", "INDENT", context=_context)
+            if _token != "PASS":
+                code_clause = self.code_clause(_context)
+            else:  # == 'PASS'
+                PASS = self._scan("PASS", context=_context)
+        state.add_transition(
+            event_name, event_args, superclasses, condition, state_target, code_clause
+        )
+
+    def superclass(self, sl, _parent=None):
+        _context = self.Context(_parent, self._scanner, "superclass", [sl])
+        event_args = None
+        IS = self._scan("IS", context=_context)
+        NAME = self._scan("NAME", context=_context)
+        if (
+            self._peek(
+                "OPEN_PAREN",
+                "OPEN_BRACKET",
+                "IS",
+                "TRANSITION",
+                "':'",
+                context=_context,
+            )
+            == "OPEN_PAREN"
+        ):
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            event_args = self.event_args(_context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+        sl.append([NAME, event_args])
+
+    def event_args(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "event_args", [])
+        args = []
+        NAME = self._scan("NAME", context=_context)
+        args.append(NAME)
+        while (
+            self._peek(
+                "','",
+                "CLOSE_PAREN",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "SLOTS",
+                "COALESCE",
+                "START",
+                "NAME",
+                "PASS",
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "MS",
+                "S",
+                context=_context,
+            )
+            == "','"
+        ):
+            self._scan("','", context=_context)
+            NAME = self._scan("NAME", context=_context)
+            args.append(NAME)
+        return args
+
+    def default_transition(self, state, _parent=None):
+        _context = self.Context(_parent, self._scanner, "default_transition", [state])
+        condition = None
+        code_clause = None
+        if self._peek("OPEN_BRACKET", "TRANSITION", context=_context) == "OPEN_BRACKET":
+            OPEN_BRACKET = self._scan("OPEN_BRACKET", context=_context)
+            condition = self.condition(_context)
+            CLOSE_BRACKET = self._scan("CLOSE_BRACKET", context=_context)
+        TRANSITION = self._scan("TRANSITION", context=_context)
+        state_target = self.state_target(state, _context)
+        if (
+            self._peek(
+                "':'",
+                "PASS",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                "SLOTS",
+                "COALESCE",
+                context=_context,
+            )
+            == "':'"
+        ):
+            self._scan("':'", context=_context)
+            code_clause = self.code_clause(_context)
+        state.default_transition(condition, state_target, code_clause)
+
+    def timeout(self, state, _parent=None):
+        _context = self.Context(_parent, self._scanner, "timeout", [state])
+        code_clause = None
+        condition = None
+        state_target = None
+        time_spec = self.time_spec(state, _context)
+        if (
+            self._peek(
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "':'",
+                "PASS",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                "SLOTS",
+                "COALESCE",
+                context=_context,
+            )
+            == "OPEN_BRACKET"
+        ):
+            OPEN_BRACKET = self._scan("OPEN_BRACKET", context=_context)
+            condition = self.condition(_context)
+            CLOSE_BRACKET = self._scan("CLOSE_BRACKET", context=_context)
+        if (
+            self._peek(
+                "TRANSITION",
+                "':'",
+                "PASS",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "OPEN_BRACKET",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                "SLOTS",
+                "COALESCE",
+                context=_context,
+            )
+            == "TRANSITION"
+        ):
+            TRANSITION = self._scan("TRANSITION", context=_context)
+            state_target = self.state_target(state, _context)
+        if (
+            self._peek(
+                "':'",
+                "PASS",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                "SLOTS",
+                "COALESCE",
+                context=_context,
+            )
+            == "':'"
+        ):
+            self._scan("':'", context=_context)
+            code_clause = self.code_clause(_context)
+        state.add_timeout(time_spec, condition, state_target, code_clause)
+
+    def time_spec(self, state, _parent=None):
+        _context = self.Context(_parent, self._scanner, "time_spec", [state])
+        _token = self._peek("MS", "S", context=_context)
+        if _token == "MS":
+            MS = self._scan("MS", context=_context)
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            expr = self.expr(_context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+            return state.timeout_ms(expr)
+        else:  # == 'S'
+            S = self._scan("S", context=_context)
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            expr = self.expr(_context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+            return state.timeout_s(expr)
+
+    def float(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "float", [])
+        _token = self._peek("INT", "FLOAT0", "FLOAT1", context=_context)
+        if _token == "INT":
+            INT = self._scan("INT", context=_context)
+            r = float(INT)
+        elif _token == "FLOAT0":
+            FLOAT0 = self._scan("FLOAT0", context=_context)
+            r = float(FLOAT0)
+        else:  # == 'FLOAT1'
+            FLOAT1 = self._scan("FLOAT1", context=_context)
+            r = float(FLOAT1)
+        return r
+
+    def condition(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "condition", [])
+        _condition = self._condition([], _context)
+        return "".join(_condition)
+
+    def _condition(self, l, _parent=None):
+        _context = self.Context(_parent, self._scanner, "_condition", [l])
+        if (
+            self._peek("NONBRACKET", "OPEN_BRACKET", "CLOSE_BRACKET", context=_context)
+            == "NONBRACKET"
+        ):
+            NONBRACKET = self._scan("NONBRACKET", context=_context)
+            l.append(NONBRACKET)
+        while (
+            self._peek("OPEN_BRACKET", "CLOSE_BRACKET", context=_context)
+            == "OPEN_BRACKET"
+        ):
+            OPEN_BRACKET = self._scan("OPEN_BRACKET", context=_context)
+            condition = self.condition([], _context)
+            CLOSE_BRACKET = self._scan("CLOSE_BRACKET", context=_context)
+            l.append("[")
+            l.extend(condition)
+            l.append("]")
+        return l
+
+    def expr(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "expr", [])
+        l = []
+        while (
+            self._peek("NONPAREN", "OPEN_PAREN", "CLOSE_PAREN", context=_context)
+            != "CLOSE_PAREN"
+        ):
+            _expr = self._expr([], _context)
+            l.append("".join(_expr))
+        return "".join(l)
+
+    def _expr(self, l, _parent=None):
+        _context = self.Context(_parent, self._scanner, "_expr", [l])
+        _token = self._peek("NONPAREN", "OPEN_PAREN", context=_context)
+        if _token == "NONPAREN":
+            NONPAREN = self._scan("NONPAREN", context=_context)
+            l.append(NONPAREN)
+        else:  # == 'OPEN_PAREN'
+            OPEN_PAREN = self._scan("OPEN_PAREN", context=_context)
+            _expr = self._expr([], _context)
+            CLOSE_PAREN = self._scan("CLOSE_PAREN", context=_context)
+            l.append("(")
+            l.extend(_expr)
+            l.append(")")
+        return l
+
+    def enter_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "enter_clause", [])
+        ENTER = self._scan("ENTER", context=_context)
+        self._scan("':'", context=_context)
+        code_clause = self.code_clause(_context)
+        return code_clause
+
+    def exit_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "exit_clause", [])
+        EXIT = self._scan("EXIT", context=_context)
+        self._scan("':'", context=_context)
+        code_clause = self.code_clause(_context)
+        return code_clause
+
+    def slots_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "slots_clause", [])
+        SLOTS = self._scan("SLOTS", context=_context)
+        self._scan("':'", context=_context)
+        event_args = self.event_args(_context)
+        return event_args
+
+    def coalesce_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "coalesce_clause", [])
+        COALESCE = self._scan("COALESCE", context=_context)
+        self._scan("':'", context=_context)
+        event_args = self.event_args(_context)
+        return event_args
+
+    def code_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "code_clause", [])
+        _token = self._peek("TOEOL", "INDENT", context=_context)
+        if _token == "TOEOL":
+            simple_code_clause = self.simple_code_clause(_context)
+            return simple_code_clause
+        else:  # == 'INDENT'
+            indented_code_clause = self.indented_code_clause(_context)
+            return indented_code_clause
+
+    def simple_code_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "simple_code_clause", [])
+        TOEOL = self._scan("TOEOL", context=_context)
+        return [TOEOL.strip()]
+
+    def indented_code_clause(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "indented_code_clause", [])
+        INDENT = self._scan("INDENT", context=_context)
+        r = []
+        while 1:
+            INDENTED_CODE = self._scan("INDENTED_CODE", context=_context)
+            r.append(INDENTED_CODE)
+            if (
+                self._peek("INDENTED_CODE", "DEDENT", context=_context)
+                != "INDENTED_CODE"
+            ):
+                break
+        DEDENT = self._scan("DEDENT", context=_context)
+        return r
+
+    def event_name(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "event_name", [])
+        NAME = self._scan("NAME", context=_context)
+        return NAME
+
+    def machine_name(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "machine_name", [])
+        NAME = self._scan("NAME", context=_context)
+        return NAME
+
+    def state_name(self, _parent=None):
+        _context = self.Context(_parent, self._scanner, "state_name", [])
+        NAME = self._scan("NAME", context=_context)
+        return NAME
+
+    def state_target(self, state, _parent=None):
+        _context = self.Context(_parent, self._scanner, "state_target", [state])
+        r = []
+        while self._peek("NAME", "UP", context=_context) == "UP":
+            UP = self._scan("UP", context=_context)
+            r.append(UP)
+        NAME = self._scan("NAME", context=_context)
+        r.append(NAME)
+        while (
+            self._peek(
+                "r'\\.'",
+                "':'",
+                "PASS",
+                "AND",
+                "DEDENT",
+                "STATE",
+                "ENTER",
+                "EXIT",
+                "OPEN_BRACKET",
+                "TRANSITION",
+                "NAME",
+                "MS",
+                "S",
+                "START",
+                "SLOTS",
+                "COALESCE",
+                context=_context,
+            )
+            == "r'\\.'"
+        ):
+            self._scan("r'\\.'", context=_context)
+            NAME = self._scan("NAME", context=_context)
+            r.append(NAME)
+        return r
+
+
+def parse(rule, text):
+    P = state_machine(state_machineScanner(text))
+    return runtime.wrap_error_reporter(P, rule)
+
+
+# End -- grammar generated by Yapps
+
+
+GRAMMAR_SHA256 = "feec66684bb45eb417c6ee2c3596bcf1a5c4a08c4ccc09f278156ddef5133eee"
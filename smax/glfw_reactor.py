@@ -33,7 +33,7 @@ class GlfwReactor(smax.SelectReactor):
         # so we guarantee distinct reads of BG_RUN and FG_ACK.
         self.add_fd(
             self._rq,
-            lambda: log.trace("_rq callback read=%s" % (os.read(self._rq, 256),)),
+            lambda: log.trace("_rq callback read=%s", os.read(self._rq, 256)),
         )
         self._rr, self._wr = os.pipe()  # bg writes BG_IDLE or BG_TERMINATED
 
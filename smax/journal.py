@@ -0,0 +1,296 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# journal.py - Records what happens to state machines, and plays it back.
+#
+# A Journal attached to a reactor gets a record for every event
+# delivered to a machine (Reactor._run_event, coalesced events,
+# broadcasts and event rings all go through Journal.deliver), every
+# timeout that fires (the generated timeout methods call
+# Journal.timeout) and every start() and end().  Each record has the
+# reactor's time, the machine's number (machines are numbered in the
+# order the journal first sees them), the event or timeout method
+# name and, for events, the pickled arguments.
+#
+# Records are appended to segment files ("<path>.000000", ...) mapped
+# into memory; a segment that fills up is closed and the next one
+# started, and with keep=N only the newest N segments are kept.
+# Writing a record is just copying it into the map.  The first record
+# after a commit queues a commit on the reactor, so everything handled
+# in between is flushed to disk with one msync (group commit).
+#
+# replay feeds a journal to fresh machines on a simulated clock.
+# Events and timeouts are delivered from the journal in the order
+# they're recorded, at the time they were recorded; events the
+# machines send themselves are dropped, since the journal has those
+# too, and timeouts only fire when the journal says they did.  Fleets
+# aren't journaled.
+
+import collections
+import glob
+import mmap
+import os
+import pickle
+import struct
+
+import smax.log as log
+from smax.reactor import Alarm
+from smax.virtual_time_reactor import VirtualTimeReactor
+
+# record kinds
+EVENT = 1
+TIMEOUT = 2
+START = 3
+END = 4
+
+# segment header: magic
+_MAGIC = b"SMXJ"
+# length (of the whole record), kind, time, machine number,
+# length of the name; then the name and the pickled arguments.
+# A length of 0 (or the end of the segment) ends the segment.
+_record = struct.Struct("<IBdIH")
+_length = struct.Struct("<I")
+
+Record = collections.namedtuple("Record", "kind time machine name args")
+
+
+class Journal(object):
+    """
+    Appends records to segment files named path.<n>, each
+    segment_size bytes, starting after any that are already there;
+    keep is how many segments to keep (None for all of them).
+    Commits are queued on the reactor right away, or after
+    commit_delay seconds, which groups more records per commit.
+    Machines the journal has seen are kept alive by it.
+    """
+
+    def __init__(self, path, segment_size=16 << 20, keep=None, commit_delay=0):
+        self._path = path
+        self._segment_size = segment_size
+        self._keep = keep
+        self._commit_delay = commit_delay
+        self._reactor = None
+        self._commit_queued = False
+        segments = _segments(path)
+        self._segment = (segments[-1][0] + 1) if segments else 0
+        self._file = None
+        self._map = None
+        self._position = 0
+        # start of the part of the map written since the last commit
+        self._dirty = 0
+        # event names by handler function ("" for other callbacks)
+        self._names = {}
+        self._numbers = {}
+        self._open()
+
+    def attach(self, reactor):
+        """Starts journaling everything reactor runs."""
+        self._reactor = reactor
+        reactor.journal = self
+
+    def detach(self):
+        self.commit()
+        if self._reactor is not None:
+            self._reactor.journal = None
+            self._reactor = None
+
+    def close(self):
+        self.detach()
+        self._close()
+
+    def number(self, machine):
+        """The number machine's records have, or None if it hasn't any."""
+        return self._numbers.get(machine)
+
+    # Called by the reactor and the generated code.
+
+    def deliver(self, machine, ev, *args):
+        """Records ev(machine, *args) if it's an event, and calls it."""
+        name = self._names.get(ev)
+        if name is None:
+            name = self._learn(machine, ev)
+        if name:
+            self._write(EVENT, machine, name, args)
+        return ev(machine, *args)
+
+    def timeout(self, machine, method_name):
+        self._write(TIMEOUT, machine, method_name, ())
+
+    def started(self, machine):
+        self._write(START, machine, "", ())
+
+    def ended(self, machine):
+        self._write(END, machine, "", ())
+
+    def _learn(self, machine, ev):
+        handlers = getattr(type(machine), "_state_machine_handlers", {})
+        for name, handler in handlers.items():
+            self._names[handler] = name
+        # (anything else, like a Fleet's callbacks, isn't an event.)
+        return self._names.setdefault(ev, "")
+
+    def _write(self, kind, machine, name, args):
+        n = self._numbers.get(machine)
+        if n is None:
+            if hasattr(machine, "_fleet"):
+                return
+            n = self._numbers[machine] = len(self._numbers)
+        name = name.encode("utf-8")
+        payload = name + pickle.dumps(args, pickle.HIGHEST_PROTOCOL) if args else name
+        size = _record.size + len(payload)
+        if self._position + size > self._segment_size:
+            if len(_MAGIC) + size > self._segment_size:
+                raise ValueError("Record is bigger than a journal segment.")
+            self._rotate()
+        m = self._map
+        p = self._position
+        now = self._reactor.time() if self._reactor is not None else 0.0
+        _record.pack_into(m, p, 0, kind, now, n, len(name))
+        m[p + _record.size : p + size] = payload
+        # The length goes last, so a reader never sees part of a record.
+        _length.pack_into(m, p, size)
+        self._position = p + size
+        if not self._commit_queued and (self._reactor is not None):
+            self._commit_queued = True
+            if self._commit_delay:
+                self._reactor.after_s(self._commit_delay, self.commit)
+            else:
+                self._reactor.call(self.commit)
+
+    def commit(self):
+        """Flushes everything written so far to disk."""
+        self._commit_queued = False
+        if (self._map is None) or (self._position == self._dirty):
+            return
+        start = self._dirty - (self._dirty % mmap.PAGESIZE)
+        self._map.flush(start, self._position - start)
+        self._dirty = self._position
+
+    def _open(self):
+        filename = "%s.%06u" % (self._path, self._segment)
+        log.trace("journal segment %s.", filename)
+        self._file = open(filename, "w+b")
+        self._file.truncate(self._segment_size)
+        self._map = mmap.mmap(self._file.fileno(), self._segment_size)
+        self._map[: len(_MAGIC)] = _MAGIC
+        self._position = len(_MAGIC)
+        self._dirty = 0
+        if self._keep is not None:
+            for n, filename in _segments(self._path)[: -self._keep]:
+                os.unlink(filename)
+
+    def _close(self):
+        if self._map is not None:
+            self.commit()
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+    def _rotate(self):
+        self._close()
+        self._segment += 1
+        self._open()
+
+
+def _segments(path):
+    """(number, filename) for each segment of the journal at path, in order."""
+    r = []
+    for filename in glob.glob(glob.escape(path) + ".*"):
+        suffix = filename[len(path) + 1 :]
+        if suffix.isdigit():
+            r.append((int(suffix), filename))
+    return sorted(r)
+
+
+def records(path):
+    """Yields each Record in the journal at path, oldest first."""
+    for n, filename in _segments(path):
+        with open(filename, "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with m:
+            if m[: len(_MAGIC)] != _MAGIC:
+                raise ValueError("%s isn't a journal segment." % filename)
+            p = len(_MAGIC)
+            while p + _record.size <= len(m):
+                size, kind, t, machine, name_length = _record.unpack_from(m, p)
+                if size == 0:
+                    break
+                start = p + _record.size
+                name = m[start : start + name_length].decode("utf-8")
+                args = ()
+                if size > _record.size + name_length:
+                    args = pickle.loads(m[start + name_length : p + size])
+                yield Record(kind, t, machine, name, args)
+                p += size
+
+
+class ReplayReactor(VirtualTimeReactor):
+    """
+    The reactor replay gives machines.  Events they send aren't
+    delivered and alarms don't fire by themselves; the journal
+    says when those happen.
+    """
+
+    def after_s(self, seconds, callback, *args):
+        return Alarm(self.time() + seconds, callback, args)
+
+    def cancel_after(self, r):
+        if r is not None:
+            r.pending = False
+
+    def pending_alarms(self):
+        return 0
+
+    def _run_event(self, machine, ev, *args):
+        pass
+
+    def _coalesce_event(self, key, machine, ev, *args):
+        pass
+
+    def _broadcast(self, machines, event_name, args):
+        pass
+
+    def _timeout(self, machine, method_name):
+        # Find the alarm that ran this method and fire it.
+        for name, region, methods in type(machine)._state_machine_states:
+            if method_name in methods:
+                break
+        else:
+            raise ValueError("%s has no %s." % (type(machine).__name__, method_name))
+        timeouts = machine._state.get(name)
+        alarm = timeouts[methods.index(method_name)] if timeouts else None
+        if (alarm is None) or not alarm.pending:
+            raise ValueError(
+                "Replay diverged: %s isn't pending at %s." % (method_name, self.time())
+            )
+        alarm.pending = False
+        alarm.callback(*alarm.args)
+
+
+def replay(path, factory):
+    """
+    Runs the journal at path on new machines, which
+    factory(reactor, number) makes the first time machine number
+    appears; returns them, in order.  Raises ValueError if a
+    journaled timeout isn't pending when it's replayed.
+    """
+    reactor = ReplayReactor()
+    machines = []
+    for record in records(path):
+        reactor.run_until(record.time)
+        while len(machines) <= record.machine:
+            machines.append(factory(reactor, len(machines)))
+        machine = machines[record.machine]
+        if record.kind == EVENT:
+            handler = machine._state_machine_handlers[record.name]
+            reactor.call(handler, machine, *record.args)
+        elif record.kind == TIMEOUT:
+            reactor.call(reactor._timeout, machine, record.name)
+        elif record.kind == START:
+            machine.start()
+        elif record.kind == END:
+            machine.end()
+        # run it (and whatever it queues) now.
+        reactor.sync()
+    return machines
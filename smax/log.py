@@ -1,119 +1,101 @@
 # This file is part of the smax project (http://github.com/baymotion/smax)
 # and is copyrighted under GPL v3 or later.
 
+# Messages are only formatted when they're going somewhere: either the
+# level is enabled (the message is printed) or a transcript is installed
+# (every message is recorded there).  Pass format arguments separately,
+#   log.trace("cb=%s.", cb)
+# so nothing is built for a disabled level.  If computing the arguments
+# themselves is expensive, guard the call with "if log.tracing():".
+
 import os
+import sys
 import time
-import traceback
 
 start = time.time()
 
 
-class NoTranscript:
-    def write(self, msg):
-        pass
+# A file-like object (write and flush) that receives every message,
+# or None.
+transcript = None
+enable_trace = False
+enable_debug = True
 
-    def flush(self):
-        pass
 
+def install_transcript(f):
+    """Record all messages to f; pass None to stop."""
+    global transcript
+    transcript = f
 
-transcript = NoTranscript()
-enable_trace = False
-enable_debug = True
+
+def tracing():
+    """True if trace messages go anywhere."""
+    return enable_trace or (transcript is not None)
 
 
 def caller(n=0):
-    tb = traceback.extract_stack(limit=3 + n)
-    full_filename, line, method, statement = tb[-(3 + n)]
-    filename = os.path.basename(full_filename)
-    return "%s:%u" % (filename, line)
+    # 0 is us, 1 is our caller, and 2 is who called them.
+    frame = sys._getframe(2 + n)
+    filename = os.path.basename(frame.f_code.co_filename)
+    return "%s:%u" % (filename, frame.f_lineno)
 
 
 def write(enable, s):
-    transcript.write("%s\n" % s)
-    transcript.flush()
+    if transcript is not None:
+        transcript.write("%s\n" % s)
+        transcript.flush()
     if enable:
         print(s)
 
 
-def trace(msg):
-    write(
-        enable_trace,
-        "TRACE %u %.2lf %s -- %s"
-        % (
-            os.getpid(),
-            time.time() - start,
-            caller(),
-            msg,
-        ),
+def _format(level, msg, args, n):
+    if args:
+        msg = msg % args
+    return "%s %u %.2lf %s -- %s" % (
+        level,
+        os.getpid(),
+        time.time() - start,
+        # skip the public function that called us.
+        caller(1 + n),
+        msg,
     )
 
 
-def _trace(msg):
+def trace(msg, *args):
+    if enable_trace or (transcript is not None):
+        write(enable_trace, _format("TRACE", msg, args, 0))
+
+
+def _trace(msg, *args):
     """
     _trace is the same as trace except that it reports
     the caller as the one above who called _trace.
     """
-    write(
-        enable_trace,
-        "TRACE %u %.2lf %s -- %s"
-        % (
-            os.getpid(),
-            time.time() - start,
-            caller(1),
-            msg,
-        ),
-    )
+    if enable_trace or (transcript is not None):
+        write(enable_trace, _format("TRACE", msg, args, 1))
 
 
-def debug(msg):
-    write(
-        enable_debug,
-        "DEBUG %u %.2lf %s -- %s"
-        % (
-            os.getpid(),
-            time.time() - start,
-            caller(),
-            msg,
-        ),
-    )
+def debug(msg, *args):
+    if enable_debug or (transcript is not None):
+        write(enable_debug, _format("DEBUG", msg, args, 0))
 
 
-def _debug(msg):
+def _debug(msg, *args):
     """
     _debug is the same as trace except that it reports
     the caller as the one above who called _debug.
     """
-    write(
-        enable_debug,
-        "DEBUG %u %.2lf %s -- %s"
-        % (
-            os.getpid(),
-            time.time() - start,
-            caller(1),
-            msg,
-        ),
-    )
+    if enable_debug or (transcript is not None):
+        write(enable_debug, _format("DEBUG", msg, args, 1))
 
 
-def error(msg):
-    write(
-        True,
-        "ERROR %u %.2lf %s -- %s"
-        % (
-            os.getpid(),
-            time.time() - start,
-            caller(),
-            msg,
-        ),
-    )
+def error(msg, *args):
+    write(True, _format("ERROR", msg, args, 0))
 
 
-def _error(msg):
+def _error(msg, *args):
     """
     _error is the same as trace except that it reports the caller as the one
     above who called _error.
     """
-    write(
-        True,
-        "ERROR %u %.2lf %s -- %s" % (os.getpid(), time.time() - start, caller(1), msg),
-    )
+    write(True, _format("ERROR", msg, args, 1))
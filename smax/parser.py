@@ -1,12 +1,12 @@
 # This file is part of the smax project (http://github.com/baymotion/smax)
 # and is copyrighted under GPL v3 or later.
 
+import hashlib
 import io
+import os
 import pkgutil
 import re
 import smax.log as log
-import yapps.grammar
-import yapps.parsetree
 import yapps.runtime
 
 
@@ -49,7 +49,7 @@ def load_source(
         start_delimiter = delimiter
     if end_delimiter is None:
         end_delimiter = delimiter
-    log.trace("load_source filename=%s" % (filename,))
+    log.trace("load_source filename=%s", filename)
     with open(filename, "rt") as f:
         return load_file(f, start_delimiter, end_delimiter)
 
@@ -102,6 +102,8 @@ parser state_machine:
     token PASS: "pass"
     token ENTER: "enter"
     token EXIT: "exit"
+    token SLOTS: "slots"
+    token COALESCE: "coalesce"
     token FROM: "from"
     token IMPORT: "import"
     token IS: "is"
@@ -152,6 +154,8 @@ parser state_machine:
             ( state_decl<<context>>     {{ states.append(state_decl) }}
             | enter_clause              {{  machine.set_enter(enter_clause) }}
             | exit_clause               {{  machine.set_exit(exit_clause) }}
+            | slots_clause              {{  machine.add_slots(slots_clause) }}
+            | coalesce_clause           {{  machine.add_coalesce(coalesce_clause) }}
             | transition<<machine.context()>>
             | AND                       {{ if len(states): context.state_machine(states); states=[]; context=machine.context() }}
             )*
@@ -269,6 +273,14 @@ parser state_machine:
         EXIT ':' code_clause
         {{ return code_clause }}
 
+    rule slots_clause:
+        SLOTS ':' event_args
+        {{ return event_args }}
+
+    rule coalesce_clause:
+        COALESCE ':' event_args
+        {{ return event_args }}
+
     rule code_clause:
         ( simple_code_clause {{ return simple_code_clause }}
         | indented_code_clause {{ return indented_code_clause }}
@@ -310,10 +322,37 @@ class Buffer:
         self._buffer.append(msg)
 
 
-def load_parser():
-    source_data = pkgutil.get_data(__name__, "parser.py").decode("utf-8")
+# The parser yapps generates from the grammar above is checked in as
+# smax/generated_parser.py so that importing smax doesn't have to run
+# yapps.  After changing the grammar, regenerate it with
+#   python -m smax.parser && black smax/generated_parser.py
+# (tests/test_generated_parser.py fails until you do; importing smax
+# doesn't check, so it doesn't have to rescan the grammar).  If it's
+# missing we fall back to generating the parser here.
+GENERATED_PARSER = os.path.join(os.path.dirname(__file__), "generated_parser.py")
+
+
+def grammar():
+    """Returns the yapps grammar embedded in this file."""
+    source_data = pkgutil.get_data("smax", "parser.py").decode("utf-8")
     source_file = io.StringIO(source_data)
-    source = load_file(source_file)
+    return load_file(source_file)
+
+
+def grammar_hash(source=None):
+    if source is None:
+        source = grammar()
+    # load_file pads with blank lines to keep line numbers right;
+    # those don't change the parser.
+    return hashlib.sha256(source.strip().encode("utf-8")).hexdigest()
+
+
+def generate_parser():
+    """Runs yapps over our grammar and returns the parser's python source."""
+    # Only needed when (re)building the parser.
+    import yapps.grammar
+
+    source = grammar()
     scanner = yapps.grammar.ParserDescriptionScanner(source, filename=__file__)
     parser = yapps.grammar.ParserDescription(scanner)
     # monkey-patch the writer so we catch the python code
@@ -322,17 +361,35 @@ def load_parser():
     t.postparser = "\n\n"
     t.generate_output()
     parser_python = "".join(t.output._buffer)
-    if False:
-        with open("parser-out", "wt") as f:
-            f.write(parser_python)
+    return "".join(
+        [
+            "# Generated from the grammar in smax/parser.py by "
+            '"python -m smax.parser";\n',
+            "# don't edit this file.\n",
+            "# flake8: noqa\n",
+            parser_python,
+            'GRAMMAR_SHA256 = "%s"\n' % grammar_hash(source),
+        ]
+    )
+
+
+def write_parser(filename=GENERATED_PARSER):
+    with open(filename, "wt") as f:
+        f.write(generate_parser())
+
+
+def load_parser():
     # run the generated python code.
-    exec(parser_python, globals())
+    exec(generate_parser(), globals())
 
 
-load_parser()
+try:
+    from smax.generated_parser import state_machine, state_machineScanner
+except ImportError:
+    load_parser()
 
 
-class Scanner(state_machineScanner):  # noqa: F821
+class Scanner(state_machineScanner):
     def __init__(self, *args, **kwargs):
         super(Scanner, self).__init__(*args, **kwargs)
         self._indent = [0]
@@ -342,22 +399,17 @@ class Scanner(state_machineScanner):  # noqa: F821
         self._indented_code = re.compile("\n([ ]*)([^\n]*)")
 
     def token(self, restrict, context=None):
-        log.trace("restrict=%s, pos=%s." % (restrict, self.get_pos()))
+        log.trace("restrict=%s, pos=%s.", restrict, self.get_pos())
         # If we're looking for INDENTED_CODE, return this if the
         # input text indent >= current indent level.
         if "INDENTED_CODE" in restrict:
             m = self._indented_code.match(self.input, self.pos)
-            log.trace("Checking indented code, m=%s." % (m,))
+            log.trace("Checking indented code, m=%s.", m)
             if m:
                 indent = len(m.group(1))
                 code = m.group(2)
                 log.trace(
-                    "indent=%u (was %u), code=%s."
-                    % (
-                        indent,
-                        self._indent[-1],
-                        code,
-                    )
+                    "indent=%u (was %u), code=%s.", indent, self._indent[-1], code
                 )
                 if indent >= self._indent[-1]:
                     code_spaces = " " * (indent - self._indent[-1])
@@ -367,7 +419,7 @@ class Scanner(state_machineScanner):  # noqa: F821
                         line,
                         self.get_pos(),
                     )
-                    log.trace("token=%s." % (token,))
+                    log.trace("token=%s.", token)
                     self.pos += len(m.group(0))
                     return token
         # If they're looking for INDENT or DEDENT,
@@ -393,12 +445,13 @@ class Scanner(state_machineScanner):  # noqa: F821
                     break
             m = self._spaces.match(self.input, self.pos)
             log.trace(
-                "Checking in/dedent, m=%s (length=%s)."
-                % (m, "n/a" if m is None else len(m.group(1)))
+                "Checking in/dedent, m=%s (length=%s).",
+                m,
+                "n/a" if m is None else len(m.group(1)),
             )
             if m:
                 indent = len(m.group(1))
-                log.trace("indent=%u." % indent)
+                log.trace("indent=%u.", indent)
                 if indent > self._indent[-1]:
                     self._indent.append(indent)
                     token = yapps.runtime.Token(
@@ -406,7 +459,7 @@ class Scanner(state_machineScanner):  # noqa: F821
                         indent,
                         self.get_pos(),
                     )
-                    log.trace("token=%s." % (token,))
+                    log.trace("token=%s.", token)
                     return token
                 if indent < self._indent[-1]:
                     self._indent.pop()
@@ -415,14 +468,14 @@ class Scanner(state_machineScanner):  # noqa: F821
                         indent,
                         self.get_pos(),
                     )
-                    log.trace("token=%s." % (token,))
+                    log.trace("token=%s.", token)
                     return token
         token = super(Scanner, self).token(restrict, context)
-        log.trace("token=%s." % (token,))
+        log.trace("token=%s.", token)
         return token
 
 
-class Parser(state_machine):  # noqa: F821
+class Parser(state_machine):
     def __init__(self, *args, **kwargs):
         super(Parser, self).__init__(*args, **kwargs)
 
@@ -541,18 +594,11 @@ class State(object):
         self.dot_name = ".".join(d)
         self.name_list = d
         self.array_name = self.full_name + "_name"
-        log.trace(
-            "%s: full_name=%s, dot_name=%s."
-            % (
-                self,
-                self.full_name,
-                self.dot_name,
-            )
-        )
+        log.trace("%s: full_name=%s, dot_name=%s.", self, self.full_name, self.dot_name)
         target_name = "n/a"
         n = 0  # in case transitions is empty
         for n, t in enumerate(self.transitions):
-            log.trace("t=%s, target=%s." % (t, t.target))
+            log.trace("t=%s, target=%s.", t, t.target)
             t.n = n
             if t.target is None:
                 continue
@@ -562,7 +608,7 @@ class State(object):
                 if not m.parent:
                     raise SmaxException("Cannot go up from %s." % (m.name,))
                 m = m.parent
-                log.trace("t.target[%d] == '^'; going up to %s." % (i, m.name))
+                log.trace("t.target[%d] == '^'; going up to %s.", i, m.name)
                 i += 1
             # assert len(t.target)==(i + 1)
             try:
@@ -576,16 +622,16 @@ class State(object):
                     raise SmaxException("Can't find target state %s." % (t.target[i],))
                 q = m.parent._state[t.target[i]]
                 t.unconfigure = True
-            log.trace("t.target[%d] found %s." % (i, q.name))
+            log.trace("t.target[%d] found %s.", i, q.name)
             i += 1
             while i < len(t.target):
                 q = q._state[t.target[i]]
-                log.trace("t.target[%d] found %s." % (i, q.name))
+                log.trace("t.target[%d] found %s.", i, q.name)
                 i += 1
             t.target_state = q
             target_name = q.name
         for n, t in enumerate(self.timeouts):
-            log.trace("t=%s, target=%s." % (t, target_name))
+            log.trace("t=%s, target=%s.", t, target_name)
             t.n = n
             if t.target is None:
                 continue
@@ -667,12 +713,12 @@ class State(object):
 
     def state(self, name, start):
         state_name = name
-        log.trace("state name=%s start=%s." % (state_name, start))
+        log.trace("state name=%s start=%s.", state_name, start)
         # is "state_name" already in self._state?
         if state_name in self._state:
             raise SyntaxError("State %s is duplicate." % (state_name,))
         s = State(self._machine, self, name, start)
-        log.trace("new state=%s, parent=%s." % (s.name, s.parent.name))
+        log.trace("new state=%s, parent=%s.", s.name, s.parent.name)
         self._state[state_name] = s
         return s
 
@@ -709,15 +755,33 @@ class Machine(State):
         super(Machine, self).__init__(self, None, name, True)
         self.superclass = superclass
         self._event = {}
+        # attributes the machine's code uses, for __slots__
+        self.slots = []
+        # events where only the latest pending call matters
+        self.coalesce = []
 
     def context(self):
         return self
 
+    def add_slots(self, names):
+        for name in names:
+            if name in self.slots:
+                raise SyntaxError("Slot %s is duplicate." % (name,))
+            self.slots.append(name)
+
+    def add_coalesce(self, names):
+        for name in names:
+            if name in self.coalesce:
+                raise SyntaxError("Coalesced event %s is duplicate." % (name,))
+            self.coalesce.append(name)
+
     def event(self, event, event_args, superclasses):
         event_name = event
         log.trace(
-            "event_name=%s, event_args=%s, superclasses=%s."
-            % (event_name, event_args, superclasses)
+            "event_name=%s, event_args=%s, superclasses=%s.",
+            event_name,
+            event_args,
+            superclasses,
         )
         try:
             ev = self._event[event_name]
@@ -736,6 +800,11 @@ class Machine(State):
     def check(self, machine=None):
         self.event_list = list(self._event.values())
         self.event_list.sort(key=lambda ev: ev.name)
+        for name in self.coalesce:
+            if name not in self._event:
+                raise SyntaxError(
+                    "Coalesced event %s isn't handled anywhere." % (name,)
+                )
         super(Machine, self).check(self)
         for s in self.all_states():
             if s != self:
@@ -748,11 +817,11 @@ class Specification:
         self._output = []
 
     def constant(self, name, value):
-        log.trace("new constant, name=%s, value=%s." % (name, value))
+        log.trace("new constant, name=%s, value=%s.", name, value)
         self._output.append({"constant": {"name": name, "value": value}})
 
     def import_(self, sequence):
-        log.trace("new import, sequence=%s." % (sequence,))
+        log.trace("new import, sequence=%s.", sequence)
         self._output.append({"import": sequence})
 
     def machine(self, name, superclass):
@@ -762,3 +831,7 @@ class Specification:
 
     def spec(self):
         return self._output
+
+
+if __name__ == "__main__":
+    write_parser()
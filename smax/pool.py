@@ -0,0 +1,368 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# pool.py - Spreads state machines across worker processes.
+#
+# A Pool starts N worker processes ("shards"), each running its own
+# reactor, and places each machine on a shard by key.  Machines are
+# used through proxies with the same event methods; calling one sends
+# the event to the worker and returns a concurrent.futures.Future for
+# the value the machine's handler returns.
+#
+# Messages are batched both ways: calls made while the previous batch
+# is being sent are collected and go out together in one pickled list,
+# and a worker replies to a whole batch at once, after the reactor has
+# run what it asked for.  The parent has two threads: one sends
+# batches, and one receives replies and completes the futures.
+
+import concurrent.futures
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import pickle
+import threading
+import zlib
+
+import smax.log as log
+from smax.select_reactor import SelectReactor
+
+
+class Pool(object):
+    """
+    processes worker processes, each running reactor_class(); context
+    is the multiprocessing context to start them with (by default,
+    multiprocessing's default).  Machine classes (and the arguments
+    to create and events) are pickled, so classes have to be defined
+    at the top level of a module the workers can import.
+    """
+
+    def __init__(self, processes=None, reactor_class=SelectReactor, context=None):
+        context = context or multiprocessing.get_context()
+        processes = processes or multiprocessing.cpu_count()
+        self._connections = []
+        self._processes = []
+        for shard in range(processes):
+            parent, child = context.Pipe()
+            p = context.Process(
+                target=_worker,
+                args=(child, reactor_class),
+                name="smax-shard-%u" % shard,
+                daemon=True,
+            )
+            p.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(p)
+        self._ids = itertools.count()
+        # Futures waiting for a reply: id -> (shard, future).
+        self._futures = {}
+        # Messages not yet sent, by shard.
+        self._lock = threading.Condition()
+        self._outboxes = [[] for p in self._processes]
+        self._closing = False
+        self._sender = threading.Thread(
+            target=self._send_batches, name="smax-pool-sender", daemon=True
+        )
+        self._receiver = threading.Thread(
+            target=self._receive_replies, name="smax-pool-receiver", daemon=True
+        )
+        self._sender.start()
+        self._receiver.start()
+
+    def __len__(self):
+        return len(self._processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def shard(self, key):
+        """
+        Which shard machines created with key go to.  This is the same
+        in every process (python's own hash of a str isn't).
+        """
+        if isinstance(key, int):
+            return key % len(self._processes)
+        return zlib.crc32(repr(key).encode("utf-8")) % len(self._processes)
+
+    def create(self, key, machine_class, *args, **kwargs):
+        """
+        Creates machine_class(reactor, *args, **kwargs) on the shard
+        for key and returns a proxy for it.  Any error creating it is
+        raised by the proxy's first call.
+        """
+        shard = self.shard(key)
+        machine_id = next(self._ids)
+        self._send(shard, ("create", machine_id, machine_class, args, kwargs))
+        return _proxy_class(machine_class)(self, shard, machine_id)
+
+    def close(self):
+        """Stops the workers once they've handled everything sent so far."""
+        with self._lock:
+            if self._closing:
+                return
+            for outbox in self._outboxes:
+                outbox.append(("stop",))
+            self._closing = True
+            self._lock.notify()
+        self._sender.join()
+        for p in self._processes:
+            p.join()
+        self._receiver.join()
+        for c in self._connections:
+            c.close()
+
+    def _send(self, shard, message, future=None):
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Pool is closed.")
+            if future is not None:
+                self._futures[message[-1]] = (shard, future)
+            outbox = self._outboxes[shard]
+            outbox.append(message)
+            if len(outbox) == 1:
+                self._lock.notify()
+        return future
+
+    def _apply(self, shard, machine_id, function, args):
+        future = concurrent.futures.Future()
+        message = ("apply", machine_id, function, args, next(self._ids))
+        return self._send(shard, message, future)
+
+    def _event(self, shard, machine_id, name, args):
+        future = concurrent.futures.Future()
+        message = ("event", machine_id, name, args, next(self._ids))
+        return self._send(shard, message, future)
+
+    def _send_batches(self):
+        while True:
+            with self._lock:
+                while not (self._closing or any(self._outboxes)):
+                    self._lock.wait()
+                outboxes = self._outboxes
+                self._outboxes = [[] for p in self._processes]
+                closing = self._closing
+            for shard, batch in enumerate(outboxes):
+                if batch:
+                    log.trace("shard=%u batch=%u.", shard, len(batch))
+                    self._connections[shard].send(batch)
+            if closing:
+                return
+
+    def _receive_replies(self):
+        connections = {c: shard for shard, c in enumerate(self._connections)}
+        while connections:
+            for c in multiprocessing.connection.wait(list(connections)):
+                try:
+                    replies = c.recv()
+                except (EOFError, OSError):
+                    self._lost(connections.pop(c))
+                    continue
+                for future_id, ok, value in replies:
+                    with self._lock:
+                        shard, future = self._futures.pop(future_id)
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+
+    def _lost(self, shard):
+        # The worker's gone; nothing more is coming from it.
+        with self._lock:
+            lost = [
+                (future_id, future)
+                for future_id, (s, future) in self._futures.items()
+                if s == shard
+            ]
+            for future_id, future in lost:
+                del self._futures[future_id]
+        for future_id, future in lost:
+            future.set_exception(RuntimeError("Shard %u exited." % shard))
+
+
+class Proxy(object):
+    """
+    Stands in for a machine on a pool's worker.  Proxy classes for
+    each machine class add its event methods, which call the machine's
+    own on the worker; each returns a concurrent.futures.Future for
+    what the machine's handler returned.
+    """
+
+    def __init__(self, pool, shard, machine_id):
+        self._pool = pool
+        self._shard = shard
+        self._machine_id = machine_id
+
+    def apply(self, function, *args):
+        """
+        Future for function(machine, *args), called by the machine's
+        reactor; function has to be picklable.
+        """
+        return self._pool._apply(self._shard, self._machine_id, function, args)
+
+    def start(self):
+        return self.apply(_start)
+
+    def end(self):
+        return self.apply(_end)
+
+    def state(self):
+        """Future for the names of the states the machine is in."""
+        return self.apply(_state)
+
+
+_proxy_classes = {}
+
+
+def _proxy_class(machine_class):
+    r = _proxy_classes.get(machine_class)
+    if r is None:
+        namespace = {}
+        for name in machine_class._state_machine_handlers:
+            namespace[name] = _event(name)
+        r = type("%sProxy" % machine_class.__name__, (Proxy,), namespace)
+        _proxy_classes[machine_class] = r
+    return r
+
+
+def _event(name):
+    def event(self, *args):
+        return self._pool._event(self._shard, self._machine_id, name, args)
+
+    event.__name__ = name
+    return event
+
+
+def _worker(connection, reactor_class):
+    reactor = _worker_reactor_class(reactor_class)()
+    machines = {}
+    replies = []
+
+    def reply(future_id, ok, value):
+        if not ok:
+            try:
+                pickle.dumps(value)
+            except Exception:
+                value = RuntimeError(repr(value))
+        if not replies:
+            # Everything that's queued now gets answered in one batch.
+            reactor.call(flush)
+        replies.append((future_id, ok, value))
+
+    def run(future_id, function, *args):
+        try:
+            value = function(*args)
+        except Exception as e:
+            reply(future_id, False, e)
+        else:
+            reply(future_id, True, value)
+
+    def event(future_id, machine, name, args):
+        # Calls the machine's event method, so subclasses' overrides
+        # and "coalesce:" work; the handler it queues answers.
+        reactor._answer = reply
+        reactor._future_id = future_id
+        try:
+            value = getattr(machine, name)(*args)
+        except Exception as e:
+            reactor._future_id = None
+            reply(future_id, False, e)
+            return
+        if reactor._future_id is not None:
+            # Nothing was queued: it went into a coalesced call
+            # that's already waiting.
+            reactor._future_id = None
+            reply(future_id, True, value)
+
+    def flush():
+        if replies:
+            connection.send(list(replies))
+            del replies[:]
+
+    def ready():
+        while connection.poll():
+            try:
+                batch = connection.recv()
+            except (EOFError, OSError):
+                # the parent's gone.
+                reactor.stop()
+                return
+            for message in batch:
+                request = message[0]
+                if request == "stop":
+                    reactor.call(reactor.stop)
+                elif request == "create":
+                    machine_id, machine_class, args, kwargs = message[1:]
+                    try:
+                        machines[machine_id] = machine_class(reactor, *args, **kwargs)
+                    except Exception as e:
+                        log.error("Can't create %s: %s.", machine_class, e)
+                        machines[machine_id] = _Broken(e)
+                elif request == "event":
+                    machine_id, name, args, future_id = message[1:]
+                    reactor.call(event, future_id, machines[machine_id], name, args)
+                else:
+                    # queued like any other event, and run by the reactor.
+                    machine_id, function, args, future_id = message[1:]
+                    reactor.call(run, future_id, function, machines[machine_id], *args)
+
+    reactor.add_fd(connection.fileno(), ready)
+    reactor.run()
+    flush()
+    connection.close()
+
+
+_worker_reactor_classes = {}
+
+
+def _worker_reactor_class(reactor_class):
+    r = _worker_reactor_classes.get(reactor_class)
+    if r is None:
+
+        def _run_event(self, machine, ev, *args):
+            future_id = self._future_id
+            if future_id is None:
+                return reactor_class._run_event(self, machine, ev, *args)
+            # It's the event a proxy sent; answer with what it returns.
+            self._future_id = None
+            return reactor_class._run_event(
+                self, machine, _answering, self._answer, future_id, ev, *args
+            )
+
+        namespace = {"_future_id": None, "_answer": None, "_run_event": _run_event}
+        r = type("Worker%s" % reactor_class.__name__, (reactor_class,), namespace)
+        _worker_reactor_classes[reactor_class] = r
+    return r
+
+
+def _answering(machine, reply, future_id, ev, *args):
+    try:
+        value = ev(machine, *args)
+    except Exception as e:
+        reply(future_id, False, e)
+    else:
+        reply(future_id, True, value)
+
+
+def _start(machine):
+    return machine.start()
+
+
+def _end(machine):
+    return machine.end()
+
+
+def _state(machine):
+    return list(machine._state)
+
+
+class _Broken(object):
+    """Stands in for a machine whose constructor raised."""
+
+    def __init__(self, error):
+        self._error = error
+
+    def __getattr__(self, name):
+        raise self._error
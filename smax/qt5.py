@@ -66,7 +66,7 @@ class PyQtReactor(smax.Reactor):
         if self.done():
             return
         # timeout may be None
-        log.trace("timeout=%s." % timeout)
+        log.trace("timeout=%s.", timeout)
         if timeout is not None:
             self._adapter.schedule(timeout, self._run)
 
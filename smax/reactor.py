@@ -1,54 +1,194 @@
 # This file is part of the smax project (http://github.com/baymotion/smax)
 # and is copyrighted under GPL v3 or later.
 
-import queue
+import collections
+import heapq
+import itertools
+import threading
 import time
 
 import smax.log as log
 
 
+class LivelockError(RuntimeError):
+    """
+    Raised by a state machine whose default (eventless) transitions
+    keep going around in a loop.
+    """
+
+    pass
+
+
+class Alarm(object):
+    """
+    Handle returned by Reactor.after_s and after_ms.  Alarms live in
+    a binary heap; cancelling one just marks it so that it's discarded
+    when it reaches the top of the heap (lazy deletion), which makes
+    cancel_after O(1).
+    """
+
+    __slots__ = ("trigger", "callback", "args", "pending")
+
+    def __init__(self, trigger, callback, args):
+        self.trigger = trigger
+        self.callback = callback
+        self.args = args
+        # True until the alarm either fires or is cancelled.
+        self.pending = True
+
+    def __repr__(self):
+        return "Alarm(trigger=%s, callback=%s, pending=%s)" % (
+            self.trigger,
+            self.callback,
+            self.pending,
+        )
+
+
 # Reactor framework
 class Reactor(object):
-    def __init__(self):
+    # When more than this fraction of the heap is cancelled alarms,
+    # rebuild it so memory use stays proportional to live alarms.
+    compact_ratio = 0.5
+
+    def __init__(self, max_callbacks=None, inline_events=False):
         super(Reactor, self).__init__()
-        self._q = queue.Queue()
+        # Upper bound on callbacks executed by one call to sync();
+        # None means run everything that's ready.
+        self.max_callbacks = max_callbacks
+        # If set, an event called on the reactor thread while nothing
+        # is queued or running is handled right away instead of
+        # waiting for sync().
+        self.inline_events = inline_events
+        # True while sync() (or an inline event) is running callbacks.
+        self._running = False
+        # Calls made from the reactor thread go straight into _q;
+        # calls from any other thread go into _inbox and are moved
+        # over by sync().  deque's append and popleft are atomic,
+        # so neither needs a lock.
+        self._q = collections.deque()
+        self._inbox = collections.deque()
+        self._thread = threading.get_ident()
+        # heap of (trigger, sequence, alarm); sequence keeps alarms
+        # with the same trigger in the order they were scheduled.
         self._alarms = []
+        self._sequence = itertools.count()
+        self._cancelled = 0
         self._done = False
+        # Calls to coalesced events that are queued and haven't run
+        # yet, by key: [machine, ev, args, result of _run_event].
+        self._coalesced = {}
+        self._coalesced_lock = threading.Lock()
+        # An smax.journal.Journal to record events and timeouts
+        # in, or None; see Journal.attach.
+        self.journal = None
 
     # run the reactor until all queued and expired
     # events are done; returns a timeout in seconds
     # until the next event, or None if no alarms are active.
+    # If max_callbacks is set, at most that many callbacks
+    # run per call; in that case we return 0 so the caller
+    # gets a chance to poll its other event sources before
+    # coming back here.
     def sync(self):
+        self._thread = threading.get_ident()
+        self._running = True
+        try:
+            return self._sync()
+        finally:
+            self._running = False
+
+    def _sync(self):
+        q = self._q
+        inbox = self._inbox
+        limit = self.max_callbacks
+        executed = 0
         while not self.done():
-            if not self._q.empty():
-                cb, args = self._q.get()
-                log.trace("execute cb=%s." % cb)
+            while inbox:
+                q.append(inbox.popleft())
+            if q:
+                cb, args = q.popleft()
+                log.trace("execute cb=%s.", cb)
                 cb(*args)
+                executed += 1
+                if limit and (executed >= limit):
+                    return 0
                 continue
-            timeout = None
-            now = time.monotonic()
-            if self._alarms:
-                trigger, cb, args = self._alarms[0]
-                if trigger <= now:
-                    self._alarms.pop(0)
-                    log.trace("alarm cb=%s." % cb)
-                    cb(*args)
-                    continue
-                # we've reached our next closest timeout.
-                timeout = trigger - now
-            return timeout
+            # Take every alarm that's due as of a single "now"
+            # and run them in trigger order.
+            now = self.time()
+            due = self._due(now, (limit - executed) if limit else None)
+            if not due:
+                return self._next_timeout(now)
+            n = 0
+            try:
+                while (n < len(due)) and not self.done():
+                    alarm = due[n][2]
+                    n += 1
+                    if not alarm.pending:
+                        # cancelled by an earlier callback in this batch;
+                        # it's already out of the heap.
+                        self._cancelled -= 1
+                        continue
+                    alarm.pending = False
+                    log.trace("alarm cb=%s.", alarm.callback)
+                    alarm.callback(*alarm.args)
+                    executed += 1
+            finally:
+                # If we stopped or a callback raised, put
+                # back whatever we didn't get to.
+                for entry in due[n:]:
+                    heapq.heappush(self._alarms, entry)
+            if limit and (executed >= limit):
+                return 0
+        return None
+
+    def _due(self, now, limit=None):
+        """Pops (up to limit) heap entries whose trigger is at or before now."""
+        alarms = self._alarms
+        due = []
+        while alarms:
+            entry = alarms[0]
+            if not entry[2].pending:
+                heapq.heappop(alarms)
+                self._cancelled -= 1
+                continue
+            if entry[0] > now:
+                break
+            if (limit is not None) and (len(due) >= limit):
+                break
+            due.append(heapq.heappop(alarms))
+        return due
+
+    def _next_timeout(self, now):
+        """Seconds until the next pending alarm, or None if there isn't one."""
+        alarms = self._alarms
+        while alarms and not alarms[0][2].pending:
+            heapq.heappop(alarms)
+            self._cancelled -= 1
+        if not alarms:
+            return None
+        return max(alarms[0][0] - now, 0)
 
     def call(self, cb, *args):
-        log.trace("queue cb=%s." % cb)
-        self._q.put((cb, args))
+        log.trace("queue cb=%s.", cb)
+        if threading.get_ident() == self._thread:
+            self._q.append((cb, args))
+        else:
+            self._inbox.append((cb, args))
         self._signal()
 
+    def time(self):
+        """
+        The reactor's clock, in seconds; alarm triggers are on this
+        scale.  Subclasses with a different clock override this.
+        """
+        return time.monotonic()
+
     def after_s(self, seconds, callback, *args):
-        trigger = time.monotonic() + seconds
-        r = (trigger, callback, args)
-        log.trace("after_s cb=%s." % callback)
-        self._alarms.append(r)
-        self._alarms.sort()
+        trigger = self.time() + seconds
+        r = Alarm(trigger, callback, args)
+        log.trace("after_s cb=%s.", callback)
+        heapq.heappush(self._alarms, (trigger, next(self._sequence), r))
         self._signal()
         return r
 
@@ -56,11 +196,36 @@ class Reactor(object):
         return self.after_s(ms / 1000.0, callback, *args)
 
     def cancel_after(self, r):
-        if r not in self._alarms:
+        # It's always ok to cancel, even after the alarm has fired.
+        if (r is None) or not r.pending:
             return
-        self._alarms.remove(r)
+        r.pending = False
+        self._cancelled += 1
+        if self._cancelled > (len(self._alarms) * self.compact_ratio):
+            self._compact()
         self._signal()
 
+    def remaining_s(self, r):
+        """
+        Seconds until alarm r fires (0 if it's overdue), or None if
+        it's already fired or been cancelled.
+        """
+        if (r is None) or not r.pending:
+            return None
+        return max(r.trigger - self.time(), 0)
+
+    def pending_alarms(self):
+        """Returns the number of alarms that haven't fired or been cancelled."""
+        return len(self._alarms) - self._cancelled
+
+    def _compact(self):
+        alarms = [a for a in self._alarms if a[2].pending]
+        # Alarms cancelled while sync() has them out of
+        # the heap are still counted, so don't just zero this.
+        self._cancelled -= len(self._alarms) - len(alarms)
+        heapq.heapify(alarms)
+        self._alarms = alarms
+
     def done(self):
         return self._done
 
@@ -72,6 +237,119 @@ class Reactor(object):
     def _signal(self):
         assert False
 
-    def _run_event(self, machine, ev):
-        """All events are queued up."""
-        self.call(ev, machine)
+    def broadcast(self, machines, event_name, *args):
+        """
+        Sends event_name(*args) to each of machines, in order, with
+        one queued callback for the lot instead of one per machine.
+        Machines that aren't running are skipped, and so are running
+        machines generated with bitset=True that would ignore the
+        event (none of the states handling it is active).  If a
+        handler raises, the rest of the machines still get the event;
+        then the first error is raised.
+        """
+        self.call(self._broadcast, list(machines), event_name, args)
+
+    def _broadcast(self, machines, event_name, args):
+        # handler and _state_machine_handled mask, by class
+        classes = {}
+        journal = self.journal
+        error = None
+        for machine in machines:
+            if not machine._is_valid:
+                continue
+            c = type(machine)
+            found = classes.get(c)
+            if found is None:
+                found = classes[c] = _broadcast_handler(c, event_name)
+            handler, handled = found
+            if handled is not None:
+                active = machine._active
+                if (
+                    active
+                    and not (active & handled)
+                    and not machine._state_machine_debug_enable
+                ):
+                    continue
+            try:
+                if journal is not None:
+                    journal.deliver(machine, handler, *args)
+                else:
+                    handler(machine, *args)
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+    def _run_event(self, machine, ev, *args):
+        """
+        Queues ev(machine, *args).  Generated event methods pass their
+        handler function and arguments straight through, so there's no
+        closure to allocate per event.
+        """
+        if self.journal is not None:
+            # so it's recorded when it's delivered.
+            args = (ev,) + args
+            ev = self.journal.deliver
+        if threading.get_ident() == self._thread:
+            if self.inline_events and not (
+                self._running or self._q or self._inbox or self._done
+            ):
+                # Nothing's ahead of us in the queue so running it now
+                # is the same order; anything it calls gets queued.
+                self._running = True
+                try:
+                    return ev(machine, *args)
+                finally:
+                    self._running = False
+            self._q.append((ev, (machine,) + args))
+        else:
+            self._inbox.append((ev, (machine,) + args))
+        self._signal()
+
+    def _coalesce_event(self, key, machine, ev, *args):
+        """
+        Like _run_event, except that if a call with the same key is
+        still queued, that call just gets these arguments instead of
+        queueing another.  Events declared with "coalesce:" use this
+        with (id(machine), event name) as the key.
+        """
+        with self._coalesced_lock:
+            pending = self._coalesced.get(key)
+            if pending is not None:
+                pending[2] = args
+                # (another thread that gets here before the first
+                # call returns gets None.)
+                return pending[3]
+            pending = [machine, ev, args, None]
+            self._coalesced[key] = pending
+        pending[3] = self._run_event(self, Reactor._run_coalesced, key)
+        return pending[3]
+
+    def _run_coalesced(self, key):
+        with self._coalesced_lock:
+            machine, ev, args, result = self._coalesced.pop(key)
+        if self.journal is not None:
+            return self.journal.deliver(machine, ev, *args)
+        return ev(machine, *args)
+
+
+def _broadcast_handler(machine_class, event_name):
+    """
+    Returns (handler, mask) for sending event_name to instances of
+    machine_class; mask is None unless it's safe to skip instances
+    with none of its states active.
+    """
+    handler = machine_class._state_machine_handlers[event_name]
+    handled = getattr(machine_class, "_state_machine_handled", {}).get(event_name)
+    if handled is not None:
+        # Skipping a machine skips its _state_machine_ignored call,
+        # which only matters if someone's overridden it.
+        for c in machine_class.__mro__:
+            if "_state_machine_handled" in c.__dict__:
+                if machine_class._state_machine_ignored is not (
+                    c._state_machine_ignored
+                ):
+                    handled = None
+                break
+    return handler, handled
@@ -0,0 +1,259 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# ring.py - Events from another process through shared memory.
+#
+# An EventRing is a ring buffer of fixed-size records in
+# multiprocessing.shared_memory.  Each record is an event ID, a machine
+# number and the event's arguments, packed with struct according to the
+# format given for that event, so nothing is pickled.  A producer
+# process puts records in; the process running the reactor attaches
+# the ring, and a doorbell (an eventfd, or a pipe where there isn't
+# one) registered with add_fd tells it there's something to read.  The
+# reactor then drains the ring in batches, calling the machines'
+# generated event handlers directly.
+#
+# There's one producer and one consumer per ring.  The producer only
+# writes the head index and the consumer only writes the tail, each
+# after the records it covers; that's all the synchronization there
+# is, which relies on stores from one process becoming visible to the
+# other in order (as they do on x86).  The doorbell's file descriptors
+# are inherited, so the producer has to be forked from the process
+# that made the ring.
+
+import os
+import struct
+from multiprocessing import shared_memory
+
+import smax.log as log
+
+# The head (next record to write) and tail (next to read) counters
+# only increase; each is on its own cache line.
+_HEAD = 0
+_TAIL = 64
+_RECORDS = 128
+_index = struct.Struct("<Q")
+# event ID and machine number
+_record_header = "<HI"
+# what we write to the doorbell: for an eventfd, it's the (native
+# byte order) 8 byte count to add; for a pipe, anything will do.
+_ding = struct.pack("=Q", 1)
+
+
+class EventRing(object):
+    """
+    events maps each event name to the struct format of its arguments
+    (e.g. {"ev_sample": "d", "ev_switch": "?", "ev_reset": ""}); both
+    ends have to agree on it.  records (rounded up to a power of two)
+    is how many records the ring holds.
+    """
+
+    def __init__(self, events, records=65536, name=None):
+        self._names = sorted(events)
+        if len(self._names) > 0xFFFF:
+            raise ValueError("Too many events for one EventRing.")
+        self._structs = [
+            struct.Struct(_record_header + events[name]) for name in self._names
+        ]
+        self._ids = {name: n for n, name in enumerate(self._names)}
+        self._record_size = (max(s.size for s in self._structs) + 7) & ~7
+        n = 1
+        while n < records:
+            n *= 2
+        self._records = n
+        self._mask = n - 1
+        self._memory = shared_memory.SharedMemory(
+            name=name, create=True, size=_RECORDS + n * self._record_size
+        )
+        self._buffer = self._memory.buf
+        _index.pack_into(self._buffer, _HEAD, 0)
+        _index.pack_into(self._buffer, _TAIL, 0)
+        # Each end's own copy of the counter it writes, and its
+        # last look at the one the other end writes.
+        self._head = 0
+        self._tail = 0
+        self._doorbell_read, self._doorbell_write = _doorbell()
+        self._machines = None
+        self._reactor = None
+        self._batch = None
+        self._drain_queued = False
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def __len__(self):
+        """Records written and not yet read."""
+        return _index.unpack_from(self._buffer, _HEAD)[0] - (
+            _index.unpack_from(self._buffer, _TAIL)[0]
+        )
+
+    # Producer side.
+
+    def put(self, event_name, *args, machine=0):
+        """
+        Writes one record for machine number machine; returns False,
+        without writing anything, if the ring is full.  The consumer
+        isn't told until the next call to ring().
+        """
+        head = self._head
+        if head - self._tail >= self._records:
+            self._tail = _index.unpack_from(self._buffer, _TAIL)[0]
+            if head - self._tail >= self._records:
+                return False
+        n = self._ids[event_name]
+        self._structs[n].pack_into(
+            self._buffer,
+            _RECORDS + (head & self._mask) * self._record_size,
+            n,
+            machine,
+            *args
+        )
+        head += 1
+        self._head = head
+        _index.pack_into(self._buffer, _HEAD, head)
+        return True
+
+    def put_many(self, event_name, args_list, machine=0):
+        """
+        Writes a record for each tuple of arguments in args_list, then
+        rings the doorbell; returns how many fit.
+        """
+        n = self._ids[event_name]
+        s = self._structs[n]
+        buffer = self._buffer
+        mask = self._mask
+        size = self._record_size
+        head = self._head
+        self._tail = _index.unpack_from(buffer, _TAIL)[0]
+        room = self._records - (head - self._tail)
+        written = 0
+        for args in args_list:
+            if written == room:
+                break
+            s.pack_into(buffer, _RECORDS + (head & mask) * size, n, machine, *args)
+            head += 1
+            written += 1
+        self._head = head
+        _index.pack_into(buffer, _HEAD, head)
+        self.ring()
+        return written
+
+    def ring(self):
+        """Tells the consumer there are records to read."""
+        try:
+            os.write(self._doorbell_write, _ding)
+        except BlockingIOError:
+            # it's already ringing.
+            pass
+
+    # Consumer side.
+
+    def attach(self, reactor, machines, batch=4096):
+        """
+        Has reactor deliver records to machines: a machine, a list of
+        machines of the same class (records say which by number), or a
+        smax.Fleet.  At most
+        batch records are handled per reactor callback.
+        """
+        if not isinstance(machines, (list, tuple)) and not hasattr(machines, "_run"):
+            machines = [machines]
+        self._machines = machines
+        self._reactor = reactor
+        self._batch = batch
+        reactor.add_fd(self._doorbell_read, self._ready)
+        self._queue_drain()
+
+    def detach(self):
+        self._reactor.remove_fd(self._doorbell_read)
+        self._reactor = None
+        self._machines = None
+
+    def _ready(self):
+        try:
+            while os.read(self._doorbell_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._queue_drain()
+
+    def _queue_drain(self):
+        if not self._drain_queued:
+            self._drain_queued = True
+            self._reactor.call(self._drain)
+
+    def _drain(self):
+        self._drain_queued = False
+        if self._reactor is None:
+            return
+        buffer = self._buffer
+        head = _index.unpack_from(buffer, _HEAD)[0]
+        tail = self._tail
+        end = min(head, tail + self._batch)
+        log.trace("drain tail=%u end=%u head=%u.", tail, end, head)
+        structs = self._structs
+        machines = self._machines
+        mask = self._mask
+        size = self._record_size
+        fleet = hasattr(machines, "_run")
+        if fleet:
+            handlers = machines._cursor._state_machine_handlers
+        else:
+            # (they're all the same class.)
+            machine = machines[0]
+            handlers = machine._state_machine_handlers
+        handlers = [handlers[name] for name in self._names]
+        journal = self._reactor.journal
+        if (journal is not None) and not fleet:
+            handlers = [_journaled(journal, handler) for handler in handlers]
+        single = (not fleet) and (len(machines) == 1)
+        try:
+            while tail < end:
+                offset = _RECORDS + (tail & mask) * size
+                n = buffer[offset] | (buffer[offset + 1] << 8)
+                fields = structs[n].unpack_from(buffer, offset)
+                # Once we've got the fields, the producer can reuse it.
+                tail += 1
+                if single:
+                    handlers[n](machine, *fields[2:])
+                elif fleet:
+                    machines._run(fields[1], handlers[n], *fields[2:])
+                else:
+                    handlers[n](machines[fields[1]], *fields[2:])
+        finally:
+            self._tail = tail
+            _index.pack_into(buffer, _TAIL, tail)
+            if tail < head:
+                # Let everything else have a turn before the next
+                # batch; even if a handler raised, the rest are here.
+                self._queue_drain()
+
+    def close(self):
+        """Releases this process's view of the ring and its doorbell."""
+        if self._reactor is not None:
+            self.detach()
+        self._buffer = None
+        self._memory.close()
+        for fd in {self._doorbell_read, self._doorbell_write}:
+            os.close(fd)
+
+    def unlink(self):
+        """Frees the shared memory, once everyone's closed it."""
+        self._memory.unlink()
+
+
+def _doorbell():
+    if hasattr(os, "eventfd"):
+        fd = os.eventfd(0, os.EFD_NONBLOCK)
+        return fd, fd
+    r, w = os.pipe()
+    os.set_blocking(r, False)
+    os.set_blocking(w, False)
+    return r, w
+
+
+def _journaled(journal, handler):
+    def deliver(machine, *args):
+        return journal.deliver(machine, handler, *args)
+
+    return deliver
@@ -4,6 +4,7 @@
 import os
 import select
 import smax
+import threading
 
 import smax.log as log
 
@@ -13,16 +14,33 @@ class SelectReactor(smax.Reactor):
     Reactor that works with unix's select so that the entire application
     works in a single thread.  Use add_fd and remove_fd to trigger
     a callback when select() returns data ready on the file descriptor.
+
+    Wakeups are coalesced: calls made from the reactor thread itself
+    never signal (the run loop always syncs before it selects again),
+    and other threads only signal when there isn't already a wakeup
+    pending.  Where the platform has it, the wakeup goes through an
+    eventfd instead of a pipe.
     """
 
     update = b"U"
 
-    def __init__(self):
-        self._control_read, self._control_write = os.pipe()
+    def __init__(self, max_callbacks=None, inline_events=False):
+        if hasattr(os, "eventfd"):
+            fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._control_read, self._control_write = fd, fd
+            self._wakeup = self._eventfd_wakeup
+            self._drain = self._eventfd_drain
+        else:
+            self._control_read, self._control_write = os.pipe()
+            os.set_blocking(self._control_read, False)
+            os.set_blocking(self._control_write, False)
+            self._wakeup = self._pipe_wakeup
+            self._drain = self._pipe_drain
+        self._wakeup_pending = False
         self._r = {self._control_read: self.__control_ready}
         self._w = {}
         self._x = {}
-        super(SelectReactor, self).__init__()
+        super(SelectReactor, self).__init__(max_callbacks, inline_events)
 
     def run(self):
         while True:
@@ -30,7 +48,7 @@ class SelectReactor(smax.Reactor):
             if self.done():
                 return
             # timeout may be None
-            log.trace("timeout=%s." % timeout)
+            log.trace("timeout=%s.", timeout)
             r, w, x = self.select(timeout)
             for ir in r:
                 self._r[ir]()
@@ -45,7 +63,37 @@ class SelectReactor(smax.Reactor):
         return r, w, x
 
     def _signal(self):
-        os.write(self._control_write, self.update)
+        if threading.get_ident() == self._thread:
+            # We're not blocked in select, and we'll sync
+            # before we get there.
+            return
+        if self._wakeup_pending:
+            return
+        self._wakeup_pending = True
+        self._wakeup()
+
+    def _pipe_wakeup(self):
+        try:
+            os.write(self._control_write, self.update)
+        except BlockingIOError:
+            # The pipe is full, so select will wake up anyway.
+            pass
+
+    def _pipe_drain(self):
+        try:
+            while os.read(self._control_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _eventfd_wakeup(self):
+        os.eventfd_write(self._control_write, 1)
+
+    def _eventfd_drain(self):
+        try:
+            os.eventfd_read(self._control_read)
+        except BlockingIOError:
+            pass
 
     def add_fd(self, fd, read_callback):
         self._r[fd] = read_callback
@@ -55,6 +103,18 @@ class SelectReactor(smax.Reactor):
         del self._r[fd]
         self._signal()
 
+    def add_write_fd(self, fd, write_callback):
+        self._w[fd] = write_callback
+        self._signal()
+
+    def remove_write_fd(self, fd):
+        del self._w[fd]
+        self._signal()
+
     def __control_ready(self):
-        # Get 'update' out of the ingress port.
-        os.read(self._control_read, 4096)
+        # Get 'update' out of the ingress port.  Clear the
+        # pending flag only after draining; a signal that
+        # arrives in between will have its call picked up
+        # by the sync that follows.
+        self._drain()
+        self._wakeup_pending = False
@@ -0,0 +1,159 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+# snapshot.py - Saves a running state machine and brings it back later.
+#
+# A snapshot is a few bytes: a header saying which class it's for (by
+# a checksum of its state and slot names), the IDs of the active states,
+# the seconds left on each of their timeouts (NaN for one that's fired)
+# and a pickle of the machine's own attributes: those declared with
+# "slots:" and anything else in its __dict__, leaving out the ones the
+# generated class keeps for itself.  Restoring one puts the states back and arms new timeouts for
+# whatever time was left, without running any enter code; the machine
+# carries on as if it had never stopped.  Events still queued on the
+# reactor aren't part of the machine, so they aren't saved.
+#
+# save and load put the snapshots of many machines in one file, which
+# load maps into memory instead of reading.
+
+import math
+import mmap
+import pickle
+import struct
+import zlib
+
+import smax.log as log
+
+# magic, class fingerprint, number of active states
+_header = struct.Struct("<4sIH")
+_MAGIC = b"SMX1"
+# magic, number of snapshots; then (number + 1) offsets
+_file_header = struct.Struct("<4sI")
+_FILE_MAGIC = b"SMXF"
+_offset = struct.Struct("<Q")
+
+_fingerprints = {}
+
+# Attributes of the generated class, generated with any options;
+# everything named _state_machine_* is left out too.
+_internal = {"_reactor", "_state", "_active", "_timeouts", "_region", "_is_valid"}
+
+
+def fingerprint(machine_class):
+    """Checksum of the class's state and slot names."""
+    r = _fingerprints.get(machine_class)
+    if r is None:
+        names = [s[0] for s in machine_class._state_machine_states]
+        names.extend(machine_class._state_machine_slots)
+        r = zlib.crc32("\0".join(names).encode("utf-8"))
+        _fingerprints[machine_class] = r
+    return r
+
+
+def snapshot(machine):
+    """Returns bytes that restore can put back into a new machine."""
+    c = type(machine)
+    ids = {s[0]: n for n, s in enumerate(c._state_machine_states)}
+    active = sorted((ids[name], timeouts) for name, timeouts in machine._state.items())
+    remaining_s = machine._reactor.remaining_s
+    remaining = []
+    for n, timeouts in active:
+        for handle in timeouts:
+            r = remaining_s(handle)
+            remaining.append(math.nan if r is None else r)
+    data = [
+        _header.pack(_MAGIC, fingerprint(c), len(active)),
+        struct.pack("<%uH" % len(active), *[n for n, timeouts in active]),
+        struct.pack("<%ud" % len(remaining), *remaining),
+    ]
+    attributes = {}
+    for name, value in getattr(machine, "__dict__", {}).items():
+        if (name not in _internal) and not name.startswith("_state_machine_"):
+            attributes[name] = value
+    for name in c._state_machine_slots:
+        try:
+            attributes[name] = getattr(machine, name)
+        except AttributeError:
+            pass
+    if attributes:
+        data.append(pickle.dumps(attributes, pickle.HIGHEST_PROTOCOL))
+    return b"".join(data)
+
+
+def restore(machine, data):
+    """
+    Puts machine, which mustn't be running, in the states recorded by
+    snapshot(data) and arms its timeouts with the time that was left.
+    """
+    c = type(machine)
+    if machine._is_valid:
+        raise RuntimeError("%s is already running" % c.__name__)
+    data = memoryview(data)
+    if len(data) < _header.size:
+        raise ValueError("Not a state machine snapshot.")
+    magic, check, count = _header.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError("Not a state machine snapshot.")
+    if check != fingerprint(c):
+        raise ValueError("Snapshot isn't for %s." % c.__name__)
+    offset = _header.size
+    active = struct.unpack_from("<%uH" % count, data, offset)
+    offset += 2 * count
+    states = c._state_machine_states
+    table = hasattr(machine, "_region")
+    for n in active:
+        name, region, methods = states[n]
+        timeouts = ()
+        if methods:
+            remaining = struct.unpack_from("<%ud" % len(methods), data, offset)
+            offset += 8 * len(methods)
+            timeouts = [
+                (
+                    None
+                    if math.isnan(r)
+                    else machine._state_machine_call_after_s(
+                        r, getattr(machine, method), name
+                    )
+                )
+                for r, method in zip(remaining, methods)
+            ]
+        log.trace("restore %s.", name)
+        machine._record_state(name, timeouts)
+        if table and (region is not None):
+            machine._region[region] = n
+    if offset < len(data):
+        for name, value in pickle.loads(data[offset:]).items():
+            setattr(machine, name, value)
+    machine._is_valid = True
+
+
+def save(filename, machines):
+    """Writes a snapshot of each of machines to filename."""
+    blobs = [snapshot(machine) for machine in machines]
+    start = _file_header.size + _offset.size * (len(blobs) + 1)
+    size = start + sum(len(blob) for blob in blobs)
+    with open(filename, "w+b") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as m:
+            _file_header.pack_into(m, 0, _FILE_MAGIC, len(blobs))
+            offset = start
+            for n, blob in enumerate(blobs):
+                _offset.pack_into(m, _file_header.size + _offset.size * n, offset)
+                m[offset : offset + len(blob)] = blob
+                offset += len(blob)
+            _offset.pack_into(m, _file_header.size + _offset.size * len(blobs), offset)
+
+
+def load(filename):
+    """
+    The snapshots saved in filename, in order, as memoryviews of the
+    file mapped into memory; pass them to restore.
+    """
+    with open(filename, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(m)
+    magic, count = _file_header.unpack_from(data, 0)
+    if magic != _FILE_MAGIC:
+        raise ValueError("%s isn't a state machine snapshot file." % filename)
+    offsets = struct.unpack_from("<%uQ" % (count + 1), data, _file_header.size)
+    return [data[offsets[n] : offsets[n + 1]] for n in range(count)]
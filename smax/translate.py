@@ -11,25 +11,141 @@ import sys
 
 environment = jinja2.Environment()
 
+# Code generation options and their defaults; pass these as keyword
+# arguments to generate_python, translate or smax.load.
+default_options = {
+    # Give each state an integer ID and keep the active states in an
+    # int bitmask (self._active) instead of the self._state dict.
+    "bitset": False,
+    # "chain" has each state check its inner states with if/elif
+    # chains; "table" keeps the active state of each region in
+    # self._region and finds the handler in a per-event table.
+    "dispatch": "chain",
+    # Only call the _state_machine_enter, _exit, _handle and _timeout
+    # hooks when debugging is enabled or a subclass overrides a hook.
+    "lean": False,
+    # Default value for _state_machine_microstep_limit: how many
+    # default transitions may run in a row before we decide the
+    # machine is stuck in a loop and raise LivelockError.
+    "microstep_limit": 1000,
+    # Give the generated class __slots__: our own attributes plus
+    # the ones the machine declares with "slots:".
+    "slots": False,
+}
+
+option_values = {
+    "dispatch": ("chain", "table"),
+}
+
+
+def options(**kwargs):
+    unknown = sorted(set(kwargs) - set(default_options))
+    if unknown:
+        raise TypeError("Unknown code generation option(s) %s." % ", ".join(unknown))
+    r = dict(default_options)
+    r.update(kwargs)
+    for name, values in option_values.items():
+        if r[name] not in values:
+            raise ValueError(
+                "%s must be one of %s, not %r." % (name, ", ".join(values), r[name])
+            )
+    return r
+
+
+# Compiled templates, by source.  Filters like goto and transitions run
+# once per transition, so compiling their template every time was most
+# of the cost of generating a large machine.
+_templates = {}
+
+
+def template(source):
+    t = _templates.get(source)
+    if t is None:
+        t = environment.from_string(source)
+        _templates[source] = t
+    return t
+
 
 def machine(m):
     # we store some parameters in the state objects.
-    for s in m.all_states():
+    regions = 0
+    for n, s in enumerate(m.all_states()):
         s._transition_methods = []
-    t = environment.from_string(
+        s._state_id = n
+        for sl in s.inner_states:
+            for i in sl:
+                i._region_id = regions
+            regions += 1
+    m._regions = regions
+    t = template(
         r"""
 class {{ machine.name }}({{machine.superclass}}):
+    {%- if machine._options.slots %}
+    __slots__ = {{machine|instance_slots}}
+    {%- endif %}{# machine._options.slots #}
     # Make some printable strings to help diagnostics.
     {%- for state in machine.all_states() %}
     {{state.array_name}} = {{state.name_list|as_list}}
     {{state.full_name}} = "{{state.dot_name}}"
     {%- endfor %}{# state in machine.all_states() #}
+    {%- if machine._options.bitset %}
+    # state names by ID
+    _state_names = (
+        {%- for state in machine.all_states() %}
+        {{state.full_name}},
+        {%- endfor %}{# state in machine.all_states() #}
+    )
+    _state_bits = {name: 1 << n for n, name in enumerate(_state_names)}
+    {%- endif %}{# machine._options.bitset #}
     def __init__(self, reactor, debug_enable=False):
         self._reactor = reactor
+        {%- if machine._options.bitset %}
+        # bit n is set when the state with ID n is active;
+        # its timeout handles are in _timeouts[n].
+        self._active = 0
+        self._timeouts = [None] * {{machine.all_states()|length}}
+        {%- else %}{# machine._options.bitset #}
         self._state = { }
+        {%- endif %}{# machine._options.bitset #}
+        {%- if machine._options.dispatch == "table" %}
+        # ID of the active state in each region, or None.
+        self._region = [None] * {{machine._regions}}
+        {%- endif %}{# machine._options.dispatch == "table" #}
         self._state_machine_debug_enable = debug_enable
         self._is_valid = False
-        self._busy = False
+        # (state, transition) for default transitions that are
+        # waiting for _state_machine_drain to run them; empty most
+        # of the time, so don't spend a list on it until needed.
+        self._state_machine_pending = ()
+        # States the running _state_machine_drain has taken default
+        # transitions from, or None when it isn't running.
+        self._state_machine_steps = None
+    {%- if machine._options.lean %}
+    # The generated code only calls the diagnostic hooks
+    # if self._state_machine_hooks is set, which it is when
+    # debugging is enabled or a subclass overrides any of them.
+    _state_machine_hook_names = (
+        "_state_machine_debug",
+        "_state_machine_enter",
+        "_state_machine_exit",
+        "_state_machine_handle",
+        "_state_machine_timeout",
+    )
+    _state_machine_overridden = False
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._state_machine_overridden = any(
+            getattr(cls, name) is not getattr({{machine.name}}, name)
+            for name in cls._state_machine_hook_names
+        )
+    @property
+    def _state_machine_debug_enable(self):
+        return self._state_machine_debug_enabled
+    @_state_machine_debug_enable.setter
+    def _state_machine_debug_enable(self, enable):
+        self._state_machine_debug_enabled = enable
+        self._state_machine_hooks = enable or self._state_machine_overridden
+    {%- endif %}{# machine._options.lean #}
     def _state_machine_debug(self, msg):
         if self._state_machine_debug_enable:
             print(
@@ -53,51 +169,153 @@ class {{ machine.name }}({{machine.superclass}}):
     def _state_machine_ignored(self, event_name, *args):
         self._state_machine_debug("Ignored %s" % event_name)
     def _state_machine_call_after_s(self, seconds, callback, context):
+        {%- if machine._options.lean %}
+        if self._state_machine_hooks:
+            self._state_machine_debug(
+                "Scheduling %s timeout after %s seconds." % (context, seconds)
+            )
+        {%- else %}{# machine._options.lean #}
         self._state_machine_debug(
             "Scheduling %s timeout after %s seconds." % (context, seconds)
         )
+        {%- endif %}{# machine._options.lean #}
         return self._reactor.after_s(seconds, callback)
     def _state_machine_call_after_ms(self, ms, callback, context):
+        {%- if machine._options.lean %}
+        if self._state_machine_hooks:
+            self._state_machine_debug(
+                "Scheduling %s timeout after %s ms." % (context, ms)
+            )
+        {%- else %}{# machine._options.lean #}
         self._state_machine_debug(
             "Scheduling %s timeout after %s ms." % (context, ms)
         )
+        {%- endif %}{# machine._options.lean #}
         return self._reactor.after_ms(ms, callback)
     def _state_machine_cancel_timeout(self, handle):
         return self._reactor.cancel_after(handle)
+    _state_machine_microstep_limit = {{machine._options.microstep_limit}}
+    def _state_machine_drain(self, tail=False):
+        # _configure methods don't take default transitions
+        # themselves--that would recurse once per transition--but
+        # leave them here for us to run one after another.  The
+        # transitions we run call us again (from _configure).  We
+        # run what's pending right away, where the transition used
+        # to be taken, unless the caller says nothing's left to do
+        # (tail) between here and the drain that's already running:
+        # then that one runs it next, without the stack growing.
+        steps = self._state_machine_steps
+        outermost = steps is None
+        if outermost:
+            steps = self._state_machine_steps = []
+        elif tail:
+            return
+        try:
+            # Transitions we run may defer more, maybe into a new list.
+            while self._state_machine_pending:
+                state, transition = self._state_machine_pending.pop(0)
+                if not self._in_state(state):
+                    continue
+                steps.append(state)
+                if len(steps) > self._state_machine_microstep_limit:
+                    self._state_machine_pending = ()
+                    looping = []
+                    for s in steps[-100:]:
+                        if s not in looping:
+                            looping.append(s)
+                    raise LivelockError(
+                        "{{machine.name}} took more than %u default transitions "
+                        "in a row, looping through %s."
+                        % (self._state_machine_microstep_limit, ", ".join(looping))
+                    )
+                transition()
+        finally:
+            if outermost:
+                self._state_machine_steps = None
+        self._state_machine_pending = ()
+    def _state_machine_defer(self, state, transition):
+        if self._state_machine_pending:
+            self._state_machine_pending.append((state, transition))
+        else:
+            self._state_machine_pending = [(state, transition)]
+    {%- if machine._options.bitset %}
+    # The generated code tests and sets bits inline; these
+    # are for everyone else.
+    @property
+    def _state(self):
+        active = self._active
+        return {
+            name: self._timeouts[n]
+            for n, name in enumerate(self._state_names)
+            if (active >> n) & 1
+        }
+    def _record_state(self, state, timeouts):
+        n = self._state_names.index(state)
+        self._active |= 1 << n
+        self._timeouts[n] = timeouts
+    def _unrecord_state(self, state):
+        n = self._state_names.index(state)
+        if not (self._active >> n) & 1:
+            raise KeyError(state)
+        self._active &= ~(1 << n)
+        timeouts, self._timeouts[n] = self._timeouts[n], None
+        return timeouts
+    def _in_state(self, state):
+        return bool(self._active & self._state_bits[state])
+    {%- else %}{# machine._options.bitset #}
     def _record_state(self, state, timeouts):
         self._state[state] = timeouts
     def _unrecord_state(self, state):
         return self._state.pop(state)
     def _in_state(self, state):
         return state in self._state
+    {%- endif %}{# machine._options.bitset #}
     def start(self):
         if self._is_valid:
             raise RuntimeError("{{machine.name}} is already running")
+        if self._reactor.journal is not None:
+            self._reactor.journal.started(self)
         self.call(self._{{machine|munge("enter")}})
         self._is_valid = True
     def end(self):
+        if self._reactor.journal is not None:
+            self._reactor.journal.ended(self)
         self.call(self._{{machine|munge("unconfigure")}})
+    def snapshot(self):
+        # bytes for restore: the active states, the time left
+        # on their timeouts, and our attributes.
+        import smax.snapshot
+        return smax.snapshot.snapshot(self)
+    def restore(self, data):
+        # Picks up where snapshot left off, without running
+        # any enter code; the machine mustn't be running.
+        import smax.snapshot
+        smax.snapshot.restore(self, data)
     def call(self, cb, *args):
         self._reactor.call(cb, *args)
     # events
     {%- for ev in machine.event_list %}
     def {{ev.name}}({{ev.args|insert("self")|join(", ")}}):
-        m = lambda self: self._{{machine.full_name}}_{{ev.name}}(
-            {{ev.args|join(", ")}}
+        # The reactor queues this, so events called from
+        # transitions (or other threads) never nest.
+        {%- set handler = "type(self)._%s_%s" % (machine.full_name, ev.name) %}
+        {%- if ev.name in machine.coalesce %}
+        # If it's already queued, that call gets these arguments.
+        {%- set key = '(id(self), "%s")' % ev.name %}
+        return self._reactor._coalesce_event(
+            {{ev.args|insert(handler)|insert("self")|insert(key)|join(", ")}}
         )
-        if self._busy:
-            raise RuntimeError("{{machine.name}} recursive events (via a call to {{ev.name}}) is not supported.")
-        try:
-            self._busy = True
-            return self._reactor._run_event(self, m)
-        finally:
-            self._busy = False
+        {%- else %}{# ev.name in machine.coalesce #}
+        return self._reactor._run_event(
+            {{ev.args|insert(handler)|insert("self")|join(", ")}}
+        )
+        {%- endif %}{# ev.name in machine.coalesce #}
     {%- endfor %}{# ev in machine.event_list #}
     # states
     {%- for state in machine.all_states() %}
     def _{{state|munge("enter")}}(self):
         {%- if state.parent %}
-        if not self._in_state(self.{{state.parent.full_name}}):
+        if not {{state.parent|in_state}}:
             self._{{state.parent|munge("configure")}}(
                 [{{state|configure_list|join(", ")}}],
             )
@@ -106,25 +324,37 @@ class {{ machine.name }}({{machine.superclass}}):
         {%- else %}{# state.parent #}
         self._{{state|munge("configure")}}()
         {%- endif %}{# state.parent #}
+        if self._state_machine_pending:
+            self._state_machine_drain()
     def _{{state|munge("configure")}}(self, configurators=None):
         {%- set condition=["if"] %}
         {%- for or_peer in state.or_with %}
-        {{condition[0]}} self._in_state(self.{{or_peer.full_name}}):
+        {{condition[0]}} {{or_peer|in_state}}:
             self._{{or_peer|munge("unconfigure")}}()
         {%- set _ = condition.append("elif" if condition.pop() else "if") %}
         {%- endfor %}{# or_peer in self.or_with #}
         {%- if state.parent %}
-        if not self._in_state(self.{{state.parent.full_name}}):
+        if not {{state.parent|in_state}}:
+            {%- if machine._options.lean %}
+            if self._state_machine_hooks:
+                self._state_machine_debug("Not in {{state.parent.full_name}}")
+            {%- else %}{# machine._options.lean #}
             self._state_machine_debug("Not in {{state.parent.full_name}}")
+            {%- endif %}{# machine._options.lean #}
             self._{{state.parent|munge("configure")}}(
                 [{{state|configure_list|join(", ")}}],
             )
             return
         {%- endif %}{# state.parent #}
+        {%- if machine._options.lean %}
+        if self._state_machine_hooks:
+            self._state_machine_enter(self.{{state.array_name}})
+        {%- else %}{# machine._options.lean #}
         self._state_machine_enter(self.{{state.array_name}})
+        {%- endif %}{# machine._options.lean #}
         {{-state|configure|indent(8)}}
         {%- if state.timeouts %}
-        self._record_state(self.{{state.full_name}}, [
+        {%- set timeouts %}[
         {%- for t in state.timeouts %}
             self._state_machine_call_after_{{t.time_spec.scale}}(
                 {{t.time_spec.timeout}},
@@ -132,26 +362,56 @@ class {{ machine.name }}({{machine.superclass}}):
                 self.{{state.full_name}},
             ),
         {%- endfor %}{# t in state.timeouts #}
-            ])
+        ]{% endset %}
         {%- else %}{# state.timeouts #}
-        self._record_state(self.{{state.full_name}}, [])
+        {#- states without timeouts all share this #}
+        {%- set timeouts = "()" %}
         {%- endif %}{# state.timeouts #}
+        {%- if machine._options.bitset %}
+        self._active |= {{state|state_bit}}
+        self._timeouts[{{state._state_id}}] = {{timeouts}}
+        {%- else %}{# machine._options.bitset #}
+        self._record_state(self.{{state.full_name}}, {{timeouts}})
+        {%- endif %}{# machine._options.bitset #}
+        {%- if (machine._options.dispatch == "table") and state.parent %}
+        self._region[{{state._region_id}}] = {{state._state_id}}
+        {%- endif %}{# machine._options.dispatch == "table" #}
         if configurators is None:
             configurators = [{{state|child_list|join(", ")}}]
         for c in configurators:
             c()
+            if self._state_machine_pending:
+                {%- if state|transitions() %}
+                self._state_machine_drain()
+                {%- else %}{# state|transitions() #}
+                self._state_machine_drain(c is configurators[-1])
+                {%- endif %}{# state|transitions() #}
         {{-state|transitions()|indent(8)}}
     def _{{state|munge("unconfigure")}}(self):
         {%- for sl in state.inner_states %}
         {%- set condition=["if"] %}
         {%- for s in sl %}
-        {{condition[0]}} self._in_state(self.{{s.full_name}}):
+        {{condition[0]}} {{s|in_state}}:
             self._{{s|munge("unconfigure")}}()
         {%- set _ = condition.append("elif" if condition.pop() else "if") %}
         {%- endfor %}{# s in sl #}
         {%- endfor %}{# sl in state.inner_states #}
+        {%- if machine._options.lean %}
+        if self._state_machine_hooks:
+            self._state_machine_exit(self.{{state.array_name}})
+        {%- else %}{# machine._options.lean #}
         self._state_machine_exit(self.{{state.array_name}})
+        {%- endif %}{# machine._options.lean #}
+        {%- if machine._options.bitset %}
+        self._active &= ~{{state|state_bit}}
+        timeout_list = self._timeouts[{{state._state_id}}]
+        self._timeouts[{{state._state_id}}] = None
+        {%- else %}{# machine._options.bitset #}
         timeout_list = self._unrecord_state(self.{{state.full_name}})
+        {%- endif %}{# machine._options.bitset #}
+        {%- if (machine._options.dispatch == "table") and state.parent %}
+        self._region[{{state._region_id}}] = None
+        {%- endif %}{# machine._options.dispatch == "table" #}
         for t in timeout_list:
             self._state_machine_cancel_timeout(t)
         {{ state.exit|code("exit")|indent(8) }}
@@ -167,16 +427,26 @@ class {{ machine.name }}({{machine.superclass}}):
         r = False
         # Check inner states (if any)
         {%- for sl in state.inner_states %}
+        {%- if machine._options.dispatch == "table" %}
+        {%- if sl|handles(event) %}
+        h = self._{{machine.name}}_{{event.name}}_table.get(
+            self._region[{{sl[0]._region_id}}]
+        )
+        if h is not None:
+            r = h({{event.args|insert("self")|join(", ")}}) or r
+        {%- endif %}{# sl|handles(event) #}
+        {%- else %}{# machine._options.dispatch == "table" #}
         {%- set condition=["if"] %}
         {%- for s in sl %}
         {%- if event in s._events %}
-        {{condition[0]}} self._in_state(self.{{s.full_name}}):
+        {{condition[0]}} {{s|in_state}}:
             r = \
               self._{{s.full_name}}_{{event.name}}({{event.args|join(", ")}}) \
               or r
         {%- set _ = condition.append("elif" if condition.pop() else "if") %}
         {%- endif %}{# event in s._events #}
         {%- endfor %}{# s in sl #}
+        {%- endif %}{# machine._options.dispatch == "table" #}
         {%- endfor %}{# sl in state.inner_states #}
         if r:
             return True
@@ -197,20 +467,75 @@ class {{ machine.name }}({{machine.superclass}}):
     {%- endfor %}{# event in machine.event_list #}
     {%- for timeout in state.timeouts %}
     def _{{state|munge("timeout", loop.index0)}}(self):
+        if self._reactor.journal is not None:
+            self._reactor.journal.timeout(
+                self, "_{{state|munge("timeout", loop.index0)}}"
+            )
         {%- if timeout.condition %}
         if not ({{timeout.condition}}):
             return
         {%- endif %}{# timeout.condition #}
+        {%- if machine._options.lean %}
+        if self._state_machine_hooks:
+            self._state_machine_timeout(
+                self.{{state.array_name}},
+                "{{timeout.time_spec.timeout}}{{timeout.time_spec.scale}}",
+            )
+        {%- else %}{# machine._options.lean #}
         self._state_machine_timeout(
             self.{{state.array_name}},
             "{{timeout.time_spec.timeout}}{{timeout.time_spec.scale}}",
         )
+        {%- endif %}{# machine._options.lean #}
         {{-timeout|goto|indent(8)}}
+        if self._state_machine_pending:
+            self._state_machine_drain()
     {%- endfor %}{# timeout in state.timeouts #}
     {%- for transition in state._transition_methods %}
     {{- transition|transition_method|indent(4) }}
     {%- endfor %}{# transition in state._transition_methods #}
     {%- endfor %}{# state in machine.all_states() #}
+    {%- if machine._options.dispatch == "table" %}
+    # event handlers by the ID of the (inner) state handling it
+    {%- for event in machine.event_list %}
+    _{{machine.name}}_{{event.name}}_table = {
+        {%- for state in machine.all_states() %}
+        {%- if state.parent and (event in state._events) %}
+        {{state._state_id}}: _{{state.full_name}}_{{event.name}},
+        {%- endif %}{# state.parent and (event in state._events) #}
+        {%- endfor %}{# state in machine.all_states() #}
+    }
+    {%- endfor %}{# event in machine.event_list #}
+    {%- endif %}{# machine._options.dispatch == "table" #}
+    # for smax.fleet: the top-level handler for each event, the
+    # attributes declared with "slots:" and the coalesced events.
+    _state_machine_handlers = {
+        {%- for ev in machine.event_list %}
+        "{{ev.name}}": _{{machine.full_name}}_{{ev.name}},
+        {%- endfor %}{# ev in machine.event_list #}
+    }
+    _state_machine_slots = {{machine.slots|as_list}}
+    _state_machine_coalesce = {{machine.coalesce|as_list}}
+    # for smax.snapshot: each state's name, region ID
+    # and timeout methods, by state ID.
+    _state_machine_states = (
+        {%- for state in machine.all_states() %}
+        (
+            {{state.full_name}},
+            {{state._region_id if state.parent else None}},
+            ({% for t in state.timeouts %}"_{{state|munge("timeout", loop.index0)}}", {% endfor %}),
+        ),
+        {%- endfor %}{# state in machine.all_states() #}
+    )
+    {%- if machine._options.bitset %}
+    # for broadcasts: a machine ignores each event unless one of
+    # these states is active (None if its states can't tell us).
+    _state_machine_handled = {
+        {%- for ev in machine.event_list %}
+        "{{ev.name}}": {{machine|handled_states(ev)}},
+        {%- endfor %}{# ev in machine.event_list #}
+    }
+    {%- endif %}{# machine._options.bitset #}
 """
     )
     r = t.render(machine=m)
@@ -218,16 +543,38 @@ class {{ machine.name }}({{machine.superclass}}):
 
 
 def transitions(state, event=None):
-    t = environment.from_string(
+    t = template(
         r"""
 {%- if transition.condition %}
 if {{transition.condition}}:
+    {%- if lean %}
+    if self._state_machine_hooks:
+        self._state_machine_handle({{event_args|join(", ")}})
+    {%- else %}{# lean #}
     self._state_machine_handle({{event_args|join(", ")}})
+    {%- endif %}{# lean #}
+    {%- if event %}
     {{-transition|goto|indent(4)}}
+    if self._state_machine_pending:
+        self._state_machine_drain()
+    {%- else %}{# event #}
+    {{-transition|defer|indent(4)}}
+    {%- endif %}{# event #}
     return True
 {%- else %}{# transition.condition #}
+{%- if lean %}
+if self._state_machine_hooks:
+    self._state_machine_handle({{event_args|join(", ")}})
+{%- else %}{# lean #}
 self._state_machine_handle({{event_args|join(", ")}})
+{%- endif %}{# lean #}
+{%- if event %}
 {{-transition|goto|indent(0)}}
+if self._state_machine_pending:
+    self._state_machine_drain()
+{%- else %}{# event #}
+{{-transition|defer|indent(0)}}
+{%- endif %}{# event #}
 r = True
 {%- endif %}{# transition.condition #}
 """
@@ -251,13 +598,15 @@ r = True
                     transition=transition,
                     state=state,
                     event_args=event_args,
+                    event=event,
+                    lean=state._machine._options["lean"],
                 )
             )
     return "".join(r)
 
 
 def configure(state):
-    t = environment.from_string(
+    t = template(
         r"""
 {{state.enter|code("enter")}}
 """
@@ -293,7 +642,7 @@ def goto(transition):
     args = []
     if event and transition.event:
         args.extend(transition.event.args)
-    t = environment.from_string(
+    t = template(
         r"""
 {{transition_method}}({{args|join(", ")}})
 """
@@ -305,13 +654,22 @@ def goto(transition):
     )
 
 
+def defer(transition):
+    """Like goto, but for _state_machine_drain to run later."""
+    goto(transition)
+    return "\nself._state_machine_defer(self.%s, self._%s)" % (
+        transition.state.full_name,
+        transition_name(transition),
+    )
+
+
 def transition_method(transition):
     event = hasattr(transition, "event")
     args = []
     if event:
         if transition.event:
             args.extend(transition.event.args)
-    t = environment.from_string(
+    t = template(
         r"""
 def _{{transition|transition_name}}({{args|insert("self")|join(", ")}}):
     {%- if transition.unconfigure %}
@@ -328,14 +686,7 @@ def _{{transition|transition_name}}({{args|insert("self")|join(", ")}}):
 
 
 def munge(state, context, index=None):
-    log.trace(
-        "munge, state=%s, context=%s, index=%s."
-        % (
-            state.name,
-            context,
-            index,
-        ),
-    )
+    log.trace("munge, state=%s, context=%s, index=%s.", state.name, context, index)
     r = [state.full_name, context]
     if index is not None:
         r.append("%s" % index)
@@ -352,6 +703,68 @@ def transition_name(transition):
     )
 
 
+def in_state(state):
+    """Python expression that's true if state is active."""
+    if state._machine._options["bitset"]:
+        return "self._active & %s" % state_bit(state)
+    return "self._in_state(self.%s)" % state.full_name
+
+
+def handles(states, event):
+    """True if any of states has a handler for event."""
+    return any((event in s._events) for s in states)
+
+
+def state_bit(state):
+    return "0x%X" % (1 << state._state_id)
+
+
+def handled_states(machine, event):
+    mask = _handled_states(machine, event, set())
+    return "None" if mask is None else "0x%X" % mask
+
+
+def _handled_states(machine, event, seen):
+    # The top-level handler runs the machine's own transitions
+    # without checking any state, and then tries the superclasses.
+    if any(t.event == event for t in machine.transitions):
+        return None
+    seen.add(event.name)
+    mask = 0
+    for s in machine.all_states():
+        if (s is not machine) and (event in s._events):
+            mask |= 1 << s._state_id
+    for name, args in event.superclasses:
+        if name in seen:
+            continue
+        if name not in machine._event:
+            continue
+        superclass = _handled_states(machine, machine._event[name], seen)
+        if superclass is None:
+            return None
+        mask |= superclass
+    return mask
+
+
+def instance_slots(machine):
+    """Names of the attributes generated instances need."""
+    options = machine._options
+    r = ["_reactor"]
+    if options["bitset"]:
+        r.extend(["_active", "_timeouts"])
+    else:
+        r.append("_state")
+    if options["dispatch"] == "table":
+        r.append("_region")
+    if options["lean"]:
+        r.extend(["_state_machine_debug_enabled", "_state_machine_hooks"])
+    else:
+        r.append("_state_machine_debug_enable")
+    r.extend(["_is_valid", "_state_machine_pending", "_state_machine_steps"])
+    r.extend(machine.slots)
+    return "(%s)" % "".join('"%s", ' % name for name in r)
+
+
 def insert(sequence, s):
     r = [s]
     r.extend(sequence)
@@ -391,6 +804,7 @@ environment.filters["munge"] = munge
 environment.filters["insert"] = insert
 environment.filters["configure"] = configure
 environment.filters["goto"] = goto
+environment.filters["defer"] = defer
 environment.filters["timeouts"] = timeouts
 environment.filters["code"] = code
 environment.filters["transitions"] = transitions
@@ -399,6 +813,11 @@ environment.filters["child_list"] = child_list
 environment.filters["transition_name"] = transition_name
 environment.filters["transition_method"] = transition_method
 environment.filters["as_list"] = as_list
+environment.filters["in_state"] = in_state
+environment.filters["state_bit"] = state_bit
+environment.filters["handles"] = handles
+environment.filters["instance_slots"] = instance_slots
+environment.filters["handled_states"] = handled_states
 
 
 def parse(source, filename):
@@ -414,11 +833,16 @@ def parse(source, filename):
     return spec
 
 
-def generate_python(spec):
+def generate_python(spec, **kwargs):
+    o = options(**kwargs)
+    for s in spec["spec"]:
+        if "machine" in s:
+            s["machine"]._options = o
     # Generate the output.
-    t = environment.from_string(
+    t = template(
         r"""
 # Generated by {{ program_name }} from {{ source_name }}.
+from smax.reactor import LivelockError
 {%- for s in spec %}
 {#- Constant? #}
 {%- if "constant" in s %}
@@ -439,7 +863,7 @@ def generate_python(spec):
     return s
 
 
-def translate(source, filename, yaml_filename=None):
+def translate(source, filename, yaml_filename=None, **options):
     spec = parse(source, filename)
-    code = generate_python(spec)
+    code = generate_python(spec, **options)
     return spec, code
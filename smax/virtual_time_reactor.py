@@ -0,0 +1,75 @@
+# This file is part of the smax project (http://github.com/baymotion/smax)
+# and is copyrighted under GPL v3 or later.
+
+import smax
+
+import smax.log as log
+
+
+class VirtualTimeReactor(smax.Reactor):
+    """
+    Reactor with a simulated clock, for tests and simulations.  Time
+    only moves when you say so: run() and run_until() jump the clock
+    straight to each alarm's trigger instead of waiting for it, so
+    hours of timeouts take as long as the callbacks themselves, and
+    the same calls always run in the same order.  Everything runs on
+    the caller's thread; there are no file descriptors to wait on.
+    """
+
+    def __init__(self, start=0.0, max_callbacks=None, inline_events=False):
+        self._now = start
+        super(VirtualTimeReactor, self).__init__(max_callbacks, inline_events)
+
+    def time(self):
+        return self._now
+
+    def _signal(self):
+        # Nothing ever blocks, so there's nothing to wake up.
+        pass
+
+    def run(self):
+        """
+        Runs until stop() is called or there's nothing left to do:
+        nothing queued and no pending alarms.
+        """
+        while True:
+            timeout = self.sync()
+            if self.done() or (timeout is None):
+                return
+            if timeout > 0:
+                self._jump()
+
+    def run_until(self, t):
+        """
+        Runs everything due up to time t, in trigger order, and leaves
+        the clock at t (unless stop() was called first).
+        """
+        while True:
+            timeout = self.sync()
+            if self.done():
+                return
+            if timeout is None:
+                break
+            # (0 means max_callbacks cut sync short.)
+            if timeout > 0:
+                if self._alarms[0][0] > t:
+                    break
+                self._jump()
+        # Nothing else is due before t.
+        if t > self._now:
+            self._now = t
+            log.trace("now=%s.", t)
+
+    def advance(self, seconds):
+        """run_until(time() + seconds)."""
+        self.run_until(self._now + seconds)
+
+    def _jump(self):
+        # sync only returns a nonzero timeout after dropping
+        # cancelled alarms off the top of the heap, so this one's
+        # pending; setting the clock to its trigger (rather than
+        # adding the timeout) makes sure it's due.
+        trigger = self._alarms[0][0]
+        if trigger > self._now:
+            self._now = trigger
+            log.trace("now=%s.", trigger)
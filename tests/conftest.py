@@ -0,0 +1,14 @@
+# conftest.py - Fixtures shared by all the tests.
+
+import pytest
+import smax
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path_factory, monkeypatch):
+    # Keep translations made by the tests (and any processes they
+    # start) out of the user's cache.
+    directory = str(tmp_path_factory.getbasetemp() / "smax-cache")
+    monkeypatch.setattr(smax.cache, "directory", directory)
+    monkeypatch.setenv("SMAX_CACHE_DIR", directory)
+    return directory
@@ -0,0 +1,120 @@
+# test_alarms.py - Reactor alarm scheduling and cancellation.
+
+import os
+
+import smax
+
+
+def test_alarm_order():
+    reactor = smax.SelectReactor()
+    fired = []
+    reactor.after_s(0, fired.append, "b")
+    reactor.after_s(-1, fired.append, "a")
+    reactor.after_s(0, fired.append, "c")
+    reactor.after_s(60, fired.append, "never")
+    timeout = reactor.sync()
+    # alarms with the same trigger run in the order they were scheduled.
+    assert fired == ["a", "b", "c"]
+    assert 0 < timeout <= 60
+    assert reactor.pending_alarms() == 1
+
+
+def test_cancel():
+    reactor = smax.SelectReactor()
+    fired = []
+    a = reactor.after_s(0, fired.append, "a")
+    b = reactor.after_s(0, fired.append, "b")
+    reactor.cancel_after(a)
+    # cancelling twice is fine.
+    reactor.cancel_after(a)
+    assert reactor.pending_alarms() == 1
+    assert reactor.sync() is None
+    assert fired == ["b"]
+    # so is cancelling after the alarm fired.
+    reactor.cancel_after(b)
+    reactor.cancel_after(None)
+    assert reactor.pending_alarms() == 0
+
+
+def test_cancel_from_callback():
+    reactor = smax.SelectReactor()
+    fired = []
+    later = []
+
+    def first():
+        fired.append("first")
+        reactor.cancel_after(later[0])
+
+    reactor.after_s(-1, first)
+    later.append(reactor.after_s(0, fired.append, "second"))
+    reactor.sync()
+    assert fired == ["first"]
+
+
+def test_compaction():
+    reactor = smax.SelectReactor()
+    handles = [reactor.after_s(60 + i, lambda: None) for i in range(1000)]
+    for h in handles[:900]:
+        reactor.cancel_after(h)
+    # cancelled alarms don't pile up in the heap.
+    assert len(reactor._alarms) <= 500
+    assert reactor.pending_alarms() == 100
+    for h in handles[900:]:
+        assert h.pending
+
+
+def test_batch_stop():
+    reactor = smax.SelectReactor()
+    fired = []
+
+    def stop():
+        fired.append("stop")
+        reactor.stop()
+
+    reactor.after_s(-2, stop)
+    reactor.after_s(-1, fired.append, "after")
+    reactor.sync()
+    assert fired == ["stop"]
+    # the rest of the batch is still pending.
+    assert reactor.pending_alarms() == 1
+
+
+def test_max_callbacks():
+    reactor = smax.SelectReactor(max_callbacks=10)
+    fired = []
+    for i in range(25):
+        reactor.after_s(-1, fired.append, i)
+    # a full batch means "come back right away."
+    assert reactor.sync() == 0
+    assert fired == list(range(10))
+    assert reactor.sync() == 0
+    assert reactor.sync() is None
+    assert fired == list(range(25))
+
+
+def test_fairness():
+    # A timer storm doesn't keep fd handlers from running.
+    reactor = smax.SelectReactor(max_callbacks=100)
+    r, w = os.pipe()
+    order = []
+
+    def storm(n):
+        order.append("alarm")
+        if n:
+            reactor.after_s(0, storm, n - 1)
+
+    def readable():
+        os.read(r, 1)
+        order.append("fd")
+        reactor.remove_fd(r)
+        reactor.stop()
+
+    for i in range(100):
+        reactor.after_s(0, storm, 100)
+    reactor.add_fd(r, readable)
+    os.write(w, b"x")
+    reactor.run()
+    assert "fd" in order
+    assert len(order) < 1000
+    os.close(r)
+    os.close(w)
@@ -0,0 +1,70 @@
+# test_async_threads.py - Calling AsyncioReactor events from worker threads.
+
+import asyncio
+import concurrent.futures
+import pytest
+import smax
+
+r"""
+%%
+
+machine Counter:
+    enter:
+        self.count = 0
+        self.seen = []
+    ev_count(n): self.count += n; self.seen.append(self.count)
+    ev_fail: raise ValueError("failed")
+
+%%
+"""
+
+
+def load():
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    return smax.compile_python(smax.generate_python(spec)).Counter
+
+
+async def run_producers(native):
+    loop = asyncio.get_running_loop()
+    reactor = smax.AsyncioReactor(loop, native=native)
+    task = asyncio.create_task(reactor.run())
+    counter = load()(reactor)
+    counter.start()
+    producers = 8
+    count = 500
+
+    def produce():
+        futures = [counter.ev_count(1) for i in range(count)]
+        assert all(isinstance(f, concurrent.futures.Future) for f in futures)
+        return [f.result(timeout=10) for f in futures]
+
+    with concurrent.futures.ThreadPoolExecutor(producers) as executor:
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, produce) for i in range(producers)]
+        )
+    assert counter.count == producers * count
+    assert counter.seen == list(range(1, producers * count + 1))
+    # the future's result says the event was handled.
+    for r in results:
+        assert r == [True] * count
+    # exceptions come back through the future too.
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        future = await loop.run_in_executor(executor, counter.ev_fail)
+    with pytest.raises(ValueError):
+        await asyncio.wrap_future(future)
+    # called on the loop, events still return asyncio futures.
+    assert await counter.ev_count(1)
+    assert counter.count == producers * count + 1
+    reactor.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_async_threads():
+    await run_producers(False)
+
+
+@pytest.mark.asyncio
+async def test_async_threads_native():
+    await run_producers(True)
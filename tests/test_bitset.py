@@ -0,0 +1,111 @@
+# test_bitset.py - Machines generated with bitset=True behave the
+# same as the default ones and still show their states in _state.
+
+import pytest
+import smax
+import time
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    *state s_a:
+        ev_b -> s_b
+        *state s_a_1:
+            ev_a_2 -> s_a_2
+        state s_a_2:
+            ev_a_1 -> s_a_1
+            ms(10) -> s_a_1
+        ---
+        *state s_x:
+            ev_y -> s_y
+        state s_y:
+            pass
+    state s_b:
+        ev_a -> s_a
+%%
+"""
+
+
+@pytest.mark.parametrize("bitset", [False, True])
+def test_bitset(bitset):
+    module = utils.compile_state_machine(__file__, bitset=bitset)
+    Test = utils.wrap(module.TestMachine)
+    reactor = smax.SelectReactor()
+    test = Test(reactor)
+    test.start()
+    reactor.sync()
+    test.expected(
+        [
+            (Test.ENTERED, "TestMachine"),
+            (Test.ENTERED, "TestMachine.s_a"),
+            (Test.ENTERED, "TestMachine.s_a.s_a_1"),
+            (Test.ENTERED, "TestMachine.s_a.s_x"),
+        ]
+    )
+    assert sorted(test._state.keys()) == [
+        "TestMachine",
+        "TestMachine.s_a",
+        "TestMachine.s_a.s_a_1",
+        "TestMachine.s_a.s_x",
+    ]
+    assert test._in_state(test.TestMachine_0_s_a_1_s_x)
+    assert not test._in_state(test.TestMachine_0_s_b)
+
+    test.ev_a_2()
+    test.ev_y()
+    reactor.sync()
+    test.expected(
+        [
+            (Test.HANDLED, "TestMachine.s_a.s_a_1", "ev_a_2"),
+            (Test.EXITED, "TestMachine.s_a.s_a_1"),
+            (Test.ENTERED, "TestMachine.s_a.s_a_2"),
+            (Test.HANDLED, "TestMachine.s_a.s_x", "ev_y"),
+            (Test.EXITED, "TestMachine.s_a.s_x"),
+            (Test.ENTERED, "TestMachine.s_a.s_y"),
+        ]
+    )
+    # s_a_2's timeout is the only one pending.
+    timeouts = test._state[test.TestMachine_0_s_a_0_s_a_2]
+    assert len(timeouts) == 1
+    assert reactor.pending_alarms() == 1
+
+    test.ev_b()
+    reactor.sync()
+    test.expected(
+        [
+            (Test.HANDLED, "TestMachine.s_a", "ev_b"),
+            (Test.EXITED, "TestMachine.s_a.s_a_2"),
+            (Test.EXITED, "TestMachine.s_a.s_y"),
+            (Test.EXITED, "TestMachine.s_a"),
+            (Test.ENTERED, "TestMachine.s_b"),
+        ]
+    )
+    assert reactor.pending_alarms() == 0
+    assert sorted(test._state.keys()) == ["TestMachine", "TestMachine.s_b"]
+
+    test.ev_a()
+    test.ev_a_2()
+    reactor.sync()
+    test.expected(
+        [
+            (Test.HANDLED, "TestMachine.s_b", "ev_a"),
+            (Test.EXITED, "TestMachine.s_b"),
+            (Test.ENTERED, "TestMachine.s_a"),
+            (Test.ENTERED, "TestMachine.s_a.s_a_1"),
+            (Test.ENTERED, "TestMachine.s_a.s_x"),
+            (Test.HANDLED, "TestMachine.s_a.s_a_1", "ev_a_2"),
+            (Test.EXITED, "TestMachine.s_a.s_a_1"),
+            (Test.ENTERED, "TestMachine.s_a.s_a_2"),
+        ]
+    )
+    time.sleep(0.02)
+    reactor.sync()
+    test.expected(
+        [
+            (Test.TIMED_OUT, "TestMachine.s_a.s_a_2", "10ms"),
+            (Test.EXITED, "TestMachine.s_a.s_a_2"),
+            (Test.ENTERED, "TestMachine.s_a.s_a_1"),
+        ]
+    )
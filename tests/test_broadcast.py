@@ -0,0 +1,205 @@
+# test_broadcast.py - reactor.broadcast and Fleet.broadcast deliver an
+# event to many machines with one queued callback; the result is the
+# same as calling the event on each.
+
+import pytest
+import smax
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _ticks, _stops, _ignored
+    enter:
+        self._ticks = 0
+        self._stops = 0
+        self._ignored = 0
+    *state s_idle:
+        ev_go -> s_running
+    state s_running:
+        ev_tick: self._ticks += 1
+        ev_stop(n) -> s_idle:
+            self._stops += n
+        ev_reset is ev_stop(1) [False]: pass
+        ---
+        *state s_counting:
+            ev_tick [self._ticks >= 2] -> s_done
+        state s_done:
+            pass
+%%
+"""
+
+
+def machine_class(**options):
+    source = smax.load_source(__file__)
+    spec = smax.parse(source, __file__)
+    module = smax.compile_python(smax.generate_python(spec, **options))
+
+    class Test(module.TestMachine):
+        def _state_machine_ignored(self, event_name, *args):
+            self._ignored += 1
+
+    return module.TestMachine, Test
+
+
+def run(reactor, machines, events, deliver):
+    for i, m in enumerate(machines):
+        m.start()
+        if i % 3:
+            m.ev_go()
+    reactor.sync()
+    for event in events:
+        deliver(machines, *event)
+        reactor.sync()
+    return [(sorted(m._state.keys()), m._ticks, m._stops, m._ignored) for m in machines]
+
+
+def one_by_one(machines, event, *args):
+    for m in machines:
+        getattr(m, event)(*args)
+
+
+@pytest.mark.parametrize(
+    "options", [{}, {"bitset": True}, {"bitset": True, "dispatch": "table"}]
+)
+@pytest.mark.parametrize("overridden", [False, True])
+def test_broadcast(options, overridden):
+    events = [
+        ("ev_tick",),
+        ("ev_tick",),
+        ("ev_reset",),
+        ("ev_go",),
+        ("ev_tick",),
+        ("ev_stop", 2),
+    ]
+    results = []
+    for deliver in ("one_by_one", "broadcast"):
+        reactor = smax.SelectReactor()
+        TestMachine, Test = machine_class(**options)
+        c = Test if overridden else TestMachine
+        machines = [c(reactor) for i in range(10)]
+        if deliver == "broadcast":
+
+            def deliver(machines, event, *args):
+                reactor.broadcast(machines, event, *args)
+
+        else:
+            deliver = one_by_one
+        results.append(run(reactor, machines, events, deliver))
+    assert results[0] == results[1]
+    if overridden:
+        assert any(ignored for state, ticks, stops, ignored in results[1])
+
+
+def test_broadcast_mask():
+    TestMachine, Test = machine_class(bitset=True)
+    bits = TestMachine._state_bits
+    running = bits["TestMachine.s_running"]
+    assert TestMachine._state_machine_handled["ev_go"] == bits["TestMachine.s_idle"]
+    # ev_reset is handled by s_running and, as ev_stop, by s_running.
+    assert TestMachine._state_machine_handled["ev_reset"] == running
+    assert TestMachine._state_machine_handled["ev_tick"] == (
+        running | bits["TestMachine.s_running.s_counting"]
+    )
+
+
+def test_broadcast_not_started():
+    TestMachine, Test = machine_class(bitset=True)
+    reactor = smax.SelectReactor()
+    machines = [TestMachine(reactor) for i in range(2)]
+    machines[0].start()
+    reactor.sync()
+    machines.append(TestMachine(reactor))
+    machines[2].start()
+    reactor.sync()
+    machines[2].ev_go()
+    machines[0].ev_go()
+    reactor.sync()
+    # the one that isn't running doesn't stop the rest getting it.
+    reactor.broadcast(machines, "ev_tick")
+    reactor.sync()
+    assert [machines[0]._ticks, machines[2]._ticks] == [1, 1]
+
+
+def test_broadcast_error():
+    TestMachine, Test = machine_class()
+    reactor = smax.SelectReactor()
+
+    def fail(machine):
+        raise ValueError("ev_tick")
+
+    class Failing(TestMachine):
+        _state_machine_handlers = dict(
+            TestMachine._state_machine_handlers, ev_tick=fail
+        )
+
+    machines = [Failing(reactor), TestMachine(reactor), TestMachine(reactor)]
+    for m in machines:
+        m.start()
+        m.ev_go()
+    reactor.sync()
+    # the one that raises doesn't stop the rest getting it.
+    reactor.broadcast(machines, "ev_tick")
+    with pytest.raises(ValueError):
+        reactor.sync()
+    assert [m._ticks for m in machines] == [0, 1, 1]
+
+
+def test_fleet_broadcast():
+    TestMachine, Test = machine_class(bitset=True, slots=True)
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(TestMachine, reactor, 10, columns={"_ticks": "l"})
+    fleet.start()
+    fleet.broadcast("ev_go", indices=range(0, 10, 2))
+    reactor.sync()
+    fleet.broadcast("ev_tick")
+    fleet.broadcast("ev_tick")
+    reactor.sync()
+    assert list(fleet.column("_ticks")) == [2, 0] * 5
+    assert fleet.in_state(4, "TestMachine.s_running.s_counting")
+    assert fleet.in_state(5, "TestMachine.s_idle")
+    fleet.broadcast("ev_reset")
+    reactor.sync()
+    assert fleet.column("_stops") == [1, 0] * 5
+    assert all(fleet.in_state(i, "TestMachine.s_idle") for i in range(10))
+
+
+@pytest.mark.parametrize("options", [{}, {"dispatch": "table"}])
+def test_fleet_broadcast_not_started(options):
+    TestMachine, Test = machine_class(bitset=True, slots=True, **options)
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(TestMachine, reactor, 3)
+    fleet.start(1)
+    fleet.start(2)
+    fleet.broadcast("ev_go", indices=[1, 2])
+    reactor.sync()
+    # machine 0 isn't running; the others still get it.
+    fleet.broadcast("ev_tick")
+    reactor.sync()
+    assert fleet.column("_ticks") == [None, 1, 1]
+
+
+def test_fleet_broadcast_error():
+    TestMachine, Test = machine_class(bitset=True, slots=True)
+
+    def tick(machine):
+        if machine._index == 0:
+            raise ValueError("ev_tick")
+        return TestMachine._state_machine_handlers["ev_tick"](machine)
+
+    class Failing(TestMachine):
+        __slots__ = ()
+        _state_machine_handlers = dict(
+            TestMachine._state_machine_handlers, ev_tick=tick
+        )
+
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(Failing, reactor, 3)
+    fleet.start()
+    fleet.broadcast("ev_go")
+    reactor.sync()
+    # the one that raises doesn't stop the rest getting it.
+    fleet.broadcast("ev_tick")
+    with pytest.raises(ValueError):
+        reactor.sync()
+    assert fleet.column("_ticks") == [0, 1, 1]
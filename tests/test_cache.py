@@ -0,0 +1,85 @@
+# test_cache.py - smax.load keeps translations on disk.
+
+import os
+
+import smax
+
+r"""
+%%
+
+machine Cached:
+    *state s_a:
+        ev_go -> s_b
+    state s_b:
+        pass
+
+%%
+"""
+
+
+def entries(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(smax.cache, "directory", str(tmp_path))
+    monkeypatch.setattr(smax, "smax_modules", {})
+    Cached = smax.load(__file__, "Cached")
+    names = entries(tmp_path)
+    assert len(names) == 2
+    assert any(n.endswith(".code") for n in names)
+    # Loading again in this process doesn't translate again.
+    assert smax.load(__file__, "Cached") is Cached
+
+    # A new process would get it from disk.
+    def fail(*args):
+        assert False, "should have come from the cache"
+
+    monkeypatch.setattr(smax, "smax_modules", {})
+    monkeypatch.setattr(smax, "generate_python", fail)
+    python_code = []
+    Cached = smax.load(__file__, "Cached", python_code.append)
+    assert "class Cached" in python_code[0]
+    reactor = smax.SelectReactor()
+    m = Cached(reactor)
+    m.start()
+    m.ev_go()
+    reactor.sync()
+    assert m._in_state(m.Cached_0_s_b)
+    # spec() still works; it parses on demand.
+    assert smax.spec(__file__)["spec"][0]["machine"].name == "Cached"
+    assert entries(tmp_path) == names
+
+
+def test_corrupt_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(smax.cache, "directory", str(tmp_path))
+    monkeypatch.setattr(smax, "smax_modules", {})
+    smax.load(__file__, "Cached")
+    for name in entries(tmp_path):
+        if name.endswith(".code"):
+            with open(os.path.join(tmp_path, name), "wb") as f:
+                f.write(b"garbage")
+    monkeypatch.setattr(smax, "smax_modules", {})
+    # A bad code object is replaced from the cached python.
+    assert smax.load(__file__, "Cached").__name__ == "Cached"
+    smax.cache.clear()
+    assert entries(tmp_path) == []
+
+
+def test_changed_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(smax, "smax_modules", {})
+    filename = str(tmp_path / "machine.py")
+    with open(filename, "wt") as f:
+        f.write(open(__file__).read())
+    Cached = smax.load(filename, "Cached")
+
+    # An unchanged file isn't read again.
+    def fail(*args):
+        assert False, "should have come from smax_modules"
+
+    with monkeypatch.context() as m:
+        m.setattr(smax, "load_source", fail)
+        assert smax.load(filename, "Cached") is Cached
+    with open(filename, "at") as f:
+        f.write("\n# changed\n")
+    assert smax.load(filename, "Cached") is not Cached
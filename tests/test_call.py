@@ -0,0 +1,51 @@
+# test_call.py - Reactor.call from the reactor thread and from others.
+
+import threading
+
+import smax
+
+
+def test_call_order():
+    reactor = smax.SelectReactor()
+    result = []
+
+    def chain(n):
+        result.append(n)
+        if n < 5:
+            reactor.call(chain, n + 1)
+
+    reactor.call(chain, 0)
+    reactor.call(result.append, "x")
+    reactor.sync()
+    assert result == [0, "x", 1, 2, 3, 4, 5]
+
+
+def test_cross_thread():
+    reactor = smax.SelectReactor()
+    producers = 4
+    count = 1000
+    received = {n: [] for n in range(producers)}
+    finished = []
+
+    def receive(n, i):
+        received[n].append(i)
+
+    def done(n):
+        finished.append(n)
+        if len(finished) == producers:
+            reactor.stop()
+
+    def produce(n):
+        for i in range(count):
+            reactor.call(receive, n, i)
+        reactor.call(done, n)
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(producers)]
+    # Get the reactor thread running before starting the producers.
+    reactor.call(lambda: [t.start() for t in threads])
+    reactor.run()
+    for t in threads:
+        t.join()
+    # Each producer's calls arrive complete and in order.
+    for n in range(producers):
+        assert received[n] == list(range(count))
@@ -0,0 +1,115 @@
+# test_coalesce.py - Events declared with "coalesce:" aren't queued
+# again while a call is already pending; the pending call gets the
+# latest arguments.
+
+import asyncio
+import pytest
+import smax
+import threading
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _levels, _others
+    coalesce: ev_level
+    enter:
+        self._levels = []
+        self._others = 0
+    *state s_running:
+        ev_level(level): self._levels.append(level)
+        ev_other: self._others += 1
+%%
+"""
+
+
+@pytest.mark.parametrize("options", [{}, {"bitset": True, "slots": True}])
+def test_coalesce(options):
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.SelectReactor()
+    test = module.TestMachine(reactor)
+    other = module.TestMachine(reactor)
+    test.start()
+    other.start()
+    reactor.sync()
+    for level in range(1000):
+        test.ev_level(level)
+        other.ev_level(-level)
+    reactor.sync()
+    assert test._levels == [999]
+    assert other._levels == [-999]
+    # The pending call keeps its place in the queue.
+    test.ev_level(1)
+    test.ev_other()
+    test.ev_level(2)
+    test.ev_other()
+    reactor.sync()
+    assert test._levels == [999, 2]
+    assert test._others == 2
+    assert reactor._coalesced == {}
+
+
+def test_coalesce_threads():
+    module = utils.compile_state_machine(__file__)
+    reactor = smax.SelectReactor()
+    test = module.TestMachine(reactor)
+    test.start()
+    reactor.sync()
+
+    def flood():
+        for level in range(10000):
+            test.ev_level(level)
+
+    threads = [threading.Thread(target=flood) for i in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        reactor.sync()
+    reactor.sync()
+    assert test._levels[-1] == 9999
+    assert len(test._levels) < 40000
+
+
+def test_coalesce_fleet():
+    module = utils.compile_state_machine(__file__, bitset=True, slots=True)
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(module.TestMachine, reactor, 3)
+    fleet.start()
+    reactor.sync()
+    for level in range(100):
+        fleet.dispatch(0, "ev_level", level)
+        fleet.dispatch(2, "ev_level", -level)
+        fleet.dispatch(2, "ev_other")
+    reactor.sync()
+    assert fleet.column("_levels") == [[99], [], [-99]]
+    assert fleet.column("_others") == [0, 0, 100]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_asyncio():
+    module = utils.compile_state_machine(__file__)
+    loop = asyncio.get_event_loop()
+    reactor = smax.AsyncioReactor(loop)
+    reactor_task = asyncio.create_task(reactor.run())
+    test = module.TestMachine(reactor)
+    test.start()
+    futures = [test.ev_level(level) for level in range(10)]
+    # every caller gets the pending call's future.
+    assert all(f is futures[0] for f in futures)
+    await asyncio.gather(*futures)
+    assert test._levels == [9]
+    reactor.stop()
+    await reactor_task
+
+
+@pytest.mark.parametrize(
+    "clause", ["coalesce: ev_level, ev_level", "coalesce: ev_unknown"]
+)
+def test_coalesce_syntax(clause):
+    source = (
+        "machine TestMachine:\n    %s\n    *state s_a:\n        ev_level: pass\n"
+        % clause
+    )
+    with pytest.raises(smax.parser.SyntaxError):
+        smax.parse(source, "<coalesce>")
@@ -72,7 +72,7 @@ def debouncer(name, **kwargs):
 
 
 @pytest.mark.asyncio
-async def test_debounce():
+async def test_debounce(tmp_path):
     # In async mode, we can create our reactor anytime.
     loop = asyncio.get_event_loop()
     reactor = smax.AsyncioReactor(loop)
@@ -85,7 +85,7 @@ async def test_debounce():
         }
     )
     # Allow some tracing of the jinja output.
-    with open(".source", "wt") as f:
+    with open(tmp_path / "source", "wt") as f:
         f.write(source)
     spec = smax.parse(source, __file__)
     python_code = smax.generate_python(spec)
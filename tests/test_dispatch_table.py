@@ -0,0 +1,87 @@
+# test_dispatch_table.py - dispatch="table" handles events exactly
+# like the default if/elif chains: inner states first, every parallel
+# region sees the event, conditions, "is" superclasses and ignored
+# events.
+
+import pytest
+import smax
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    enter:
+        self._count = 0
+    ev_general(n) -> s_b: self._count += n
+    *state s_a:
+        ev_next -> s_b
+        *state s_a_1:
+            ev_next [self._count > 1] -> s_a_2
+            ev_specific is ev_general(10) -> s_a_2
+        state s_a_2:
+            ev_next -> s_a_1
+        ---
+        *state s_x:
+            ev_next -> s_y
+            ev_parallel -> s_y
+        state s_y:
+            ev_parallel -> s_x
+    state s_b:
+        ev_next -> s_a
+%%
+"""
+
+script = [
+    ("ev_next", ()),
+    ("ev_parallel", ()),
+    ("ev_next", ()),
+    ("ev_general", (1,)),
+    ("ev_next", ()),
+    ("ev_general", (1,)),
+    ("ev_next", ()),
+    ("ev_next", ()),
+    ("ev_specific", ()),
+    ("ev_next", ()),
+    ("ev_specific", ()),
+    ("ev_parallel", ()),
+    ("ev_next", ()),
+]
+
+
+def run(**options):
+    module = utils.compile_state_machine(
+        __file__, generated_source_filename=None, **options
+    )
+    Test = utils.wrap(module.TestMachine)
+    reactor = smax.SelectReactor()
+    test = Test(reactor)
+    test.start()
+    reactor.sync()
+    transcript = []
+    for name, args in script:
+        getattr(test, name)(*args)
+        reactor.sync()
+        events = []
+        while not test._state_machine_events.empty():
+            events.append(test._state_machine_events.get())
+        transcript.append(events)
+        transcript.append(sorted(test._state.keys()))
+    return transcript
+
+
+@pytest.mark.parametrize("bitset", [False, True])
+def test_dispatch_table(bitset):
+    chain = run(bitset=bitset)
+    table = run(bitset=bitset, dispatch="table")
+    assert table == chain
+    # s_a_2 ignores ev_specific, so the machine handles it as ev_general(10).
+    events = chain[2 * script.index(("ev_specific", ()))]
+    assert ("handled", "TestMachine", "ev_general") in events
+
+
+def test_dispatch_option():
+    with pytest.raises(ValueError):
+        utils.compile_state_machine(
+            __file__, generated_source_filename=None, dispatch="switch"
+        )
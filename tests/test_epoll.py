@@ -0,0 +1,127 @@
+# test_epoll.py - EpollReactor fd handling.
+
+import os
+import resource
+import select
+
+import pytest
+import smax
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(select, "epoll"), reason="epoll isn't available"
+)
+
+
+def test_many_fds():
+    # More descriptors than select() can handle.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < 1300:
+        if hard != resource.RLIM_INFINITY and hard < 1300:
+            pytest.skip("can't open enough descriptors")
+        resource.setrlimit(resource.RLIMIT_NOFILE, (1300, hard))
+    reactor = smax.EpollReactor()
+    pipes = []
+    try:
+        for i in range(600):
+            pipes.append(os.pipe())
+        ready = []
+
+        def readable(n, fd):
+            os.read(fd, 1)
+            ready.append(n)
+            reactor.remove_fd(fd)
+            if len(ready) == 2:
+                reactor.stop()
+
+        for n, (r, w) in enumerate(pipes):
+            reactor.add_fd(r, lambda n=n, r=r: readable(n, r))
+        assert max(pipes[-1]) > 1024
+        os.write(pipes[-1][1], b"x")
+        os.write(pipes[3][1], b"x")
+        reactor.run()
+        assert sorted(ready) == [3, len(pipes) - 1]
+    finally:
+        for r, w in pipes:
+            os.close(r)
+            os.close(w)
+        reactor.close()
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_write_fd():
+    reactor = smax.EpollReactor()
+    r, w = os.pipe()
+    written = []
+
+    def writable():
+        written.append(os.write(w, b"x"))
+        reactor.remove_write_fd(w)
+        reactor.stop()
+
+    reactor.add_write_fd(w, writable)
+    reactor.run()
+    assert written == [1]
+    assert os.read(r, 1) == b"x"
+    os.close(r)
+    os.close(w)
+    reactor.close()
+
+
+def test_write_error():
+    # A full pipe with no reader only has EPOLLERR; select would
+    # call it writable, so we do too.
+    reactor = smax.EpollReactor()
+    r, w = os.pipe()
+    os.set_blocking(w, False)
+    try:
+        while True:
+            os.write(w, bytes(65536))
+    except BlockingIOError:
+        pass
+    os.close(r)
+    reactor.add_write_fd(w, lambda: None)
+    rr, ww, xx = reactor.select(0)
+    assert ww == [w]
+    reactor.remove_write_fd(w)
+    os.close(w)
+    reactor.close()
+
+
+def test_edge_triggered():
+    reactor = smax.EpollReactor()
+    r, w = os.pipe()
+    calls = []
+
+    def readable():
+        # Deliberately don't read; level-triggered would call us again.
+        calls.append(True)
+
+    reactor.add_fd(r, readable, edge_triggered=True)
+    os.write(w, b"xy")
+    for i in range(3):
+        reactor.sync()
+        rr, ww, xx = reactor.select(0)
+        for fd in rr:
+            reactor._r[fd]()
+    assert len(calls) == 1
+    reactor.remove_fd(r)
+    os.close(r)
+    os.close(w)
+    reactor.close()
+
+
+def test_level_triggered():
+    reactor = smax.EpollReactor()
+    r, w = os.pipe()
+    calls = []
+    reactor.add_fd(r, lambda: calls.append(True))
+    os.write(w, b"xy")
+    for i in range(3):
+        rr, ww, xx = reactor.select(0)
+        for fd in rr:
+            reactor._r[fd]()
+    assert len(calls) == 3
+    reactor.remove_fd(r)
+    os.close(r)
+    os.close(w)
+    reactor.close()
@@ -0,0 +1,107 @@
+# test_fleet.py - smax.Fleet keeps many machines in columns; each one
+# behaves like its own instance.
+
+import pytest
+import smax
+import time
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _pings, _echo
+    enter: self._pings = 0
+    *state s_idle:
+        ev_ping -> s_busy
+    state s_busy:
+        enter:
+            self._pings += 1
+            # raised from inside: goes to this same machine.
+            self.ev_echo(self._pings * 10)
+        ev_echo(n):
+            self._echo = n
+            self.call(self.ev_done)
+        ev_done -> s_waiting
+    state s_waiting:
+        ms(5) -> s_idle
+        ev_ping -> s_busy
+%%
+"""
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"bitset": True}, {"bitset": True, "dispatch": "table", "lean": True}],
+)
+def test_fleet(options):
+    module = utils.compile_state_machine(__file__, slots=True, **options)
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(module.TestMachine, reactor, 10, columns={"_pings": "l"})
+    assert len(fleet) == 10
+    fleet.start()
+    reactor.sync()
+    assert all(fleet.in_state(i, "TestMachine.s_idle") for i in range(10))
+
+    fleet.dispatch(3, "ev_ping")
+    fleet.dispatch(7, "ev_ping")
+    reactor.sync()
+    fleet.dispatch(7, "ev_ping")
+    reactor.sync()
+    assert fleet.state(3) == ["TestMachine", "TestMachine.s_waiting"]
+    assert fleet.state(0) == ["TestMachine", "TestMachine.s_idle"]
+    assert list(fleet.column("_pings")) == [0, 0, 0, 1, 0, 0, 0, 2, 0, 0]
+    assert fleet.column("_echo")[3] == 10
+    assert fleet.column("_echo")[7] == 20
+    assert fleet.column("_echo")[0] is None
+    # only the busy ones have timeouts.
+    assert sorted(fleet._timeouts) == [3, 7]
+
+    while fleet._timeouts:
+        time.sleep(0.005)
+        reactor.sync()
+    assert all(fleet.in_state(i, "TestMachine.s_idle") for i in range(10))
+    # (none), idle, busy, waiting
+    assert fleet.configurations() == 4
+
+    fleet.end(3)
+    reactor.sync()
+    assert fleet.state(3) == []
+    with pytest.raises(IndexError):
+        fleet.dispatch(10, "ev_ping")
+        reactor.sync()
+
+
+def test_fleet_needs_bitset():
+    module = utils.compile_state_machine(__file__)
+    reactor = smax.SelectReactor()
+    with pytest.raises(ValueError):
+        smax.Fleet(module.TestMachine, reactor, 10)
+
+
+def test_fleet_needs_slots():
+    # Without __slots__, whatever one machine kept on self
+    # would be there for the next one too.
+    module = utils.compile_state_machine(__file__, bitset=True)
+    reactor = smax.SelectReactor()
+    with pytest.raises(ValueError):
+        smax.Fleet(module.TestMachine, reactor, 10)
+    module = utils.compile_state_machine(__file__, bitset=True, slots=True)
+
+    class Test(module.TestMachine):
+        pass
+
+    with pytest.raises(ValueError):
+        smax.Fleet(Test, reactor, 10)
+
+    class Slotted(module.TestMachine):
+        __slots__ = ()
+
+    assert len(smax.Fleet(Slotted, reactor, 10)) == 10
+
+
+def test_fleet_unknown_column():
+    module = utils.compile_state_machine(__file__, bitset=True, slots=True)
+    reactor = smax.SelectReactor()
+    with pytest.raises(ValueError):
+        smax.Fleet(module.TestMachine, reactor, 10, columns={"_nope": "l"})
@@ -0,0 +1,23 @@
+# test_generated_parser.py - The checked-in parser matches the grammar
+# and importing smax doesn't need yapps' parser generator.
+
+import subprocess
+import sys
+
+import smax.generated_parser
+import smax.parser
+
+
+def test_generated_parser_is_current():
+    # If this fails, run "python -m smax.parser && black smax/generated_parser.py".
+    assert smax.generated_parser.GRAMMAR_SHA256 == smax.parser.grammar_hash()
+
+
+def test_import_skips_yapps_grammar():
+    code = "import sys, smax; print('yapps.grammar' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert out.stdout.strip() == "False"
+    # and doesn't complain about the generated parser
+    assert out.stdout.count("ERROR") == 0
@@ -0,0 +1,55 @@
+# test_inline_events.py - Event methods hand the reactor their handler
+# and arguments (no per-call closure); with inline_events, an event
+# called while the reactor is idle runs right away.
+
+import smax
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    enter: self._log = []
+    *state s_a:
+        ev_go(n) -> s_b: self._log.append(("go", n)); self.ev_next()
+    state s_b:
+        ev_next -> s_c: self._log.append("next")
+    state s_c:
+        ev_go(n) -> s_a: self._log.append(("back", n))
+%%
+"""
+
+
+def test_no_closures():
+    source = smax.load_source(__file__)
+    spec, python_code = smax.translate(source, __file__)
+    assert "lambda" not in python_code
+
+
+def test_queued():
+    module = utils.compile_state_machine(__file__)
+    reactor = smax.SelectReactor()
+    test = module.TestMachine(reactor)
+    test.start()
+    reactor.sync()
+    assert test.ev_go(1) is None
+    assert test._log == []
+    reactor.sync()
+    assert test._log == [("go", 1), "next"]
+
+
+def test_inline():
+    module = utils.compile_state_machine(__file__)
+    reactor = smax.SelectReactor(inline_events=True)
+    test = module.TestMachine(reactor)
+    test.start()
+    reactor.sync()
+    # Handled right away; ev_next, called from the transition, is queued.
+    assert test.ev_go(1) is True
+    assert test._log == [("go", 1)]
+    assert test._in_state(test.TestMachine_0_s_b)
+    # ev_next is still waiting, so this one has to queue behind it.
+    assert test.ev_go(2) is None
+    assert test._log == [("go", 1)]
+    reactor.sync()
+    assert test._log == [("go", 1), "next", ("back", 2)]
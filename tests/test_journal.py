@@ -0,0 +1,144 @@
+# test_journal.py - A Journal records events, timeouts, starts and ends;
+# replay drives new machines through them the same way.
+
+import asyncio
+import pytest
+import smax
+import smax.journal
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    coalesce: ev_level
+    enter:
+        self._log = []
+        self._level = None
+    *state s_idle:
+        ev_go(n) -> s_busy:
+            self._log.append(("go", n))
+    state s_busy:
+        enter:
+            # raised from inside; journaled, but not replayed twice.
+            self.ev_note("busy")
+        ev_note(text): self._log.append(("note", text))
+        ev_level(level): self._level = level
+        ms(1500): self._log.append(("1500ms", self._reactor.time()))
+        s(5) -> s_idle:
+            self._log.append(("5s", self._reactor.time()))
+        ev_stop -> s_idle
+%%
+"""
+
+
+def run(module, path, segment_size=16 << 20, keep=None):
+    reactor = smax.VirtualTimeReactor(start=1000.0)
+    journal = smax.journal.Journal(path, segment_size=segment_size, keep=keep)
+    journal.attach(reactor)
+    machines = [module.TestMachine(reactor) for n in range(2)]
+    machines[1].start()
+    machines[0].start()
+    reactor.sync()
+    machines[0].ev_go(1)
+    reactor.advance(1)
+    machines[1].ev_go({"x": [1, 2]})
+    machines[1].ev_level(1)
+    machines[1].ev_level(2)
+    reactor.advance(1)
+    machines[1].ev_stop()
+    reactor.broadcast(machines, "ev_go", 3)
+    reactor.advance(10)
+    machines[0].end()
+    reactor.sync()
+    journal.close()
+    assert reactor.journal is None
+    return machines, journal
+
+
+@pytest.mark.parametrize("options", [{}, {"bitset": True, "dispatch": "table"}])
+def test_journal(options, tmp_path):
+    module = utils.compile_state_machine(__file__, **options)
+    path = str(tmp_path / "journal")
+    machines, journal = run(module, path)
+    assert journal.number(machines[1]) == 0
+    assert journal.number(machines[0]) == 1
+    records = list(smax.journal.records(path))
+    kinds = [r.kind for r in records]
+    assert kinds.count(smax.journal.START) == 2
+    assert kinds.count(smax.journal.END) == 1
+    assert kinds.count(smax.journal.TIMEOUT) == 4
+    # coalesced: only one ev_level was delivered.
+    events = [(r.machine, r.name, r.args) for r in records if r.kind == 1]
+    assert events.count((0, "ev_level", (2,))) == 1
+    assert (0, "ev_level", (1,)) not in events
+    assert (0, "ev_go", ({"x": [1, 2]},)) in events
+    assert (1, "ev_note", ("busy",)) in events
+    assert records[0].time == 1000.0
+
+    def factory(reactor, number):
+        return module.TestMachine(reactor)
+
+    replayed = smax.journal.replay(path, factory)
+    assert len(replayed) == 2
+    assert replayed[0]._log == machines[1]._log
+    assert replayed[1]._log == machines[0]._log
+    assert replayed[0]._level == 2
+    assert sorted(replayed[0]._state) == sorted(machines[1]._state)
+    assert replayed[1]._state == machines[0]._state == {}
+
+
+def test_journal_segments(tmp_path):
+    module = utils.compile_state_machine(__file__)
+    path = str(tmp_path / "journal")
+    machines, journal = run(module, path, segment_size=256)
+    segments = smax.journal._segments(path)
+    assert len(segments) > 2
+    replayed = smax.journal.replay(path, lambda reactor, n: module.TestMachine(reactor))
+    assert replayed[1]._log == machines[0]._log
+    # a new journal goes on after the old one.
+    journal = smax.journal.Journal(path, segment_size=256, keep=2)
+    journal.close()
+    assert [n for n, filename in smax.journal._segments(path)] == [
+        len(segments) - 1,
+        len(segments),
+    ]
+
+
+def test_journal_diverged(tmp_path):
+    module = utils.compile_state_machine(__file__)
+    path = str(tmp_path / "journal")
+    run(module, path)
+
+    # one that doesn't go busy has no timeouts to replay.
+    def factory(reactor, number):
+        machine = module.TestMachine(reactor)
+        machine._state_machine_handlers = dict(
+            machine._state_machine_handlers, ev_go=lambda machine, n: None
+        )
+        return machine
+
+    with pytest.raises(ValueError):
+        smax.journal.replay(path, factory)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("native", [False, True])
+async def test_journal_asyncio(native, tmp_path):
+    module = utils.compile_state_machine(__file__)
+    path = str(tmp_path / "journal")
+    reactor = smax.AsyncioReactor(asyncio.get_event_loop(), native=native)
+    journal = smax.journal.Journal(path)
+    journal.attach(reactor)
+    task = asyncio.create_task(reactor.run())
+    machine = module.TestMachine(reactor)
+    machine.start()
+    await machine.ev_go(1)
+    await machine.ev_stop()
+    reactor.stop()
+    await task
+    journal.close()
+    events = [r.name for r in smax.journal.records(path) if r.kind == 1]
+    assert events == ["ev_go", "ev_note", "ev_stop"]
+    replayed = smax.journal.replay(path, lambda reactor, n: module.TestMachine(reactor))
+    assert replayed[0]._log == machine._log == [("go", 1), ("note", "busy")]
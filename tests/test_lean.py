@@ -0,0 +1,58 @@
+# test_lean.py - With lean=True, the diagnostic hooks are only called
+# when debugging is enabled or a subclass overrides one of them.
+
+import smax
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    *state s_a:
+        ev_b -> s_b
+    state s_b:
+        ms(1) -> s_a
+%%
+"""
+
+
+def test_lean():
+    module = utils.compile_state_machine(__file__, lean=True)
+    reactor = smax.SelectReactor()
+    test = module.TestMachine(reactor)
+    assert not test._state_machine_hooks
+    # Overriding on the instance isn't noticed; only subclasses are.
+    calls = []
+    test._state_machine_enter = lambda state_name: calls.append(state_name)
+    test.start()
+    reactor.sync()
+    assert calls == []
+    test._state_machine_debug_enable = True
+    assert test._state_machine_hooks
+    test.ev_b()
+    reactor.sync()
+    assert calls == [["TestMachine", "s_b"]]
+    test._state_machine_debug_enable = False
+    test.end()
+    reactor.sync()
+
+
+def test_lean_subclass():
+    module = utils.compile_state_machine(__file__, lean=True)
+    Test = utils.wrap(module.TestMachine)
+    reactor = smax.SelectReactor()
+    test = Test(reactor)
+    assert not test._state_machine_debug_enable
+    assert test._state_machine_hooks
+    test.start()
+    test.ev_b()
+    reactor.sync()
+    test.expected(
+        [
+            (Test.ENTERED, "TestMachine"),
+            (Test.ENTERED, "TestMachine.s_a"),
+            (Test.HANDLED, "TestMachine.s_a", "ev_b"),
+            (Test.EXITED, "TestMachine.s_a"),
+            (Test.ENTERED, "TestMachine.s_b"),
+        ]
+    )
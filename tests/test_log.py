@@ -0,0 +1,45 @@
+# test_log.py - Disabled log levels don't format anything.
+
+import io
+
+from smax import log
+
+
+class Counted:
+    formatted = 0
+
+    def __str__(self):
+        Counted.formatted += 1
+        return "counted"
+
+
+def test_disabled_trace():
+    assert not log.enable_trace
+    assert log.transcript is None
+    assert not log.tracing()
+    log.trace("value=%s.", Counted())
+    assert Counted.formatted == 0
+
+
+def test_transcript():
+    transcript = io.StringIO()
+    log.install_transcript(transcript)
+    try:
+        assert log.tracing()
+        log.trace("value=%s.", Counted())
+        line = transcript.getvalue()
+    finally:
+        log.install_transcript(None)
+    assert Counted.formatted == 1
+    assert line.startswith("TRACE ")
+    # The caller is this file, not smax/log.py.
+    assert "test_log.py:" in line
+    assert line.endswith("-- value=counted.\n")
+    # Messages without arguments aren't formatted at all.
+    transcript = io.StringIO()
+    log.install_transcript(transcript)
+    try:
+        log.trace("100%")
+    finally:
+        log.install_transcript(None)
+    assert transcript.getvalue().endswith("-- 100%\n")
@@ -1,5 +1,8 @@
 # test_overflow.py - What happens if we have a perpetual loop?
+# Default transitions run one after another, not recursively, so a
+# loop of them raises LivelockError instead of overflowing the stack.
 
+import pytest
 import smax
 import utils
 
@@ -18,6 +21,49 @@ machine TestMachine:
         -> s_a
 
 
+machine ChainMachine:
+    enter: self._count = 0
+    *state s_a:
+        enter: self._count += 1
+        [self._count < 5000] -> s_b
+    state s_b:
+        enter: self._count += 1
+        -> s_a
+
+
+machine NestedMachine:
+    enter: self._count = 0
+    *state s_x:
+        *state s_x1:
+            enter: self._count += 1
+            -> ^s_y
+    state s_y:
+        *state s_y1:
+            enter: self._count += 1
+            -> ^s_x
+
+
+machine OrderMachine:
+    enter: self._log = []
+    *state s_a:
+        enter: self._log.append("a")
+        -> s_b
+    state s_b:
+        enter: self._log.append("b")
+        *state s_p:
+            enter: self._log.append("p")
+            exit: self._log.append("~p")
+            -> s_q
+        state s_q:
+            enter: self._log.append("q")
+        ---
+        *state s_r:
+            enter: self._log.append("r")
+            [self._in_state(self.OrderMachine_0_s_b_0_s_p)] -> s_s
+        state s_s:
+            enter: self._log.append("s")
+
+
 machine OkMachine:
     enter: self._count = 0
     *state s_a:
@@ -37,13 +83,11 @@ def test_overflow():
     reactor = smax.SelectReactor()
     test = Test(reactor)
     test.start()
-    try:
+    with pytest.raises(smax.LivelockError) as e:
         reactor.sync()
-    except RecursionError as e:
-        print("Caught %s (%s), as expected" % (type(e).__name__, e))
-        pass
-    else:
-        assert False
+    print("Caught %s (%s), as expected" % (type(e.value).__name__, e.value))
+    assert "TestMachine.s_a" in str(e.value)
+    assert "TestMachine.s_b" in str(e.value)
     print("test._count=%s" % (test._count,))
 
     Ok = utils.wrap(module.OkMachine)
@@ -59,3 +103,48 @@ def test_overflow():
 
     reactor.after_s(1, check)
     reactor.run()
+
+
+def test_long_chain():
+    # Far more transitions than the stack would allow when recursing.
+    module = utils.compile_state_machine(__file__)
+
+    class Chain(module.ChainMachine):
+        _state_machine_microstep_limit = 10000
+
+    reactor = smax.SelectReactor()
+    chain = Chain(reactor)
+    chain.start()
+    reactor.sync()
+    assert chain._count == 5001
+    assert chain._in_state(chain.ChainMachine_0_s_a)
+
+
+@pytest.mark.parametrize("options", [{}, {"bitset": True, "dispatch": "table"}])
+def test_nested_loop(options):
+    # Each transition enters a parent state whose _configure would
+    # drain again; only the outermost drain may run them.
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.SelectReactor()
+    test = module.NestedMachine(reactor)
+    test.start()
+    with pytest.raises(smax.LivelockError) as e:
+        reactor.sync()
+    assert "NestedMachine.s_x.s_x1" in str(e.value)
+    assert "NestedMachine.s_y.s_y1" in str(e.value)
+    assert test._count > test._state_machine_microstep_limit
+
+
+@pytest.mark.parametrize("options", [{}, {"bitset": True, "dispatch": "table"}])
+def test_region_order(options):
+    # s_p's default transition is taken before the next region is
+    # configured, as if it were called directly; so s_r's guard
+    # sees s_q, not s_p.
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.SelectReactor()
+    test = module.OrderMachine(reactor)
+    test.start()
+    reactor.sync()
+    assert test._log == ["a", "b", "p", "~p", "q", "r"]
+    assert test._in_state(test.OrderMachine_0_s_b_0_s_q)
+    assert test._in_state(test.OrderMachine_0_s_b_1_s_r)
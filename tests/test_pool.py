@@ -0,0 +1,128 @@
+# test_pool.py - smax.pool.Pool runs machines in worker processes
+# and hands back proxies with the same event methods.
+
+import multiprocessing
+import os
+import pytest
+import smax
+import smax.pool
+import utils
+
+r"""
+%%
+
+import os
+
+machine TestMachine:
+    coalesce: ev_level
+    enter:
+        self._pings = 0
+        self._levels = []
+    ev_level(n): self._levels.append(n)
+    *state s_idle:
+        ev_ping(n) -> s_busy:
+            self._pings += n
+    state s_busy:
+        ms(10) -> s_idle
+        ev_ping(n): self._pings += n
+%%
+"""
+
+module = utils.compile_state_machine(__file__)
+
+
+# Subclasses work unchanged; they just have to be importable.
+class Device(module.TestMachine):
+    def __init__(self, reactor, name):
+        super(Device, self).__init__(reactor)
+        self._name = name
+        self._sent = 0
+
+    def ev_ping(self, n):
+        self._sent += 1
+        return super(Device, self).ev_ping(n)
+
+
+def pid_and_pings(machine):
+    return os.getpid(), machine._name, machine._pings
+
+
+def sent_and_levels(machine):
+    return machine._sent, machine._levels
+
+
+def fail(machine):
+    raise ValueError(machine._name)
+
+
+@pytest.fixture
+def pool():
+    with smax.pool.Pool(2, context=multiprocessing.get_context("fork")) as pool:
+        yield pool
+
+
+def test_pool(pool):
+    assert len(pool) == 2
+    devices = [pool.create(n, Device, "device%u" % n) for n in range(6)]
+    for f in [device.start() for device in devices]:
+        f.result(10)
+    # (had we not waited, this would have been queued ahead of the
+    # machine's enter--just like calling start and then looking at
+    # _state without the reactor running in between.)
+    assert devices[0].state().result(10) == ["TestMachine", "TestMachine.s_idle"]
+    futures = [device.ev_ping(n) for n, device in enumerate(devices)]
+    # the handler's return value: the event was handled.
+    assert [f.result(10) for f in futures] == [True] * 6
+    devices[1].ev_ping(10).result(10)
+    assert devices[1].state().result(10) == ["TestMachine", "TestMachine.s_busy"]
+    results = [device.apply(pid_and_pings).result(10) for device in devices]
+    assert [(name, pings) for pid, name, pings in results] == [
+        ("device0", 0),
+        ("device1", 11),
+        ("device2", 2),
+        ("device3", 3),
+        ("device4", 4),
+        ("device5", 5),
+    ]
+    pids = [pid for pid, name, pings in results]
+    # placed by key, on two processes that aren't us.
+    assert pids[0::2] == [pids[0]] * 3
+    assert pids[1::2] == [pids[1]] * 3
+    assert len({os.getpid(), pids[0], pids[1]}) == 3
+
+
+def test_pool_errors(pool):
+    device = pool.create("a", Device, "a")
+    with pytest.raises(ValueError):
+        device.apply(fail).result(10)
+    # the constructor's missing its name argument.
+    broken = pool.create("b", Device)
+    with pytest.raises(TypeError):
+        broken.start().result(10)
+    # not started
+    with pytest.raises(RuntimeError):
+        device.ev_ping(1).result(10)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        device.ev_ping(1)
+
+
+def test_pool_shard(pool):
+    assert [pool.shard(n) for n in range(4)] == [0, 1, 0, 1]
+    # doesn't depend on PYTHONHASHSEED.
+    assert pool.shard("device7") == 0
+
+
+def test_pool_event_methods(pool):
+    # Events go through the machine's own methods: overrides
+    # see them, and coalescing works.
+    device = pool.create("a", Device, "a")
+    device.start().result(10)
+    assert device.ev_ping(1).result(10) is True
+    futures = [device.ev_level(n) for n in range(100)]
+    for f in futures:
+        f.result(10)
+    sent, levels = device.apply(sent_and_levels).result(10)
+    assert sent == 1
+    assert levels[-1] == 99
+    assert len(levels) < 100
@@ -0,0 +1,126 @@
+# test_ring.py - smax.ring.EventRing carries events from a producer
+# (here, the same process or a forked one) to machines on a reactor.
+
+import os
+import pytest
+import smax
+import smax.ring
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _samples, _resets
+    enter:
+        self._samples = []
+        self._resets = 0
+    *state s_running:
+        ev_sample(channel, value): self._samples.append((channel, value))
+        ev_reset:
+            self._samples = []
+            self._resets += 1
+%%
+"""
+
+events = {"ev_sample": "Hd", "ev_reset": ""}
+
+
+def pump(reactor, until, timeout=5):
+    reactor.sync()
+    while not until():
+        r, w, x = reactor.select(timeout)
+        assert r, "timed out"
+        for fd in r:
+            reactor._r[fd]()
+        reactor.sync()
+
+
+@pytest.fixture
+def ring():
+    ring = smax.ring.EventRing(events, records=16)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_ring(ring):
+    module = utils.compile_state_machine(__file__)
+    reactor = smax.SelectReactor()
+    machines = [module.TestMachine(reactor) for i in range(2)]
+    for m in machines:
+        m.start()
+    ring.attach(reactor, machines, batch=4)
+    assert ring.put("ev_sample", 1, 0.5)
+    assert ring.put("ev_sample", 2, 1.5, machine=1)
+    assert ring.put("ev_reset", machine=1)
+    assert ring.put("ev_sample", 3, 2.5, machine=1)
+    assert len(ring) == 4
+    ring.ring()
+    pump(reactor, lambda: len(ring) == 0)
+    assert machines[0]._samples == [(1, 0.5)]
+    assert machines[1]._samples == [(3, 2.5)]
+    assert machines[1]._resets == 1
+    # more than a batch, and more than fit
+    written = ring.put_many("ev_sample", [(n, n / 2) for n in range(20)])
+    assert written == 16
+    assert not ring.put("ev_reset")
+    pump(reactor, lambda: len(ring) == 0)
+    assert machines[0]._samples[1:] == [(n, n / 2) for n in range(16)]
+
+
+def test_ring_process(ring):
+    module = utils.compile_state_machine(__file__, bitset=True, slots=True)
+    reactor = smax.SelectReactor()
+    fleet = smax.Fleet(module.TestMachine, reactor, 3)
+    fleet.start()
+    ring.attach(reactor, fleet)
+    count = 1000
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for n in range(count):
+                while not ring.put_many("ev_sample", [(n, n)], machine=n % 3):
+                    pass
+        finally:
+            os._exit(0)
+    try:
+        pump(reactor, lambda: sum(len(s) for s in fleet.column("_samples")) == count)
+    finally:
+        os.waitpid(pid, 0)
+    assert fleet.column("_samples")[1] == [(n, n) for n in range(1, count, 3)]
+
+
+def test_ring_unknown_event(ring):
+    with pytest.raises(KeyError):
+        ring.put("ev_unknown")
+
+
+def test_ring_handler_error(ring):
+    module = utils.compile_state_machine(__file__)
+
+    def sample(machine, channel, value):
+        if value < 0:
+            raise ValueError(value)
+        machine._samples.append((channel, value))
+
+    class Failing(module.TestMachine):
+        _state_machine_handlers = dict(
+            module.TestMachine._state_machine_handlers, ev_sample=sample
+        )
+
+    reactor = smax.SelectReactor()
+    machine = Failing(reactor)
+    machine.start()
+    ring.attach(reactor, machine)
+    ring.put_many("ev_sample", [(1, 0.5), (2, -1.0), (3, 1.5)])
+    ring.ring()
+    r, w, x = reactor.select(5)
+    with pytest.raises(ValueError):
+        for fd in r:
+            reactor._r[fd]()
+        reactor.sync()
+    # the rest are delivered without ringing again.
+    reactor.sync()
+    assert machine._samples == [(1, 0.5), (3, 1.5)]
+    assert len(ring) == 0
@@ -0,0 +1,70 @@
+# test_slots.py - slots=True gives generated classes __slots__,
+# including the attributes declared with "slots:".
+
+import pytest
+import smax
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _count, _last
+    enter:
+        self._count = 0
+        self._last = None
+    *state s_a:
+        enter: self._count += 1
+        ev_b -> s_b
+        ms(1000) -> s_b
+    state s_b:
+        enter: self._last = "s_b"
+        ev_a -> s_a
+%%
+"""
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"bitset": True, "dispatch": "table", "lean": True}],
+)
+def test_slots(options):
+    module = utils.compile_state_machine(__file__, slots=True, **options)
+    reactor = smax.SelectReactor()
+    test = module.TestMachine(reactor)
+    assert not hasattr(test, "__dict__")
+    test.start()
+    test.ev_b()
+    test.ev_a()
+    reactor.sync()
+    assert test._count == 2
+    assert test._last == "s_b"
+    assert sorted(test._state.keys()) == ["TestMachine", "TestMachine.s_a"]
+    with pytest.raises(AttributeError):
+        test._undeclared = True
+
+    # Subclasses opt in with their own __slots__.
+    class Slotted(module.TestMachine):
+        __slots__ = ("_extra",)
+
+    slotted = Slotted(reactor)
+    slotted._extra = 1
+    assert not hasattr(slotted, "__dict__")
+
+    # ... and subclasses that don't, like utils.wrap, still work.
+    Test = utils.wrap(module.TestMachine)
+    wrapped = Test(reactor)
+    wrapped.start()
+    reactor.sync()
+    wrapped.expected(
+        [
+            (Test.ENTERED, "TestMachine"),
+            (Test.ENTERED, "TestMachine.s_a"),
+        ]
+    )
+
+
+def test_duplicate_slot():
+    source = "machine TestMachine:\n    slots: _a, _a\n    *state s_a:\n        pass\n"
+    with pytest.raises(smax.parser.SyntaxError):
+        smax.parse(source, "<duplicate>")
@@ -0,0 +1,159 @@
+# test_snapshot.py - snapshot and restore carry a machine's states,
+# timeouts and slots over to a new instance without running enter code.
+
+import pytest
+import smax
+import smax.snapshot
+import time
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    slots: _count, _log
+    enter:
+        self._count = 0
+        self._log = ["enter"]
+    *state s_idle:
+        ev_go -> s_running
+    state s_running:
+        enter:
+            self._count += 1
+            self._log.append("running")
+        exit: self._log.append("exit running")
+        ms(10): self._log.append("10ms")
+        s(60): self._log.append("60s")
+        ms(100) -> s_idle
+        ev_stop -> s_idle
+        *state s_inner:
+            ev_next -> s_other
+        state s_other:
+            pass
+
+machine PlainMachine:
+    enter: self._count = 0
+    *state s_counting:
+        ev_count: self._count += 1
+%%
+"""
+
+options = [
+    {},
+    {"bitset": True},
+    {"bitset": True, "dispatch": "table", "lean": True},
+]
+
+
+def make(module, reactor):
+    machine = module.TestMachine(reactor)
+    machine._log = []
+    return machine
+
+
+@pytest.mark.parametrize("options", options)
+def test_snapshot(options):
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.SelectReactor()
+    a = make(module, reactor)
+    a.start()
+    a.ev_go()
+    a.ev_next()
+    reactor.sync()
+    time.sleep(0.02)
+    reactor.sync()
+    assert a._log == ["enter", "running", "10ms"]
+    data = a.snapshot()
+    a.end()
+    reactor.sync()
+
+    b = make(module, reactor)
+    b.restore(data)
+    assert sorted(b._state) == [
+        "TestMachine",
+        "TestMachine.s_running",
+        "TestMachine.s_running.s_other",
+    ]
+    assert b._count == 1
+    assert b._log == ["enter", "running", "10ms"]
+    # the 10ms timeout fired already; the others are rearmed.
+    assert reactor.pending_alarms() == 2
+    with pytest.raises(RuntimeError):
+        b.restore(data)
+    # it carries on where a left off.
+    time.sleep(0.1)
+    reactor.sync()
+    assert b._log == ["enter", "running", "10ms", "exit running"]
+    assert b._in_state("TestMachine.s_idle")
+    assert reactor.pending_alarms() == 0
+    b.ev_go()
+    reactor.sync()
+    assert b._count == 2
+    b.ev_stop()
+    reactor.sync()
+    assert b._in_state("TestMachine.s_idle")
+
+
+def test_snapshot_wrong_class():
+    module = utils.compile_state_machine(__file__)
+    other = utils.compile_state_machine(__file__, bitset=True)
+    reactor = smax.SelectReactor()
+    a = module.TestMachine(reactor)
+    a.start()
+    reactor.sync()
+    data = a.snapshot()
+    # the same machine generated differently is fine.
+    b = other.TestMachine(reactor)
+    b.restore(data)
+    assert b._in_state("TestMachine.s_idle")
+    b = other.TestMachine(reactor)
+    with pytest.raises(ValueError):
+        b.restore(b"nonsense")
+    # a snapshot of some other class
+    data = data[:4] + bytes(4) + data[8:]
+    with pytest.raises(ValueError):
+        b.restore(data)
+
+
+def test_snapshot_file(tmp_path):
+    module = utils.compile_state_machine(__file__, bitset=True)
+    reactor = smax.SelectReactor()
+    machines = [make(module, reactor) for n in range(5)]
+    for n, machine in enumerate(machines):
+        machine.start()
+        for i in range(n):
+            machine.ev_go()
+            machine.ev_stop()
+    reactor.sync()
+    filename = str(tmp_path / "machines.smax")
+    smax.snapshot.save(filename, machines)
+    snapshots = smax.snapshot.load(filename)
+    assert len(snapshots) == 5
+    restored = []
+    for data in snapshots:
+        machine = make(module, reactor)
+        machine.restore(data)
+        restored.append(machine)
+    assert [machine._count for machine in restored] == [0, 1, 2, 3, 4]
+    assert all(m._in_state("TestMachine.s_idle") for m in restored)
+
+
+@pytest.mark.parametrize("options", options)
+def test_snapshot_attributes(options):
+    # without "slots:", everything in __dict__ is saved.
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.SelectReactor()
+    a = module.PlainMachine(reactor)
+    a.start()
+    a.ev_count()
+    reactor.sync()
+    a._note = {"x": [1, 2]}
+    data = a.snapshot()
+    b = module.PlainMachine(reactor)
+    b.restore(data)
+    assert b._count == 1
+    assert b._note == {"x": [1, 2]}
+    assert b._reactor is reactor
+    b.ev_count()
+    reactor.sync()
+    assert b._count == 2
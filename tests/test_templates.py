@@ -0,0 +1,23 @@
+# test_templates.py - Code generation compiles each template once.
+
+import smax
+from smax.translate import _templates
+
+source = r"""
+machine Templates:
+    *state s_a:
+        ev_b -> s_b
+        100ms -> s_b
+    state s_b:
+        ev_a(n) [n > 0] -> s_a
+"""
+
+
+def test_templates_compiled_once():
+    first = smax.generate_python(smax.parse(source, "<first>"))
+    compiled = dict(_templates)
+    assert compiled
+    second = smax.generate_python(smax.parse(source, "<first>"))
+    assert first == second
+    # the same template objects were reused.
+    assert _templates == compiled
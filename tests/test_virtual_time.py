@@ -0,0 +1,74 @@
+# test_virtual_time.py - VirtualTimeReactor runs timeouts on a simulated
+# clock, so hours of them take no time at all.
+
+import pytest
+import smax
+import time
+import utils
+
+r"""
+%%
+
+machine TestMachine:
+    enter:
+        self._tries = 0
+        self._log = []
+    *state s_connecting:
+        enter:
+            self._tries += 1
+            self._log.append(("try", self._reactor.time()))
+        ev_connected -> s_connected
+        s(5) -> s_connecting
+    state s_connected:
+        enter: self._log.append(("connected", self._reactor.time()))
+        ms(1500): self._log.append(("1500ms", self._reactor.time()))
+        ev_lost -> s_connecting
+%%
+"""
+
+
+@pytest.mark.parametrize("options", [{}, {"bitset": True, "dispatch": "table"}])
+def test_virtual_time(options):
+    module = utils.compile_state_machine(__file__, **options)
+    reactor = smax.VirtualTimeReactor()
+    test = module.TestMachine(reactor)
+    test.start()
+    reactor.sync()
+    assert test._log == [("try", 0.0)]
+    reactor.advance(12)
+    assert reactor.time() == 12
+    assert test._log == [("try", 0.0), ("try", 5.0), ("try", 10.0)]
+    test.ev_connected()
+    reactor.advance(1)
+    assert test._log[-1] == ("connected", 12)
+    reactor.run_until(20)
+    assert test._log[-1] == ("1500ms", 13.5)
+    assert reactor.time() == 20
+    # nothing's left to do.
+    reactor.run()
+    assert reactor.time() == 20
+    assert reactor.pending_alarms() == 0
+
+    # ten hours of retries, right away.
+    test.ev_lost()
+    start = time.monotonic()
+    reactor.advance(10 * 60 * 60)
+    assert time.monotonic() - start < 5
+    assert test._tries == 3 + 1 + 10 * 60 * 60 // 5
+    assert test._log[-1] == ("try", 20 + 10 * 60 * 60)
+
+
+def test_virtual_time_order():
+    reactor = smax.VirtualTimeReactor(start=100.0)
+    log = []
+    reactor.after_s(2, log.append, "b")
+    reactor.after_ms(1000, log.append, "a")
+    reactor.after_s(2, log.append, "c")
+    cancelled = reactor.after_s(1.5, log.append, "x")
+    reactor.cancel_after(cancelled)
+    assert reactor.remaining_s(cancelled) is None
+    reactor.after_s(3, reactor.stop)
+    reactor.after_s(4, log.append, "d")
+    reactor.run()
+    assert log == ["a", "b", "c"]
+    assert reactor.time() == 103.0
@@ -0,0 +1,119 @@
+# test_wakeup.py - SelectReactor only signals its control descriptor
+# when another thread needs to wake it, and never loses a wakeup.
+
+import os
+import select
+import threading
+
+import pytest
+import smax
+
+
+def readable(reactor):
+    r, w, x = select.select([reactor._control_read], [], [], 0)
+    return bool(r)
+
+
+def call_from_thread(reactor, cb, *args):
+    t = threading.Thread(target=reactor.call, args=(cb,) + args)
+    t.start()
+    t.join()
+
+
+def run(reactor, starter):
+    # Fail instead of blocking forever if a wakeup gets lost.
+    timed_out = []
+
+    def timeout():
+        timed_out.append(True)
+        reactor.stop()
+
+    alarm = reactor.after_s(5, timeout)
+    t = threading.Thread(target=starter)
+    t.start()
+    reactor.run()
+    t.join()
+    reactor.cancel_after(alarm)
+    assert not timed_out
+
+
+@pytest.fixture(params=["eventfd", "pipe"])
+def reactor_factory(request, monkeypatch):
+    if request.param == "pipe":
+        monkeypatch.delattr(os, "eventfd", raising=False)
+    elif not hasattr(os, "eventfd"):
+        pytest.skip("eventfd isn't available")
+    return smax.SelectReactor
+
+
+def test_same_thread(reactor_factory):
+    reactor = reactor_factory()
+    result = []
+    for i in range(10):
+        reactor.call(result.append, i)
+    # the reactor thread never blocks with calls queued, so it
+    # doesn't need waking.
+    assert not reactor._wakeup_pending
+    assert not readable(reactor)
+    reactor.sync()
+    assert result == list(range(10))
+
+
+def test_other_thread(reactor_factory):
+    reactor = reactor_factory()
+    result = []
+    for i in range(10):
+        call_from_thread(reactor, result.append, i)
+    # only the first call signals.
+    assert reactor._wakeup_pending
+    assert readable(reactor)
+    reactor._SelectReactor__control_ready()
+    assert not reactor._wakeup_pending
+    assert not readable(reactor)
+    reactor.sync()
+    assert result == list(range(10))
+    # and the next one signals again.
+    call_from_thread(reactor, result.append, 10)
+    assert readable(reactor)
+
+
+def test_race(reactor_factory):
+    # A call from another thread that lands after the control
+    # descriptor is drained, but before _wakeup_pending is cleared,
+    # doesn't signal; the sync right after the drain picks it up.
+    reactor = reactor_factory()
+    result = []
+    drain = reactor._drain
+    raced = []
+
+    def finish():
+        result.append("raced")
+        reactor.stop()
+
+    def racing_drain():
+        drain()
+        if not raced:
+            raced.append(True)
+            call_from_thread(reactor, finish)
+            assert reactor._wakeup_pending
+            assert not readable(reactor)
+
+    reactor._drain = racing_drain
+    run(reactor, lambda: reactor.call(result.append, "first"))
+    assert result == ["first", "raced"]
+    assert not reactor._wakeup_pending
+
+
+def test_pipe_full(monkeypatch):
+    monkeypatch.delattr(os, "eventfd", raising=False)
+    reactor = smax.SelectReactor()
+    assert reactor._control_read != reactor._control_write
+    # more than a pipe holds; a full pipe wakes select anyway.
+    for i in range(100000):
+        reactor._pipe_wakeup()
+    assert readable(reactor)
+    reactor._pipe_drain()
+    assert not readable(reactor)
+    result = []
+    run(reactor, lambda: reactor.call(lambda: (result.append(1), reactor.stop())))
+    assert result == [1]
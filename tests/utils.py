@@ -8,10 +8,14 @@ import smax.log as log
 
 
 def compile_state_machine(
-    filename, generated_source_filename="%(dirname)s/.generated.%(basename)s"
+    filename,
+    generated_source_filename="%(dirname)s/.generated.%(basename)s",
+    **options,
 ):
     state_machine_source = smax.load_source(filename)
-    machine_spec, python_code = smax.translate(state_machine_source, filename)
+    machine_spec, python_code = smax.translate(
+        state_machine_source, filename, **options
+    )
     if generated_source_filename:
         dirname, basename = os.path.split(filename)
         out_filename = generated_source_filename % locals()